@@ -1,13 +1,21 @@
 # KanjiApp.py
 import sys
 import os
-from PySide6.QtCore import Qt, QTimer
+import logging
+import time
+from PySide6.QtCore import Qt, QEvent, QTimer, QObject, Signal
 from PySide6.QtWidgets import QApplication, QMainWindow, QStackedWidget, QVBoxLayout, QWidget, QPushButton, QLabel, \
-    QLineEdit, QListWidget, QListWidgetItem, QComboBox, QHBoxLayout, QTextEdit, QMessageBox
-from controller import KanjiController
-from entities import Kanji, Word
+    QLineEdit, QListWidget, QListWidgetItem, QComboBox, QHBoxLayout, QTextEdit, QMessageBox, QInputDialog, \
+    QAbstractItemView
+from logging_config import setup_logging
+from stall_watchdog import StallWatchdog, tracked_action
+from entities import Kanji, KanjiTile, Word
+from search_facets import SearchFacets, filter_results, FACET_GROUPS, FACET_TYPE, FACET_JLPT, FACET_COMPLEX
 from PySide6.QtCore import QFile, QTextStream
 
+logger = logging.getLogger("KanjiApp")
+
+
 def resource_path(relative_path):
     try:
         base_path = sys._MEIPASS
@@ -37,8 +45,24 @@ class StartPage(QWidget):
         add_button = QPushButton("Добавить кандзи/слово")
         add_button.clicked.connect(self.go_to_add)
 
+        grid_button = QPushButton("Сетка кандзи")
+        grid_button.clicked.connect(self.go_to_grid)
+
+        study_button = QPushButton("Учить")
+        study_button.clicked.connect(self.parent_window.go_to_study)
+
+        statistics_button = QPushButton("Статистика")
+        statistics_button.clicked.connect(self.parent_window.go_to_statistics)
+
+        diagnostics_button = QPushButton("Диагностика")
+        diagnostics_button.clicked.connect(self.go_to_diagnostics)
+
         button_layout.addWidget(start_button)
         button_layout.addWidget(add_button)
+        button_layout.addWidget(grid_button)
+        button_layout.addWidget(study_button)
+        button_layout.addWidget(statistics_button)
+        button_layout.addWidget(diagnostics_button)
         button_layout.addStretch()
 
         layout.addLayout(button_layout)
@@ -56,8 +80,21 @@ class StartPage(QWidget):
         self.parent_window.add_page_to_stack(add_page)
         self.parent_window.show_current_page()
 
+    def go_to_grid(self):
+        self.parent_window.go_to_grid()
+
+    def go_to_diagnostics(self):
+        # Страница диагностики тянет профилировщик и tracemalloc - загружаем ее по требованию
+        from diagnostics_page import DiagnosticsPage
+        diagnostics_page = DiagnosticsPage(self.parent_window, self.parent_window.kanji_controller)
+        self.parent_window.add_page_to_stack(diagnostics_page)
+        self.parent_window.show_current_page()
+
 
 class SearchPage(QWidget):
+    # Пауза в наборе текста, после которой запускается поиск
+    SEARCH_DEBOUNCE_MS = 150
+
     def __init__(self, parent_window, kanji_controller):
         super().__init__()
         self.parent_window = parent_window
@@ -74,6 +111,10 @@ class SearchPage(QWidget):
 
         self.search_line_edit = QLineEdit()
         self.search_line_edit.setPlaceholderText("Введите кандзи или слово...")
+        self.search_line_edit.setToolTip(
+            "Поддерживаются условия: jlpt:3, on:コウ, kun:やす, meaning:school, has:言.\n"
+            "Условия можно комбинировать друг с другом и с обычным текстом."
+        )
         # Убраны inline-стили
         search_input_layout.addWidget(self.search_line_edit)
 
@@ -82,13 +123,52 @@ class SearchPage(QWidget):
         self.search_button.clicked.connect(self.perform_search)
         search_input_layout.addWidget(self.search_button)
 
+        # Режим выбора нескольких результатов для пакетных операций
+        self.select_button = QPushButton("Выбрать")
+        self.select_button.setCheckable(True)
+        self.select_button.toggled.connect(self.set_multi_select)
+        search_input_layout.addWidget(self.select_button)
+
+        grid_button = QPushButton("Сеткой")
+        grid_button.setToolTip("Показать найденные кандзи сеткой")
+        grid_button.clicked.connect(self.show_as_grid)
+        search_input_layout.addWidget(grid_button)
+
         layout.addLayout(search_input_layout)
 
+        # Панель фасетов: счетчики по типу, уровню JLPT и составности
+        self.facet_layout = QHBoxLayout()
+        layout.addLayout(self.facet_layout)
+
         self.results_list_widget = QListWidget()
         # Убраны inline-стили
         self.results_list_widget.itemClicked.connect(self.on_result_clicked)
+        self.results_list_widget.itemSelectionChanged.connect(self.update_bulk_bar)
         layout.addWidget(self.results_list_widget)
 
+        # Панель пакетных операций (видна в режиме выбора)
+        self.bulk_bar = QWidget()
+        bulk_layout = QHBoxLayout(self.bulk_bar)
+        bulk_layout.setContentsMargins(0, 0, 0, 0)
+        self.selection_label = QLabel("")
+        bulk_layout.addWidget(self.selection_label)
+        self.bulk_buttons = []
+        for text, handler in (("Удалить", self.bulk_delete), ("Уровень JLPT...", self.bulk_set_jlpt),
+                              ("Дописать заметку...", self.bulk_append_notes),
+                              ("Заменить компонент...", self.bulk_relink_components),
+                              ("В изучение", self.bulk_enroll_study)):
+            button = QPushButton(text)
+            button.clicked.connect(handler)
+            bulk_layout.addWidget(button)
+            self.bulk_buttons.append(button)
+        self.bulk_bar.hide()
+        layout.addWidget(self.bulk_bar)
+
+        self.status_label = QLabel("")
+        self.status_label.setObjectName("status_label")
+        self.status_label.hide()
+        layout.addWidget(self.status_label)
+
         back_button = QPushButton("Назад")
         back_button.clicked.connect(self.parent_window.go_back)
         layout.addWidget(back_button)
@@ -96,22 +176,100 @@ class SearchPage(QWidget):
         self.setLayout(layout)
 
         self.last_query = ""
+        self.all_results = []
+        self.facet_filters = {}
+        # Номер последнего запущенного поиска: ответы на более ранние отбрасываются
+        self.search_sequence = 0
         self.search_line_edit.returnPressed.connect(self.perform_search)
 
+        # Поиск по мере ввода: запускается, когда пользователь делает паузу
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.search_as_you_type)
+        self.search_line_edit.textChanged.connect(self.search_timer.start)
+
+    @tracked_action()
     def perform_search(self):
+        """Запускает поиск в потоке базы; результаты показывает on_search_done"""
+        self.search_timer.stop()
         query = self.search_line_edit.text().strip()
+        self.search_sequence += 1
         if query:
-            print(f"Выполняется поиск для: '{query}'")
+            logger.debug("Выполняется поиск для: %r", query)
+            if query != self.last_query:
+                # Новый запрос - выбранные фасеты сбрасываются
+                self.facet_filters = {}
             self.last_query = query
-
-            kanji_results = self.controller.search_kanji(query)
-            word_results = self.controller.search_vocabulary(query)
-
-            all_results = kanji_results + word_results
-            self.update_results_list(all_results)
+            sequence = self.search_sequence
+            self.parent_window.run_db(self.controller.search, query,
+                                      on_result=lambda results: self.on_search_done(sequence, results),
+                                      on_error=lambda error: self.on_search_error(sequence, error))
         else:
             self.results_list_widget.clear()
             self.last_query = ""
+            self.all_results = []
+            self.facet_filters = {}
+            self.update_facet_bar(SearchFacets())
+
+    def on_search_done(self, sequence, results):
+        if sequence != self.search_sequence:
+            # Пока шел поиск, запрос изменился
+            logger.debug("Отброшены результаты устаревшего поиска №%d", sequence)
+            return
+        kanji_results, word_results = results
+        self.all_results = kanji_results + word_results
+        self.apply_facets()
+
+    def on_search_error(self, sequence, error):
+        if sequence == self.search_sequence:
+            self.show_status_message(f"Ошибка поиска: {error}", is_success=False)
+
+    def search_as_you_type(self):
+        # Изменились только пробелы по краям - результаты те же, выбранные фасеты сохраняются
+        if self.search_line_edit.text().strip() != self.last_query:
+            self.perform_search()
+
+    def apply_facets(self):
+        """Фильтрует уже найденные результаты по выбранным фасетам без повторного поиска."""
+        self.update_results_list(filter_results(self.all_results, self.facet_filters))
+        self.update_facet_bar(SearchFacets(self.all_results, self.facet_filters))
+
+    def toggle_facet(self, group, value):
+        if self.facet_filters.get(group, object()) == value:
+            del self.facet_filters[group]
+        else:
+            self.facet_filters[group] = value
+        self.apply_facets()
+
+    @staticmethod
+    def facet_label(group, value):
+        if group == FACET_TYPE:
+            return "Кандзи" if value == 'kanji' else "Слова"
+        if group == FACET_JLPT:
+            return f"N{value}" if value is not None else "Без JLPT"
+        if group == FACET_COMPLEX:
+            return "Составные" if value else "Простые"
+        return str(value)
+
+    def update_facet_bar(self, facets):
+        while self.facet_layout.count():
+            item = self.facet_layout.takeAt(0)
+            if item.widget() is not None:
+                item.widget().deleteLater()
+
+        for group in FACET_GROUPS:
+            group_counts = facets.counts.get(group, {})
+            # JLPT: от N5 к N1, уровень без значения - в конце
+            values = sorted(group_counts, key=lambda v: (v is None, -v if isinstance(v, int) else 0))
+            for value in values:
+                button = QPushButton(f"{self.facet_label(group, value)} ({group_counts[value]})")
+                button.setProperty("class", "facet")
+                button.setCheckable(True)
+                button.setChecked(group in self.facet_filters and self.facet_filters[group] == value)
+                button.clicked.connect(lambda _, g=group, v=value: self.toggle_facet(g, v))
+                self.facet_layout.addWidget(button)
+        self.facet_layout.addStretch()
 
     def update_results_list(self, results):
         self.results_list_widget.clear()
@@ -122,66 +280,168 @@ class SearchPage(QWidget):
                 display_text = f"[Word] {result.japanese} - {result.translation}"
             else:
                 display_text = f"Неизвестный тип результата: {type(result)}"
-                print(f"Предупреждение: Неизвестный тип результата: {result}")
+                logger.warning("Неизвестный тип результата: %r", result)
 
             item = QListWidgetItem(display_text)
             item.setData(Qt.UserRole, result)
             self.results_list_widget.addItem(item)
 
+    @tracked_action()
     def refresh_results(self):
         if self.last_query:
-            print(f"Обновление результатов для: '{self.last_query}'")
+            logger.debug("Обновление результатов для: %r", self.last_query)
             self.search_line_edit.setText(self.last_query)
             self.perform_search()
         else:
             self.results_list_widget.clear()
-            print("Обновление: предыдущий запрос отсутствует, список очищен.")
+            self.all_results = []
+            self.update_facet_bar(SearchFacets())
+            logger.debug("Обновление: предыдущий запрос отсутствует, список очищен.")
+
+    @tracked_action()
+    def show_as_grid(self):
+        """Открывает найденные кандзи (с учетом фасетов) в сетке"""
+        tiles = [KanjiTile(result.id, result.character, result.meaning, result.jlpt_level)
+                 for result in filter_results(self.all_results, self.facet_filters) if isinstance(result, Kanji)]
+        self.parent_window.go_to_grid(tiles, title=f"Результаты поиска: {self.last_query}")
+
+    # --- Пакетные операции ---
+
+    def set_multi_select(self, enabled):
+        mode = QAbstractItemView.ExtendedSelection if enabled else QAbstractItemView.SingleSelection
+        self.results_list_widget.setSelectionMode(mode)
+        if not enabled:
+            self.results_list_widget.clearSelection()
+        self.bulk_bar.setVisible(enabled)
+        self.update_bulk_bar()
+
+    def selected_ids(self):
+        """ID выбранных кандзи и слов"""
+        kanji_ids, word_ids = [], []
+        for item in self.results_list_widget.selectedItems():
+            data = item.data(Qt.UserRole)
+            if isinstance(data, Kanji):
+                kanji_ids.append(data.id)
+            elif isinstance(data, Word):
+                word_ids.append(data.id)
+        return kanji_ids, word_ids
+
+    def update_bulk_bar(self):
+        kanji_ids, word_ids = self.selected_ids()
+        self.selection_label.setText(f"Выбрано: кандзи {len(kanji_ids)}, слов {len(word_ids)}")
+        for button in self.bulk_buttons:
+            button.setEnabled(bool(kanji_ids or word_ids))
+        # Уровень JLPT и компоненты есть только у кандзи
+        self.bulk_buttons[1].setEnabled(bool(kanji_ids))
+        self.bulk_buttons[3].setEnabled(bool(kanji_ids))
+
+    def run_bulk(self, description, func, *args):
+        for button in self.bulk_buttons:
+            button.setEnabled(False)
+        self.parent_window.run_db(func, *args, write=True,
+                                  on_result=lambda count: self.on_bulk_done(description, count),
+                                  on_error=self.on_bulk_error)
+
+    def on_bulk_done(self, description, count):
+        logger.info("%s: %d", description, count)
+        self.show_status_message(f"{description}: {count}")
+        self.refresh_results()
+        self.update_bulk_bar()
+
+    def on_bulk_error(self, error):
+        self.update_bulk_bar()
+        self.show_status_message(f"Ошибка: {error}", is_success=False)
+
+    @tracked_action()
+    def bulk_delete(self):
+        kanji_ids, word_ids = self.selected_ids()
+        reply = QMessageBox.question(
+            self, "Подтверждение удаления",
+            f"Удалить выбранные записи (кандзи: {len(kanji_ids)}, слов: {len(word_ids)})?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.run_bulk("Удалено записей", self.controller.delete_many, kanji_ids, word_ids)
+
+    @tracked_action()
+    def bulk_set_jlpt(self):
+        kanji_ids, _ = self.selected_ids()
+        level, ok = QInputDialog.getInt(self, "Уровень JLPT", "Уровень (0 - без уровня):", 5, 0, 5)
+        if ok:
+            self.run_bulk("Изменен уровень JLPT", self.controller.set_jlpt_many, kanji_ids, level or None)
+
+    @tracked_action()
+    def bulk_append_notes(self):
+        kanji_ids, word_ids = self.selected_ids()
+        text, ok = QInputDialog.getText(self, "Дописать заметку", "Текст:")
+        if ok and text.strip():
+            self.run_bulk("Дописана заметка", self.controller.append_notes_many, text.strip(), kanji_ids, word_ids)
+
+    @tracked_action()
+    def bulk_relink_components(self):
+        kanji_ids, _ = self.selected_ids()
+        old_char, ok = QInputDialog.getText(self, "Заменить компонент", "Заменяемый компонент (символ):")
+        if not ok or not old_char.strip():
+            return
+        new_char, ok = QInputDialog.getText(self, "Заменить компонент", "Новый компонент (символ):")
+        if not ok or not new_char.strip():
+            return
+        self.run_bulk("Заменен компонент", self.relink_components_by_character,
+                      kanji_ids, old_char.strip(), new_char.strip())
+
+    @tracked_action()
+    def bulk_enroll_study(self):
+        kanji_ids, word_ids = self.selected_ids()
+        self.run_bulk("Добавлено в изучение", self.controller.enroll_study, kanji_ids, word_ids)
+
+    def relink_components_by_character(self, kanji_ids, old_char, new_char):
+        """Выполняется в потоке базы: находит компоненты по символам и заменяет"""
+        old_component = self.controller.get_kanji_by_character(old_char)
+        new_component = self.controller.get_kanji_by_character(new_char)
+        missing = [char for char, kanji in ((old_char, old_component), (new_char, new_component)) if kanji is None]
+        if missing:
+            raise ValueError(f"Кандзи не найдено: {', '.join(missing)}")
+        return self.controller.relink_components_many(kanji_ids, old_component.id, new_component.id)
 
+    def show_status_message(self, message, is_success=True, duration=3000):
+        self.status_label.setText(message)
+        if is_success:
+            self.status_label.setStyleSheet("color: green; font-weight: bold;")
+        else:
+            self.status_label.setStyleSheet("color: red; font-weight: bold;")
+        self.status_label.show()
+        QTimer.singleShot(duration, self.status_label.hide)
+
+    @tracked_action()
     def on_result_clicked(self, item):
+        if self.select_button.isChecked():
+            # В режиме выбора щелчок только выделяет результат
+            return
         data = item.data(Qt.UserRole)
-        if data is not None:
-            print(f"SearchPage.on_result_clicked: Кликнут элемент с типом {type(data)}")
-            if isinstance(data, Word):
-                print(f"SearchPage.on_result_clicked: kanji_vocabulary ДО get_word_info: {getattr(data, 'kanji_vocabulary', 'N/A')}")
-                word_id = data.id
-                print(f"SearchPage.on_result_clicked: Запрашиваем полные данные для слова ID {word_id}")
-                full_word_data = self.controller.get_word_info(word_id)
-                print(f"SearchPage.on_result_clicked: full_word_ {full_word_data}")
-                if full_word_data is not None:
-                    print(f"SearchPage.on_result_clicked: kanji_vocabulary ПОСЛЕ get_word_info: {getattr(full_word_data, 'kanji_vocabulary', 'N/A')}")
-                    print(f"SearchPage.on_result_clicked: Длина kanji_vocabulary ПОСЛЕ get_word_info: {len(getattr(full_word_data, 'kanji_vocabulary', []))}")
-                    card_page = CardPage(self.parent_window, full_word_data, self.controller)
-                else:
-                    print(f"SearchPage.on_result_clicked: Не удалось получить полные данные для слова ID {word_id}")
-                    return
-            elif isinstance(data, Kanji):
-                print(f"SearchPage.on_result_clicked: radicals/vars ДО get_kanji_info:_rad={len(getattr(data, 'radicals', []))}, _var={len(getattr(data, 'variations', []))}")
-                kanji_id = data.id
-                print(f"SearchPage.on_result_clicked: Запрашиваем полные данные для кандзи ID {kanji_id}")
-                full_kanji_data = self.controller.get_kanji_info(kanji_id)
-                print(f"SearchPage.on_result_clicked: full_kanji_ {full_kanji_data}")
-                if full_kanji_data is not None:
-                    print(f"SearchPage.on_result_clicked: radicals/vars ПОСЛЕ get_kanji_info: _rad={len(getattr(full_kanji_data, 'radicals', []))}, _var={len(getattr(full_kanji_data, 'variations', []))}")
-                    card_page = CardPage(self.parent_window, full_kanji_data, self.controller)
-                else:
-                    print(f"SearchPage.on_result_clicked: Не удалось получить полные данные для кандзи ID {kanji_id}")
-                    return
-            else:
-                print(f"SearchPage.on_result_clicked: Неизвестный тип данных: {type(data)}")
-                return
-
-            self.parent_window.add_page_to_stack(card_page)
-            self.parent_window.show_current_page()
+        # Полные данные загружаются в потоке базы, карточка открывается по готовности
+        if isinstance(data, Word):
+            logger.debug("Запрашиваем полные данные для слова ID %s", data.id)
+            self.parent_window.open_word_card(data.id)
+        elif isinstance(data, Kanji):
+            logger.debug("Запрашиваем полные данные для кандзи ID %s", data.id)
+            self.parent_window.open_kanji_card(data.id)
+        elif data is not None:
+            logger.warning("Неизвестный тип данных элемента списка: %s", type(data))
         else:
-            print("Предупреждение: Элемент списка не содержит данных.")
+            logger.warning("Элемент списка не содержит данных.")
 
 
 class CardPage(QWidget):
+    # Пауза в наборе заметок, после которой они сохраняются
+    NOTES_AUTOSAVE_MS = 800
+
     def __init__(self, parent_window, data, kanji_controller):
         super().__init__()
         self.parent_window = parent_window
         self.data = data
         self.kanji_controller = kanji_controller
+        # Просмотр карточки записывается в журнал занятий при первом уходе с нее
+        self.opened_at = time.perf_counter()
+        self.view_logged = False
 
         layout = QVBoxLayout()
 
@@ -293,9 +553,20 @@ class CardPage(QWidget):
         self.notes_text_edit.setPlainText(self.data.notes or "")
         layout.addWidget(self.notes_text_edit)
 
-        save_notes_button = QPushButton("Сохранить заметки")
-        save_notes_button.clicked.connect(self.save_notes)
-        layout.addWidget(save_notes_button)
+        # Заметки сохраняются автоматически: после паузы в наборе, при уходе
+        # со страницы и при закрытии приложения. Одновременно в очереди базы
+        # не больше одной записи, и пишется только последний текст.
+        self.saved_notes = self.notes_text_edit.toPlainText()
+        self.notes_in_flight = None
+        self.notes_timer = QTimer(self)
+        self.notes_timer.setSingleShot(True)
+        self.notes_timer.setInterval(self.NOTES_AUTOSAVE_MS)
+        self.notes_timer.timeout.connect(self.save_notes)
+        self.notes_text_edit.textChanged.connect(self.notes_timer.start)
+
+        self.notes_status_label = QLabel("")
+        self.notes_status_label.setProperty("class", "card_text")
+        layout.addWidget(self.notes_status_label)
 
         edit_button = QPushButton("Редактировать")
         edit_button.clicked.connect(self.edit_item)
@@ -307,28 +578,70 @@ class CardPage(QWidget):
 
         self.setLayout(layout)
 
-    def save_notes(self):
+    @tracked_action()
+    def save_notes(self, force=False):
+        """
+        Ставит последний текст заметок в очередь на запись, если он изменился.
+
+        Пока предыдущая запись не выполнена, новая не ставится (текст будет
+        записан по ее завершении); force=True ставит запись сразу - при уходе
+        со страницы и закрытии приложения, когда ждать завершения некогда.
+        """
+        self.notes_timer.stop()
         new_notes = self.notes_text_edit.toPlainText()
-        success = self.kanji_controller.update_notes(self.data.id, new_notes, isinstance(self.data, Kanji))
+        if new_notes == (self.notes_in_flight if self.notes_in_flight is not None else self.saved_notes):
+            return
+        if self.notes_in_flight is not None and not force:
+            return
+        self.notes_in_flight = new_notes
+        # Страницы, открытые после этой (например, редактирование), видят последний текст
+        self.data.notes = new_notes
+        self.notes_status_label.setText("Сохранение...")
+        self.parent_window.run_db(self.kanji_controller.update_notes,
+                                  self.data.id, new_notes, isinstance(self.data, Kanji), write=True,
+                                  on_result=lambda success: self.on_notes_saved(success, new_notes),
+                                  on_error=lambda error: self.on_notes_saved(False, new_notes))
+
+    def flush_pending_writes(self):
+        """Вызывается окном перед уходом со страницы и перед закрытием"""
+        self.save_notes(force=True)
+        self.log_view()
+
+    def log_view(self):
+        if self.view_logged or self.data.id is None:
+            return
+        self.view_logged = True
+        from review_log import make_event
+        is_kanji = isinstance(self.data, Kanji)
+        self.parent_window.log_event(make_event(
+            'view', 'kanji' if is_kanji else 'word', self.data.id,
+            (time.perf_counter() - self.opened_at) * 1000, self.data.jlpt_level if is_kanji else None))
+
+    def on_notes_saved(self, success, new_notes):
+        if self.notes_in_flight == new_notes:
+            self.notes_in_flight = None
         if success:
-            self.data.notes = new_notes
-            print("CardPage: Заметки успешно обновлены в БД и локально.")
+            self.saved_notes = new_notes
+            if self.data.notes == new_notes:
+                self.data.mark_clean('notes')
+            logger.debug("Заметки сохранены в БД.")
+            self.notes_status_label.setText("Заметки сохранены")
+            # Пока запись выполнялась, текст мог измениться
+            if self.notes_text_edit.toPlainText() != new_notes and not self.notes_timer.isActive():
+                self.save_notes()
         else:
-            print("CardPage: Ошибка при сохранении заметок в БД.")
+            logger.error("Ошибка при сохранении заметок в БД.",
+                         extra={"context": {'operation': 'save_notes', 'item_id': self.data.id}})
+            self.notes_status_label.setText("Ошибка при сохранении заметок")
 
     def edit_item(self):
         edit_page = EditItemPage(self.parent_window, self.kanji_controller, self.data)
         self.parent_window.add_page_to_stack(edit_page)
         self.parent_window.show_current_page()
 
+    @tracked_action()
     def go_to_kanji_card(self, kanji_id):
-        kanji_data = self.kanji_controller.get_kanji_info(kanji_id)
-        if kanji_data is not None:
-            new_card_page = CardPage(self.parent_window, kanji_data, self.kanji_controller)
-            self.parent_window.add_page_to_stack(new_card_page)
-            self.parent_window.show_current_page()
-        else:
-            print(f"Ошибка: Не удалось загрузить данные для кандзи ID {kanji_id}")
+        self.parent_window.open_kanji_card(kanji_id)
 
 
 class EditItemPage(QWidget):
@@ -508,76 +821,72 @@ class EditItemPage(QWidget):
             self.status_label.show()
             QTimer.singleShot(duration, lambda: self.hide_status_message())
         else:
-            print("Предупреждение: status_label не найден.")
+            logger.warning("status_label не найден.")
 
     def hide_status_message(self):
         if hasattr(self, 'status_label'):
             self.status_label.hide()
             self.status_label.setText("")
         else:
-            print("Предупреждение: status_label не найден.")
+            logger.warning("status_label не найден.")
 
+    @tracked_action()
     def save_item(self):
         item_type = self.type_combo.currentText()
-        self.save_button.setEnabled(False)
-        self.save_button.setText("Сохранение...")
-
-        try:
-            success = False
-            if item_type == "Кандзи":
-                self.item_data.character = self.kanji_char_edit.text().strip()
-                self.item_data.meaning = self.kanji_meaning_edit.text().strip()
-                self.item_data.on_readings = self.kanji_on_edit.text().strip()
-                self.item_data.kun_readings = self.kanji_kun_edit.text().strip()
-                jlpt_level_str = self.kanji_jlpt_edit.text().strip()
-                self.item_data.jlpt_level = int(jlpt_level_str) if jlpt_level_str.isdigit() else None
-                self.item_data.is_complex = self.kanji_complex_combo.currentText() == "Да"
-                self.item_data.notes = self.kanji_notes_edit.toPlainText().strip()
-
-                success = self.controller.update_kanji(self.item_data)
-
-                if success:
-                    components_str = self.kanji_components_edit.text().strip()
-                    component_chars = [c.strip() for c in components_str.split(",")] if components_str else []
-                    self.controller.update_kanji_components(self.item_data.id, component_chars)
-
-                    variants_str = self.kanji_variants_edit.text().strip()
-                    variant_forms = [v.strip() for v in variants_str.split(",")] if variants_str else []
-                    self.controller.update_kanji_variants(self.item_data.id, variant_forms)
 
-                    self.show_status_message(f"Кандзи '{self.item_data.character}' успешно обновлено!")
-
-            elif item_type == "Слово":
-                self.item_data.japanese = self.word_jp_edit.text().strip()
-                self.item_data.reading = self.word_reading_edit.text().strip()
-                self.item_data.translation = self.word_trans_edit.text().strip()
-                self.item_data.notes = self.word_notes_edit_word.toPlainText().strip()
-
-                success = self.controller.update_vocabulary(self.item_data)
+        if item_type == "Кандзи":
+            self.item_data.character = self.kanji_char_edit.text().strip()
+            self.item_data.meaning = self.kanji_meaning_edit.text().strip()
+            self.item_data.on_readings = self.kanji_on_edit.text().strip()
+            self.item_data.kun_readings = self.kanji_kun_edit.text().strip()
+            jlpt_level_str = self.kanji_jlpt_edit.text().strip()
+            self.item_data.jlpt_level = int(jlpt_level_str) if jlpt_level_str.isdigit() else None
+            self.item_data.is_complex = self.kanji_complex_combo.currentText() == "Да"
+            self.item_data.notes = self.kanji_notes_edit.toPlainText().strip()
+
+            components_str = self.kanji_components_edit.text().strip()
+            component_chars = [c.strip() for c in components_str.split(",")] if components_str else []
+            variants_str = self.kanji_variants_edit.text().strip()
+            variant_forms = [v.strip() for v in variants_str.split(",")] if variants_str else []
+
+            call = (self.controller.update_kanji_full, self.item_data, variant_forms, component_chars)
+            item_name = self.item_data.character
+
+        elif item_type == "Слово":
+            self.item_data.japanese = self.word_jp_edit.text().strip()
+            self.item_data.reading = self.word_reading_edit.text().strip()
+            self.item_data.translation = self.word_trans_edit.text().strip()
+            self.item_data.notes = self.word_notes_edit_word.toPlainText().strip()
+
+            kanji_str = self.word_kanji_edit.text().strip()
+            kanji_chars = [k.strip() for k in kanji_str.split(",")] if kanji_str else []
+
+            call = (self.controller.update_vocabulary_full, self.item_data, kanji_chars)
+            item_name = self.item_data.japanese
+        else:
+            return
 
-                if success:
-                    kanji_str = self.word_kanji_edit.text().strip()
-                    kanji_chars = [k.strip() for k in kanji_str.split(",")] if kanji_str else []
-                    self.controller.update_word_kanji(self.item_data.id, kanji_chars)
+        self.save_button.setEnabled(False)
+        self.save_button.setText("Сохранение...")
+        self.parent_window.run_db(*call, write=True,
+                                  on_result=lambda success: self.on_item_saved(success, item_type, item_name),
+                                  on_error=self.on_save_error)
 
-                    self.show_status_message(f"Слово '{self.item_data.japanese}' успешно обновлено!")
+    def on_item_saved(self, success, item_type, item_name):
+        self.save_button.setEnabled(True)
+        self.save_button.setText("Сохранить")
+        if success:
+            logger.info("%s %r успешно обновлено", item_type, item_name)
+            self.parent_window.go_back()
+        else:
+            self.show_status_message("Ошибка при сохранении.", is_success=False)
 
-            if not success:
-                self.show_status_message("Ошибка при сохранении.", is_success=False)
-            else:
-                current_index = self.parent_window.stacked_widget.currentIndex()
-                self.parent_window.stacked_widget.removeWidget(self.parent_window.stacked_widget.currentWidget())
-                self.parent_window.page_stack.pop()
-                self.parent_window.show_current_page()
-
-        except ValueError as e:
-            self.show_status_message(f"Ошибка ввода: {e}", is_success=False)
-        except Exception as e:
-            self.show_status_message(f"Ошибка: {e}", is_success=False)
-        finally:
-            self.save_button.setEnabled(True)
-            self.save_button.setText("Сохранить")
+    def on_save_error(self, error):
+        self.save_button.setEnabled(True)
+        self.save_button.setText("Сохранить")
+        self.show_status_message(f"Ошибка: {error}", is_success=False)
 
+    @tracked_action()
     def delete_item(self):
         item_type = self.type_combo.currentText()
         item_name = self.item_data.character if isinstance(self.item_data, Kanji) else self.item_data.japanese
@@ -591,17 +900,21 @@ class EditItemPage(QWidget):
         )
 
         if reply == QMessageBox.StandardButton.Yes:
-            success = False
             if item_type == "Кандзи":
-                success = self.controller.delete_kanji(self.item_data.id)
-            elif item_type == "Слово":
-                success = self.controller.delete_vocabulary(self.item_data.id)
-
-            if success:
-                self.show_status_message(f"{item_type} '{item_name}' успешно удалено!", is_success=True)
-                self.parent_window.go_back_to_search_page()
+                delete = self.controller.delete_kanji_cascade
             else:
-                self.show_status_message("Ошибка при удалении.", is_success=False)
+                delete = self.controller.delete_vocabulary_cascade
+            self.delete_button.setEnabled(False)
+            self.parent_window.run_db(delete, self.item_data.id, write=True,
+                                      on_result=lambda success: self.on_item_deleted(success, item_type, item_name))
+
+    def on_item_deleted(self, success, item_type, item_name):
+        self.delete_button.setEnabled(True)
+        if success:
+            logger.info("%s %r успешно удалено", item_type, item_name)
+            self.parent_window.go_back_to_search_page()
+        else:
+            self.show_status_message("Ошибка при удалении.", is_success=False)
 
 
 class AddItemPage(QWidget):
@@ -738,101 +1051,130 @@ class AddItemPage(QWidget):
             self.status_label.show()
             QTimer.singleShot(duration, lambda: self.hide_status_message())
         else:
-            print("Предупреждение: status_label не найден.")
+            logger.warning("status_label не найден.")
 
     def hide_status_message(self):
         if hasattr(self, 'status_label'):
             self.status_label.hide()
             self.status_label.setText("")
         else:
-            print("Предупреждение: status_label не найден.")
+            logger.warning("status_label не найден.")
 
+    @tracked_action()
     def create_item(self):
         item_type = self.type_combo.currentText()
+
+        if item_type == "Кандзи":
+            char = self.kanji_char_edit.text().strip()
+            if not char:
+                self.show_status_message("Кандзи не может быть пустым.", is_success=False)
+                return
+            meaning = self.kanji_meaning_edit.text().strip()
+            on_readings = self.kanji_on_edit.text().strip()
+            kun_readings = self.kanji_kun_edit.text().strip()
+            jlpt_level_str = self.kanji_jlpt_edit.text().strip()
+            jlpt_level = int(jlpt_level_str) if jlpt_level_str.isdigit() else None
+            is_complex = self.kanji_complex_combo.currentText() == "Да"
+            notes = self.kanji_notes_edit.toPlainText().strip()
+
+            new_kanji = Kanji(
+                character=char, meaning=meaning, on_readings=on_readings,
+                kun_readings=kun_readings, jlpt_level=jlpt_level,
+                is_complex=is_complex, notes=notes
+            )
+
+            components_str = self.kanji_components_edit.text().strip()
+            component_chars = [c.strip() for c in components_str.split(",")] if components_str else []
+            variants_str = self.kanji_variants_edit.text().strip()
+            variant_forms = [v.strip() for v in variants_str.split(",")] if variants_str else []
+
+            call = (self.controller.add_kanji_with_details, new_kanji, variant_forms, component_chars)
+            created_name = char
+
+        elif item_type == "Слово":
+            japanese = self.word_jp_edit.text().strip()
+            if not japanese:
+                self.show_status_message("Японское слово не может быть пустым.", is_success=False)
+                return
+            reading = self.word_reading_edit.text().strip()
+            translation = self.word_trans_edit.text().strip()
+            notes = self.word_notes_edit.toPlainText().strip()
+
+            new_word = Word(
+                japanese=japanese, reading=reading, translation=translation, notes=notes
+            )
+
+            kanji_str = self.word_kanji_edit.text().strip()
+            kanji_chars = [k.strip() for k in kanji_str.split(",")] if kanji_str else []
+
+            call = (self.controller.add_vocabulary_with_details, new_word, kanji_chars)
+            created_name = japanese
+        else:
+            return
+
         self.create_button.setEnabled(False)
         self.create_button.setText("Создание...")
+        self.parent_window.run_db(*call, write=True,
+                                  on_result=lambda created_id: self.on_item_created(created_id, item_type, created_name),
+                                  on_error=self.on_create_error)
+
+    def on_item_created(self, created_id, item_type, created_name):
+        self.create_button.setEnabled(True)
+        self.create_button.setText("Создать")
+        if created_id:
+            logger.info("%s %r успешно добавлено с ID %s.", item_type, created_name, created_id)
+            self.show_status_message(f"{item_type} '{created_name}' (ID: {created_id}) создано!")
+        else:
+            self.show_status_message("Ошибка при создании.", is_success=False)
 
-        try:
-            success = False
-            created_id = None
-            created_name = ""
+    def on_create_error(self, error):
+        self.create_button.setEnabled(True)
+        self.create_button.setText("Создать")
+        self.show_status_message(f"Ошибка: {error}", is_success=False)
 
-            if item_type == "Кандзи":
-                char = self.kanji_char_edit.text().strip()
-                if not char:
-                    self.show_status_message("Кандзи не может быть пустым.", is_success=False)
-                    return
-                meaning = self.kanji_meaning_edit.text().strip()
-                on_readings = self.kanji_on_edit.text().strip()
-                kun_readings = self.kanji_kun_edit.text().strip()
-                jlpt_level_str = self.kanji_jlpt_edit.text().strip()
-                jlpt_level = int(jlpt_level_str) if jlpt_level_str.isdigit() else None
-                is_complex = self.kanji_complex_combo.currentText() == "Да"
-                notes = self.kanji_notes_edit.toPlainText().strip()
-
-                new_kanji = Kanji(
-                    character=char, meaning=meaning, on_readings=on_readings,
-                    kun_readings=kun_readings, jlpt_level=jlpt_level,
-                    is_complex=is_complex, notes=notes
-                )
-
-                kanji_id = self.controller.add_kanji_with_details(new_kanji)
-
-                if kanji_id:
-                    print(f"Кандзи '{char}' успешно добавлен с ID {kanji_id}.")
-                    created_id = kanji_id
-                    created_name = char
-                    success = True
-
-                    components_str = self.kanji_components_edit.text().strip()
-                    if components_str:
-                        component_chars = [c.strip() for c in components_str.split(",")]
-                        self.controller.link_kanji_components(kanji_id, component_chars)
-
-                    variants_str = self.kanji_variants_edit.text().strip()
-                    if variants_str:
-                        variant_forms = [v.strip() for v in variants_str.split(",")]
-                        self.controller.link_kanji_variants(kanji_id, variant_forms)
-
-            elif item_type == "Слово":
-                japanese = self.word_jp_edit.text().strip()
-                if not japanese:
-                    self.show_status_message("Японское слово не может быть пустым.", is_success=False)
-                    return
-                reading = self.word_reading_edit.text().strip()
-                translation = self.word_trans_edit.text().strip()
-                notes = self.word_notes_edit.toPlainText().strip()
-
-                new_word = Word(
-                    japanese=japanese, reading=reading, translation=translation, notes=notes
-                )
-
-                word_id = self.controller.add_vocabulary_with_details(new_word)
-
-                if word_id:
-                    print(f"Слово '{japanese}' успешно добавлено с ID {word_id}.")
-                    created_id = word_id
-                    created_name = japanese
-                    success = True
-
-                    kanji_str = self.word_kanji_edit.text().strip()
-                    if kanji_str:
-                        kanji_chars = [k.strip() for k in kanji_str.split(",")]
-                        self.controller.link_word_kanji(word_id, kanji_chars)
-
-            if success:
-                self.show_status_message(f"{item_type} '{created_name}' (ID: {created_id}) создано!")
-
-        except ValueError as e:
-            self.show_status_message(f"Ошибка ввода: {e}", is_success=False)
-        except Exception as e:
-            self.show_status_message(f"Ошибка: {e}", is_success=False)
-        finally:
-            self.create_button.setEnabled(True)
-            self.create_button.setText("Создать")
+
+class DbResultBridge(QObject):
+    """
+    Доставляет результаты потока базы данных в главный поток.
+
+    Future завершается в потоке базы, сигнал с ним ставится в очередь событий
+    главного потока, и обработчики страниц вызываются уже там.
+    """
+    finished = Signal(object, object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.finished.connect(self.deliver)
+
+    def watch(self, future, on_result=None, on_error=None):
+        future.add_done_callback(lambda done: self.finished.emit(done, on_result, on_error))
+
+    def deliver(self, future, on_result, on_error):
+        if future.cancelled():
+            return
+        error = future.exception()
+        try:
+            if error is None:
+                if on_result is not None:
+                    on_result(future.result())
+            elif on_error is not None:
+                on_error(error)
+            else:
+                logger.error("Ошибка в потоке базы данных: %s", error, exc_info=error)
+        except RuntimeError as e:
+            # Страница, ожидавшая результат, уже закрыта и удалена
+            logger.debug("Результат запроса к базе не доставлен: %s", e)
 
 
 class MainWindow(QMainWindow):
+    HEARTBEAT_MS = 50
+    # Как часто проверять, можно ли выполнить шаг обслуживания базы
+    MAINTENANCE_CHECK_MS = 5000
+    # События, которые считаются действием пользователя (откладывают обслуживание)
+    USER_ACTIVITY_EVENTS = (QEvent.KeyPress, QEvent.MouseButtonPress, QEvent.Wheel)
+    # Неполная пачка событий журнала занятий записывается через эту паузу
+    REVIEW_LOG_FLUSH_MS = 10000
+
     def __init__(self, db_name="kanji.db"):
         super().__init__()
         self.setWindowTitle("Изучение Кандзи")
@@ -843,13 +1185,146 @@ class MainWindow(QMainWindow):
 
         self.page_stack = []
 
-        self.kanji_controller = KanjiController(db_name)
-
-        self.load_stylesheet("styles.qss")
+        # Контроллер и поток базы создаются после первой отрисовки окна (finish_startup)
+        # или при первом обращении, если пользователь успел нажать кнопку раньше
+        self.db_name = db_name
+        self._kanji_controller = None
+        self._db_worker = None
+        self._schema_ready = None
+        self.db_bridge = DbResultBridge(self)
+
+        # Сторожевой таймер: удары из цикла событий, зависания пишутся в журнал со стеком
+        self.stall_watchdog = StallWatchdog(interval_ms=self.HEARTBEAT_MS)
+        self.heartbeat_timer = QTimer(self)
+        self.heartbeat_timer.timeout.connect(self.stall_watchdog.beat)
+        self.heartbeat_timer.start(self.HEARTBEAT_MS)
+        self.stall_watchdog.start()
 
         self.add_page_to_stack(StartPage(self))
         self.show_current_page()
 
+        # finish_startup планируется из первой отрисовки окна (paintEvent):
+        # таймер, запущенный здесь, сработал бы до показа окна
+        self._startup_scheduled = False
+
+        # Обслуживание базы в простое (создается в finish_startup)
+        self.maintenance = None
+        self.maintenance_scheduler = None
+        self.maintenance_timer = QTimer(self)
+        self.maintenance_timer.timeout.connect(self.run_maintenance_step)
+
+        # События журнала занятий (повторения, просмотры карточек) копятся и записываются пачками
+        self.review_log = None
+        self.review_log_timer = QTimer(self)
+        self.review_log_timer.setSingleShot(True)
+        self.review_log_timer.timeout.connect(self.flush_review_log)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._startup_scheduled:
+            self._startup_scheduled = True
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        """Отложенная часть запуска: таблица стилей, открытие базы и проверка схемы"""
+        self.load_stylesheet("styles.qss")
+        self.ensure_database()
+        self.start_maintenance()
+
+    def start_maintenance(self):
+        """Запускает обслуживание базы, которое выполняется шагами, пока пользователь бездействует"""
+        from maintenance import DatabaseMaintenance, MaintenanceScheduler
+
+        self.maintenance = DatabaseMaintenance(self._kanji_controller.db_manager)
+        self.maintenance_scheduler = MaintenanceScheduler(self.maintenance)
+        QApplication.instance().installEventFilter(self)
+        self.maintenance_timer.start(self.MAINTENANCE_CHECK_MS)
+
+    def eventFilter(self, obj, event):
+        if self.maintenance_scheduler is not None and event.type() in self.USER_ACTIVITY_EVENTS:
+            self.maintenance_scheduler.user_active()
+        return super().eventFilter(obj, event)
+
+    def run_maintenance_step(self):
+        """Отправляет в поток базы следующий шаг обслуживания, если пользователь бездействует и очередь пуста"""
+        scheduler = self.maintenance_scheduler
+        if scheduler is None or self.db_worker.stats()['queued']:
+            return
+        step = scheduler.next_step()
+        if step is None:
+            return
+        self.run_db(self.maintenance.run_step, step,
+                    on_result=lambda result: self.on_maintenance_step_done(step, result),
+                    on_error=lambda error: scheduler.step_failed(step, error))
+
+    def on_maintenance_step_done(self, step, result):
+        scheduler = self.maintenance_scheduler
+        if scheduler is None:
+            # Окно уже закрывается
+            return
+        scheduler.step_finished(step, result)
+        # Шаги цикла идут подряд, пока пользователь бездействует
+        if scheduler.in_progress:
+            QTimer.singleShot(0, self.run_maintenance_step)
+
+    def ensure_database(self):
+        """
+        Создает контроллер и поток базы, если они еще не созданы.
+        Проверка схемы (initialize_database) выполняется в потоке базы первой задачей.
+        """
+        if self._kanji_controller is not None:
+            return
+        from controller import KanjiController
+        from db_worker import DatabaseWorker
+
+        self._kanji_controller = KanjiController(self.db_name)
+        # Запросы к базе из обработчиков GUI выполняются в отдельном потоке
+        self._db_worker = DatabaseWorker(self._kanji_controller.db_manager)
+        self._db_worker.start()
+        self._schema_ready = self._db_worker.submit_write(self._kanji_controller.db_manager.initialize_database)
+
+    @property
+    def kanji_controller(self):
+        """Контроллер; при первом обращении до окончания запуска дожидается проверки схемы"""
+        self.ensure_database()
+        if not self._schema_ready.done():
+            self._schema_ready.result()
+        return self._kanji_controller
+
+    @property
+    def db_worker(self):
+        self.ensure_database()
+        return self._db_worker
+
+    def closeEvent(self, event):
+        self.heartbeat_timer.stop()
+        self.maintenance_timer.stop()
+        self.maintenance_scheduler = None
+        self.stall_watchdog.stop()
+        for index in range(self.stacked_widget.count()):
+            self.flush_page(self.stacked_widget.widget(index))
+        self.flush_review_log()
+        # Дожидаемся фиксации уже поставленных в очередь записей
+        if self._db_worker is not None:
+            self._db_worker.stop()
+        if self._kanji_controller is not None:
+            self._kanji_controller.db_manager.close()
+        super().closeEvent(event)
+
+    def run_db(self, func, *args, write=False, on_result=None, on_error=None):
+        """
+        Выполняет func(*args) в потоке базы данных.
+
+        on_result и on_error вызываются в главном потоке, когда результат готов.
+        write=True помечает запрос как запись (допускает групповую фиксацию).
+        """
+        if write:
+            future = self.db_worker.submit_write(func, *args)
+        else:
+            future = self.db_worker.submit(func, *args)
+        self.db_bridge.watch(future, on_result, on_error)
+        return future
+
     def load_stylesheet(self, relative_path):
         path = resource_path(relative_path)
         style_file = QFile(path)
@@ -858,11 +1333,86 @@ class MainWindow(QMainWindow):
             stylesheet = stream.readAll()
             style_file.close()
             self.setStyleSheet(stylesheet)
-            print(f"Таблица стилей загружена из {path}")
+            logger.debug("Таблица стилей загружена из %s", path)
+        else:
+            logger.warning("Не удалось загрузить таблицу стилей из %s", path)
+
+    def open_kanji_card(self, kanji_id):
+        """Загружает кандзи в потоке базы и открывает его карточку"""
+        self.run_db(self.kanji_controller.get_kanji_info, kanji_id,
+                    on_result=lambda kanji_data: self.on_kanji_card_loaded(kanji_id, kanji_data))
+
+    def on_kanji_card_loaded(self, kanji_id, kanji_data):
+        if kanji_data is not None:
+            self.add_page_to_stack(CardPage(self, kanji_data, self.kanji_controller))
+            self.show_current_page()
         else:
-            print(f"Не удалось загрузить таблицу стилей из {path}")
+            logger.warning("Не удалось загрузить данные для кандзи ID %s", kanji_id)
+
+    def open_word_card(self, word_id):
+        """Загружает слово в потоке базы и открывает его карточку"""
+        self.run_db(self.kanji_controller.get_word_info, word_id,
+                    on_result=lambda word_data: self.on_word_card_loaded(word_id, word_data))
+
+    def on_word_card_loaded(self, word_id, word_data):
+        if word_data is not None:
+            self.add_page_to_stack(CardPage(self, word_data, self.kanji_controller))
+            self.show_current_page()
+        else:
+            logger.warning("Не удалось загрузить данные для слова ID %s", word_id)
+
+    def go_to_grid(self, tiles=None, title="Сетка кандзи"):
+        # Сетка тянет пул отрисовки и кэш символов - загружаем ее по требованию
+        from kanji_grid import KanjiGridPage
+        self.add_page_to_stack(KanjiGridPage(self, self.kanji_controller, tiles, title))
+        self.show_current_page()
+
+    def log_event(self, event):
+        """Добавляет событие в журнал занятий (запись - пачкой, см. review_log)"""
+        if self.review_log is None:
+            from review_log import ReviewLogBuffer
+            self.review_log = ReviewLogBuffer()
+        if self.review_log.append(event):
+            self.flush_review_log()
+        elif not self.review_log_timer.isActive():
+            self.review_log_timer.start(self.REVIEW_LOG_FLUSH_MS)
+
+    def flush_review_log(self):
+        """Ставит накопленные события журнала в очередь на запись"""
+        self.review_log_timer.stop()
+        if not self.review_log:
+            return
+        events = self.review_log.take()
+        self.run_db(self.kanji_controller.record_review_events, events, write=True,
+                    on_error=lambda error: self.on_review_log_error(events, error))
+
+    def on_review_log_error(self, events, error):
+        logger.error("Ошибка записи журнала занятий: %s", error,
+                     extra={"context": {'operation': 'record_review_events', 'count': len(events)}})
+        self.review_log.restore(events)
+        self.review_log_timer.start(self.REVIEW_LOG_FLUSH_MS)
+
+    def go_to_statistics(self):
+        # Записанные события должны попасть в статистику, которую страница сейчас прочитает
+        self.flush_review_log()
+        from statistics_page import StatisticsPage
+        self.add_page_to_stack(StatisticsPage(self, self.kanji_controller))
+        self.show_current_page()
+
+    def go_to_study(self):
+        # Страница повторения загружается по требованию, как сетка
+        from study_page import StudyPage
+        self.add_page_to_stack(StudyPage(self, self.kanji_controller))
+        self.show_current_page()
+
+    def flush_page(self, page):
+        """Записывает несохраненные изменения страницы (например, заметки) перед уходом с нее"""
+        flush = getattr(page, "flush_pending_writes", None)
+        if flush is not None:
+            flush()
 
     def add_page_to_stack(self, page):
+        self.flush_page(self.stacked_widget.currentWidget())
         index = self.stacked_widget.addWidget(page)
         self.page_stack.append(index)
 
@@ -873,7 +1423,11 @@ class MainWindow(QMainWindow):
 
     def go_back(self):
         if len(self.page_stack) > 1:
-            self.stacked_widget.removeWidget(self.stacked_widget.currentWidget())
+            page = self.stacked_widget.currentWidget()
+            self.flush_page(page)
+            self.stacked_widget.removeWidget(page)
+            # Закрытые страницы больше не используются - освобождаем их вместе с таймерами
+            page.deleteLater()
             self.page_stack.pop()
             self.show_current_page()
 
@@ -885,7 +1439,9 @@ class MainWindow(QMainWindow):
             return
 
         while len(self.page_stack) > 1:
+            self.flush_page(current_widget)
             self.stacked_widget.removeWidget(current_widget)
+            current_widget.deleteLater()
             self.page_stack.pop()
 
             current_widget = self.stacked_widget.currentWidget()
@@ -899,6 +1455,7 @@ class MainWindow(QMainWindow):
 
 
 if __name__ == "__main__":
+    setup_logging()
     app = QApplication(sys.argv)
     window = MainWindow(db_name="kanji.db")
     window.show()
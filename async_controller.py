@@ -0,0 +1,223 @@
+# async_controller.py
+"""
+Асинхронный фасад над KanjiController для сервисов на asyncio.
+
+Блокирующие методы контроллера выполняются в пуле потоков ограниченного
+размера. За каждым потоком пула закрепляется свое соединение с базой, поэтому
+параллельные чтения не открывают соединение на каждый вызов. Все записи идут
+через отдельный пул из одного потока: SQLite допускает только одного писателя,
+и очередь в Python дешевле ожидания блокировки базы.
+
+Отмена корутины отменяет вызов, если он еще не начался, а если уже
+выполняется - прерывает текущий запрос SQLite (Connection.interrupt).
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+from controller import KanjiController
+from entities import ComponentNode, Kanji, Word
+
+DEFAULT_MAX_WORKERS = 4
+
+
+class _Call:
+    """Вызов в потоке пула; помнит соединение, пока выполняется, чтобы его можно было прервать."""
+
+    def __init__(self, controller: KanjiController, func: Callable, args: tuple) -> None:
+        self._controller = controller
+        self._func = func
+        self._args = args
+        self._conn = None
+        self._thread_id = None
+        self._lock = threading.Lock()
+
+    def run(self):
+        conn = self._controller.db_manager.pin_connection()
+        with self._lock:
+            self._conn = conn
+            self._thread_id = threading.get_ident()
+        try:
+            return self._func(*self._args)
+        finally:
+            with self._lock:
+                self._conn = None
+
+    def interrupt(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.interrupt()
+                # Чтение могло идти по копии базы в памяти
+                self._controller.db_manager.interrupt_snapshot_read(self._thread_id)
+
+
+class AsyncKanjiController:
+    """
+    Асинхронные версии методов KanjiController.
+
+    Пример:
+        async with AsyncKanjiController("kanji.db") as controller:
+            kanji, words = await controller.search("jlpt:5 has:木")
+            cards = await controller.get_kanji_info_many([1, 2, 3])
+
+    Attributes:
+        controller (KanjiController): Синхронный контроллер, который выполняет работу.
+    """
+
+    def __init__(self, controller: Union[KanjiController, str] = "kanji.db",
+                 max_workers: int = DEFAULT_MAX_WORKERS, snapshot: Optional[bool] = None) -> None:
+        # Контроллер, созданный здесь, закрывается вместе с фасадом
+        self._owns_controller = isinstance(controller, str)
+        if self._owns_controller:
+            controller = KanjiController(controller, snapshot=snapshot)
+        self.controller = controller
+        pin = controller.db_manager.pin_connection
+        self._readers = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="kanji-read",
+                                           initializer=pin)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kanji-write",
+                                          initializer=pin)
+
+    async def __aenter__(self) -> "AsyncKanjiController":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Дожидается завершения начатых вызовов и останавливает пулы."""
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def close(self) -> None:
+        self._readers.shutdown(wait=True, cancel_futures=True)
+        self._writer.shutdown(wait=True)
+        if self._owns_controller:
+            self.controller.db_manager.close()
+
+    async def _run(self, executor: ThreadPoolExecutor, func: Callable, *args):
+        call = _Call(self.controller, func, args)
+        future = executor.submit(call.run)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if not future.cancel():
+                call.interrupt()
+            raise
+
+    def _read(self, func: Callable, *args):
+        return self._run(self._readers, func, *args)
+
+    def _write(self, func: Callable, *args):
+        return self._run(self._writer, func, *args)
+
+    # --- Поиск ---
+
+    async def search(self, query: str) -> Tuple[List[Kanji], List[Word]]:
+        return await self._read(self.controller.search, query)
+
+    async def search_kanji(self, query: str) -> List[Kanji]:
+        return await self._read(self.controller.search_kanji, query)
+
+    async def search_vocabulary(self, query: str) -> List[Word]:
+        return await self._read(self.controller.search_vocabulary, query)
+
+    async def fuzzy_search_meaning(self, query: str, limit: int = 50) -> Tuple[List[Kanji], List[Word]]:
+        return await self._read(self.controller.fuzzy_search_meaning, query, limit)
+
+    async def search_many(self, queries: Sequence[str]) -> List[Tuple[List[Kanji], List[Word]]]:
+        """Выполняет несколько поисков параллельно; результаты в порядке запросов."""
+        return list(await asyncio.gather(*(self.search(query) for query in queries)))
+
+    # --- Чтение ---
+
+    async def check_data_version(self) -> Optional[int]:
+        return await self._read(self.controller.check_data_version)
+
+    async def get_kanji_info(self, kanji_id: int) -> Optional[Kanji]:
+        return await self._read(self.controller.get_kanji_info, kanji_id)
+
+    async def get_word_info(self, word_id: int) -> Optional[Word]:
+        return await self._read(self.controller.get_word_info, word_id)
+
+    async def get_component_tree(self, kanji_id: int) -> Optional[ComponentNode]:
+        return await self._read(self.controller.get_component_tree, kanji_id)
+
+    async def get_kanji_by_character(self, character: str) -> Optional[Kanji]:
+        return await self._read(self.controller.get_kanji_by_character, character)
+
+    async def lookup_reading(self, reading: str) -> Tuple[List[Kanji], List[Word]]:
+        return await self._read(self.controller.lookup_reading, reading)
+
+    async def get_kanji_info_many(self, kanji_ids: Sequence[int]) -> List[Optional[Kanji]]:
+        return list(await asyncio.gather(*(self.get_kanji_info(kanji_id) for kanji_id in kanji_ids)))
+
+    async def get_word_info_many(self, word_ids: Sequence[int]) -> List[Optional[Word]]:
+        return list(await asyncio.gather(*(self.get_word_info(word_id) for word_id in word_ids)))
+
+    # --- Запись ---
+
+    async def initialize_database(self) -> None:
+        await self._write(self.controller.db_manager.initialize_database)
+
+    async def add_kanji_with_details(self, kanji_obj: Kanji, variants: List[str] = None,
+                                     components: List[str] = None) -> Optional[int]:
+        return await self._write(self.controller.add_kanji_with_details, kanji_obj, variants, components)
+
+    async def add_vocabulary_with_details(self, word_obj: Word, kanji_chars: List[str] = None) -> Optional[int]:
+        return await self._write(self.controller.add_vocabulary_with_details, word_obj, kanji_chars)
+
+    async def update_kanji_full(self, kanji_obj: Kanji, new_variants: List[str] = None,
+                                new_components: List[str] = None) -> bool:
+        return await self._write(self.controller.update_kanji_full, kanji_obj, new_variants, new_components)
+
+    async def update_vocabulary_full(self, word_obj: Word, new_kanji_chars: List[str] = None) -> bool:
+        return await self._write(self.controller.update_vocabulary_full, word_obj, new_kanji_chars)
+
+    async def update_notes(self, item_id: int, new_notes: str, is_kanji: bool) -> bool:
+        return await self._write(self.controller.update_notes, item_id, new_notes, is_kanji)
+
+    async def delete_kanji_cascade(self, kanji_id: int) -> bool:
+        return await self._write(self.controller.delete_kanji_cascade, kanji_id)
+
+    async def delete_vocabulary_cascade(self, word_id: int) -> bool:
+        return await self._write(self.controller.delete_vocabulary_cascade, word_id)
+
+    # --- Пакетные операции ---
+
+    async def delete_many(self, kanji_ids: Sequence[int] = (), word_ids: Sequence[int] = ()) -> int:
+        return await self._write(self.controller.delete_many, list(kanji_ids), list(word_ids))
+
+    async def set_jlpt_many(self, kanji_ids: Sequence[int], jlpt_level: Optional[int]) -> int:
+        return await self._write(self.controller.set_jlpt_many, list(kanji_ids), jlpt_level)
+
+    async def append_notes_many(self, text: str, kanji_ids: Sequence[int] = (),
+                                word_ids: Sequence[int] = ()) -> int:
+        return await self._write(self.controller.append_notes_many, text, list(kanji_ids), list(word_ids))
+
+    async def relink_components_many(self, kanji_ids: Optional[Sequence[int]], old_component_id: int,
+                                     new_component_id: int) -> int:
+        return await self._write(self.controller.relink_components_many,
+                                 None if kanji_ids is None else list(kanji_ids), old_component_id, new_component_id)
+
+    def _add_many(self, add: Callable, items: Sequence[tuple]) -> List[Optional[int]]:
+        # Каждое add_*_with_details - вложенная транзакция (SAVEPOINT): не добавленный
+        # элемент откатывается целиком, остальные фиксируются вместе
+        with self.controller.db_manager.transaction():
+            return [add(*item) for item in items]
+
+    async def add_kanji_many(self, items: Sequence[Tuple[Kanji, List[str], List[str]]]) -> List[Optional[int]]:
+        """
+        Добавляет несколько кандзи одной транзакцией.
+
+        Args:
+            items: Кортежи (кандзи, варианты написания, символы компонентов).
+
+        Returns:
+            ID добавленных кандзи (None для не добавленных) в порядке items.
+        """
+        return await self._write(self._add_many, self.controller.add_kanji_with_details, items)
+
+    async def add_vocabulary_many(self, items: Sequence[Tuple[Word, List[str]]]) -> List[Optional[int]]:
+        """Добавляет несколько слов (кортежи: слово, символы кандзи) одной транзакцией."""
+        return await self._write(self._add_many, self.controller.add_vocabulary_with_details, items)
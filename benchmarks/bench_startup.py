@@ -0,0 +1,154 @@
+# benchmarks/bench_startup.py
+"""
+Бюджет холодного запуска приложения.
+
+Измеряет:
+    1. Время импорта KanjiApp (python -X importtime, в отдельном процессе,
+       чтобы модули не были уже загружены) и самые тяжелые модули.
+    2. Время до первой отрисовки главного окна: от создания MainWindow до
+       первого события Paint (платформа Qt offscreen, дисплей не нужен).
+
+Проверяет, что контроллер не создается до первой отрисовки.
+Завершается с кодом 1, если бюджет превышен.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --import-budget-ms 400 --paint-budget-ms 300
+
+Бюджеты по умолчанию можно переопределить переменными окружения
+KANJIAPP_IMPORT_BUDGET_MS и KANJIAPP_PAINT_BUDGET_MS.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_IMPORT_BUDGET_MS = float(os.environ.get("KANJIAPP_IMPORT_BUDGET_MS", "600"))
+DEFAULT_PAINT_BUDGET_MS = float(os.environ.get("KANJIAPP_PAINT_BUDGET_MS", "500"))
+
+# Строка вывода -X importtime: "import time:  self [us] | cumulative | imported package"
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)")
+
+# Модули, которые не должны загружаться до первой отрисовки
+DEFERRED_MODULES = ("controller", "database", "stemming", "deinflection", "diagnostics_page",
+                    "kanji_grid", "maintenance", "srs", "study_page", "review_log",
+                    "statistics_page")
+
+
+def measure_import(module: str = "KanjiApp", top: int = 10):
+    """Возвращает (суммарное время импорта модуля в мс, список самых тяжелых модулей)"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=REPO_ROOT, capture_output=True, text=True,
+                            env=dict(os.environ, QT_QPA_PLATFORM="offscreen"))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+
+    total_us = 0
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, name = int(match.group(1)), int(match.group(2)), match.group(3)
+        modules.append((self_us, name))
+        if name == module:
+            total_us = cumulative_us
+    heaviest = sorted(modules, reverse=True)[:top]
+    return total_us / 1000.0, heaviest
+
+
+def measure_first_paint():
+    """
+    Создает MainWindow и ждет первой отрисовки.
+
+    Returns:
+        (время до первой отрисовки в мс, был ли создан контроллер до отрисовки)
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, REPO_ROOT)
+    from PySide6.QtCore import QEvent, QObject
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication([])
+    import KanjiApp
+
+    class PaintWatcher(QObject):
+        def __init__(self):
+            super().__init__()
+            self.window = None
+            self.painted_at = None
+            self.controller_before_paint = False
+
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and self.painted_at is None:
+                self.painted_at = time.perf_counter()
+                self.controller_before_paint = getattr(self.window, "_kanji_controller", None) is not None
+            return False
+
+    watcher = PaintWatcher()
+    app.installEventFilter(watcher)
+
+    start = time.perf_counter()
+    window = watcher.window = KanjiApp.MainWindow(db_name=os.path.join(REPO_ROOT, "bench_startup.db"))
+    window.show()
+    deadline = start + 10.0
+    while watcher.painted_at is None and time.perf_counter() < deadline:
+        app.processEvents()
+    app.removeEventFilter(watcher)
+
+    paint_ms = ((watcher.painted_at or time.perf_counter()) - start) * 1000.0
+    window.close()
+    return paint_ms, watcher.controller_before_paint
+
+
+def _imported_eagerly(module: str) -> bool:
+    """Проверяет в отдельном процессе, загружается ли module вместе с KanjiApp"""
+    code = f"import sys, KanjiApp; sys.exit(0 if {module!r} in sys.modules else 1)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True,
+                            env=dict(os.environ, QT_QPA_PLATFORM="offscreen"))
+    return result.returncode == 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бюджет холодного запуска KanjiApp")
+    parser.add_argument("--import-budget-ms", type=float, default=DEFAULT_IMPORT_BUDGET_MS)
+    parser.add_argument("--paint-budget-ms", type=float, default=DEFAULT_PAINT_BUDGET_MS)
+    args = parser.parse_args(argv)
+
+    failures = []
+
+    import_ms, heaviest = measure_import()
+    print(f"Импорт KanjiApp: {import_ms:.1f} мс (бюджет {args.import_budget_ms:.0f} мс)")
+    for self_us, name in heaviest:
+        print(f"    {self_us / 1000.0:8.1f} мс  {name}")
+    if import_ms > args.import_budget_ms:
+        failures.append("импорт")
+    for module in DEFERRED_MODULES:
+        if _imported_eagerly(module):
+            failures.append(f"модуль {module} загружается вместе с KanjiApp")
+
+    paint_ms, controller_before_paint = measure_first_paint()
+    print(f"До первой отрисовки: {paint_ms:.1f} мс (бюджет {args.paint_budget_ms:.0f} мс)")
+    if paint_ms > args.paint_budget_ms:
+        failures.append("первая отрисовка")
+    if controller_before_paint:
+        failures.append("контроллер создан до первой отрисовки")
+
+    db_path = os.path.join(REPO_ROOT, "bench_startup.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    if failures:
+        print("Бюджет превышен: " + ", ".join(failures))
+        return 1
+    print("Бюджет соблюден")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,526 @@
+# cli.py
+"""
+Консольный интерфейс словаря (kanjiapp).
+
+Примеры:
+    python cli.py search "jlpt:5 has:木"
+    python cli.py reading ひとつ
+    python cli.py show kanji 語
+    python cli.py show word 12 --json
+    python cli.py add kanji 森 --meaning лес --on シン --kun もり --jlpt 4 --components 木
+    python cli.py import data.jsonl
+    python cli.py export data.jsonl
+    python cli.py stats
+    python cli.py build-index
+    python cli.py maintenance --check
+    python cli.py study-stats --rebuild
+    python cli.py --batch queries.txt > answers.jsonl
+
+Пакетный режим (--batch) читает запросы построчно из файла или stdin и
+отвечает на каждый одной строкой JSON через одно открытое соединение.
+Строка - это либо текст поискового запроса, либо JSON-команда:
+    {"cmd": "search", "q": "school"}
+    {"cmd": "show", "kind": "kanji", "id": 3}
+    {"cmd": "show", "kind": "kanji", "character": "語"}
+    {"cmd": "show", "kind": "word", "id": 7}
+    {"cmd": "components", "id": 3}
+    {"cmd": "reading", "q": "いち"}
+
+Формат import/export - JSON Lines, одна запись на строку:
+    {"type": "kanji", "character": "語", "meaning": "...", "components": ["言", "五", "口"], ...}
+    {"type": "word", "japanese": "日本語", "reading": "にほんご", "kanji": ["日", "本", "語"], ...}
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import Iterable, List, Optional, TextIO
+
+from controller import KanjiController
+from entities import Kanji, Word
+from logging_config import setup_logging
+from maintenance import DatabaseMaintenance
+
+logger = logging.getLogger("cli")
+
+# Как часто сбрасывать вывод в пакетном режиме (в строках)
+BATCH_FLUSH_EVERY = 256
+
+
+class CliError(Exception):
+    """Ошибка входных данных, о которой нужно сообщить пользователю."""
+
+
+def split_list(text: Optional[str]) -> List[str]:
+    """Разбирает список через запятую: "木, 口" -> ["木", "口"]"""
+    return [part.strip() for part in (text or "").split(",") if part.strip()]
+
+
+def as_list(value) -> List[str]:
+    """Список символов из JSON: принимает и массив, и строку через запятую"""
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    return split_list(value)
+
+
+# --- Команды (возвращают данные, пригодные для JSON) ---
+
+def run_search(controller: KanjiController, query: str) -> dict:
+    kanji, words = controller.search(query)
+    return {'query': query,
+            'kanji': [item.to_dict() for item in kanji],
+            'words': [item.to_dict() for item in words]}
+
+
+def run_reading(controller: KanjiController, reading: str) -> dict:
+    kanji, words = controller.lookup_reading(reading)
+    return {'reading': reading,
+            'kanji': [item.to_dict() for item in kanji],
+            'words': [item.to_dict() for item in words]}
+
+
+def run_build_index(controller: KanjiController) -> dict:
+    lookup_index = controller.db_manager.lookup_index
+    if lookup_index is None:
+        raise CliError("Индекс поиска отключен (KANJIAPP_LOOKUP_INDEX=0)")
+    index = lookup_index.refresh()
+    if index is None:
+        raise CliError("Не удалось построить индекс: данные изменились во время чтения")
+    return {'path': index.path, 'data_version': index.data_version,
+            'kanji': index.kanji_count, 'readings': index.key_count, 'words': index.word_count}
+
+
+def run_maintenance(controller: KanjiController, repair: bool) -> dict:
+    return DatabaseMaintenance(controller.db_manager, repair=repair).run()
+
+
+def run_show(controller: KanjiController, kind: str, key) -> dict:
+    if kind == "kanji":
+        if isinstance(key, int) or str(key).isdigit():
+            item = controller.get_kanji_info(int(key))
+        else:
+            found = controller.get_kanji_by_character(str(key))
+            item = controller.get_kanji_info(found.id) if found else None
+    elif kind == "word":
+        if not (isinstance(key, int) or str(key).isdigit()):
+            raise CliError("Слово задается по ID")
+        item = controller.get_word_info(int(key))
+    else:
+        raise CliError(f"Неизвестный тип: {kind}")
+    if item is None:
+        raise CliError(f"Не найдено: {kind} {key}")
+    return item.to_dict()
+
+
+def run_components(controller: KanjiController, kanji_id: int) -> dict:
+    tree = controller.get_component_tree(int(kanji_id))
+    if tree is None:
+        raise CliError(f"Кандзи не найдено: {kanji_id}")
+    return tree.to_dict()
+
+
+def kanji_from_record(record: dict) -> Kanji:
+    jlpt = record.get("jlpt_level")
+    return Kanji(character=record.get("character", "").strip(), meaning=record.get("meaning", ""),
+                 on_readings=record.get("on_readings", ""), kun_readings=record.get("kun_readings", ""),
+                 jlpt_level=int(jlpt) if jlpt not in (None, "") else None,
+                 is_complex=bool(record.get("is_complex") or record.get("components")),
+                 notes=record.get("notes", ""))
+
+
+def word_from_record(record: dict) -> Word:
+    return Word(japanese=record.get("japanese", "").strip(), reading=record.get("reading", ""),
+                translation=record.get("translation", ""), notes=record.get("notes", ""))
+
+
+def import_records(controller: KanjiController, records: Iterable[dict]) -> dict:
+    """
+    Импортирует записи одной транзакцией.
+
+    Сначала добавляются все кандзи, затем их компоненты (компонент может
+    встретиться в файле позже составного кандзи), затем слова.
+    Уже существующие записи пропускаются: кандзи - с тем же символом, слова -
+    с тем же написанием и чтением, поэтому повторный импорт файла ничего не
+    дублирует. Запись, которую не удалось добавить, откатывается целиком
+    (каждое добавление - вложенная транзакция).
+    """
+    db = controller.db_manager
+    counts = {'kanji': 0, 'words': 0, 'skipped': 0}
+    kanji_records, word_records = [], []
+    for record in records:
+        kind = record.get("type")
+        if kind == "kanji":
+            kanji_records.append(record)
+        elif kind == "word":
+            word_records.append(record)
+        else:
+            raise CliError(f"Неизвестный тип записи: {kind!r}")
+
+    with db.transaction():
+        pending_components = []
+        for record in kanji_records:
+            kanji = kanji_from_record(record)
+            if not kanji.character:
+                raise CliError("У кандзи не задан character")
+            if db.get_kanji_by_character(kanji.character) is not None:
+                counts['skipped'] += 1
+                continue
+            kanji_id = controller.add_kanji_with_details(kanji, as_list(record.get("variations")))
+            if not kanji_id:
+                counts['skipped'] += 1
+                continue
+            counts['kanji'] += 1
+            components = as_list(record.get("components"))
+            if components and kanji.is_complex:
+                pending_components.append((kanji_id, components))
+
+        for kanji_id, components in pending_components:
+            for char in components:
+                component = db.get_kanji_by_character(char)
+                if component:
+                    db.add_kanji_component(kanji_id, component.id)
+
+        for record in word_records:
+            word = word_from_record(record)
+            if not word.japanese:
+                raise CliError("У слова не задано japanese")
+            if db.find_word_id(word.japanese, word.reading) is not None:
+                counts['skipped'] += 1
+                continue
+            if controller.add_vocabulary_with_details(word, as_list(record.get("kanji"))):
+                counts['words'] += 1
+            else:
+                counts['skipped'] += 1
+    return counts
+
+
+def export_records(controller: KanjiController) -> Iterable[dict]:
+    """Выгружает все кандзи и слова в формате, который понимает import"""
+    for kanji_id in controller.db_manager.get_all_kanji_ids():
+        kanji = controller.get_kanji_info(kanji_id)
+        if kanji is None:
+            continue
+        yield {'type': 'kanji', 'character': kanji.character, 'meaning': kanji.meaning,
+               'on_readings': kanji.on_readings, 'kun_readings': kanji.kun_readings,
+               'jlpt_level': kanji.jlpt_level, 'is_complex': bool(kanji.is_complex), 'notes': kanji.notes,
+               'components': [component.kanji.character for component in kanji.radicals],
+               'variations': list(kanji.variations)}
+    for word_id in controller.db_manager.get_all_vocabulary_ids():
+        word = controller.get_word_info(word_id)
+        if word is None:
+            continue
+        yield {'type': 'word', 'japanese': word.japanese, 'reading': word.reading,
+               'translation': word.translation, 'notes': word.notes,
+               'kanji': [kanji.character for kanji in word.kanji_vocabulary]}
+
+
+def command_id(command: dict) -> int:
+    """ID из JSON-команды пакетного режима: целое число или строка из цифр"""
+    value = command.get("id")
+    if isinstance(value, bool) or not (isinstance(value, int) or str(value).isdigit()):
+        raise CliError("Ожидается поле id (целое число)")
+    return int(value)
+
+
+def run_batch_line(controller: KanjiController, line: str) -> dict:
+    """Выполняет одну строку пакетного режима"""
+    if not line.startswith("{"):
+        return run_search(controller, line)
+    try:
+        command = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise CliError(f"Некорректный JSON: {e}")
+    if not isinstance(command, dict):
+        raise CliError("Команда должна быть JSON-объектом")
+    cmd = command.get("cmd", "search")
+    if cmd == "search":
+        return run_search(controller, str(command.get("q", "")))
+    if cmd == "show":
+        if "id" in command:
+            return run_show(controller, command.get("kind", "kanji"), command_id(command))
+        character = command.get("character")
+        if not isinstance(character, str) or not character:
+            raise CliError("Ожидается поле id или character")
+        return run_show(controller, command.get("kind", "kanji"), character)
+    if cmd == "components":
+        return run_components(controller, command_id(command))
+    if cmd == "reading":
+        return run_reading(controller, str(command.get("q", "")))
+    raise CliError(f"Неизвестная команда: {cmd}")
+
+
+def run_batch(controller: KanjiController, source: TextIO, out: TextIO) -> int:
+    """
+    Отвечает на запросы из source, по строке JSON на каждый запрос.
+    Ошибка в одной строке (в том числе непредвиденная) не прерывает обработку
+    остальных: вместо ответа выводится {"input": ..., "error": ...}, а код
+    возврата становится 1.
+    """
+    errors = 0
+    for number, line in enumerate(source, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            result = run_batch_line(controller, line)
+        except CliError as e:
+            errors += 1
+            result = {'input': line, 'error': str(e)}
+        except Exception as e:
+            errors += 1
+            logger.exception("Ошибка в строке %d пакетного режима", number,
+                             extra={"context": {'operation': 'batch', 'line': number}})
+            result = {'input': line, 'error': f"{type(e).__name__}: {e}"}
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        if number % BATCH_FLUSH_EVERY == 0:
+            out.flush()
+    out.flush()
+    return 1 if errors else 0
+
+
+# --- Вывод для человека ---
+
+def print_search(result: dict) -> None:
+    for kanji in result['kanji']:
+        jlpt = f" N{kanji['jlpt_level']}" if kanji['jlpt_level'] else ""
+        print(f"кандзи {kanji['character']} [{kanji['id']}]{jlpt} - {kanji['meaning']}")
+    for word in result['words']:
+        print(f"слово  {word['japanese']} ({word['reading']}) [{word['id']}] - {word['translation']}")
+    if not result['kanji'] and not result['words']:
+        print("Ничего не найдено")
+
+
+def print_item(item: dict) -> None:
+    for key, value in item.items():
+        if isinstance(value, list):
+            value = ", ".join(entry['character'] if isinstance(entry, dict) else str(entry) for entry in value)
+        print(f"{key}: {value if value not in (None, '') else '-'}")
+
+
+def print_tree(node: dict, depth: int = 0) -> None:
+    variant = f" ({node['variant_form']})" if node['variant_form'] else ""
+    print(f"{'  ' * depth}{node['character']}{variant} - {node['meaning']}")
+    for child in node['components']:
+        print_tree(child, depth + 1)
+
+
+def print_stats(stats: dict) -> None:
+    print(f"Кандзи: {stats['kanji']} (составных: {stats['complex_kanji']})")
+    print(f"Слов: {stats['words']}")
+    print(f"Вариантов написания: {stats['kanji_variants']}, связей компонентов: {stats['kanji_components']}, "
+          f"связей слово-кандзи: {stats['vocabulary_kanji']}")
+    levels = ", ".join(f"N{level}: {count}" if level else f"без уровня: {count}"
+                       for level, count in stats['kanji_by_jlpt'].items())
+    print(f"По JLPT: {levels}")
+    print(f"Размер базы: {stats['db_size_bytes'] / 1024:.0f} КБ")
+
+
+def print_maintenance(report: dict) -> None:
+    before, after = report['before'], report['after']
+    print(f"Шагов: {report['steps']}, {report['duration_ms']:.0f} мс")
+    print(f"Файл: {before['file_size']} -> {after['file_size']} байт, "
+          f"свободных страниц: {before['freelist_pages']} -> {after['freelist_pages']}")
+    for table, found in sorted(report['orphans_found'].items()):
+        removed = report['orphans_removed'].get(table, 0)
+        print(f"Висячие связи {table}: {found}, удалено {removed}")
+    for table, errors in sorted(report['integrity_errors'].items()):
+        print(f"Целостность {table}: " + "; ".join(errors))
+    for error in report['errors']:
+        print(f"Ошибка: {error}")
+    if not (report['orphans_found'] or report['integrity_errors'] or report['errors']):
+        print("Проблем не найдено")
+
+
+def print_study_stats(statistics: dict) -> None:
+    def line(label: str, counters: dict) -> str:
+        accuracy = f"{counters['correct'] * 100 / counters['reviews']:.0f}%" if counters['reviews'] else "-"
+        return (f"{label}: повторений {counters['reviews']} (верно {accuracy}), выучено {counters['learned']}, "
+                f"забыто {counters['lapses']}, просмотров {counters['views']}, "
+                f"{counters['duration_ms'] / 60000:.0f} мин")
+
+    study = statistics['study']
+    print(f"Карточек в изучении: {study['total']}, к повторению: {study['due']}")
+    print(line("Всего", statistics['total']))
+    for level, counters in sorted(statistics['by_jlpt'].items(), key=lambda item: (item[0] == 0, -item[0])):
+        print(line(f"N{level}" if level else "Без уровня", counters))
+    for start, counters in statistics['days']:
+        if counters['reviews'] or counters['views']:
+            print(line(start, counters))
+
+
+def emit(data, as_json: bool, printer) -> None:
+    if as_json:
+        print(json.dumps(data, ensure_ascii=False, indent=2))
+    else:
+        printer(data)
+
+
+# --- Разбор аргументов ---
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="kanjiapp", description="Словарь кандзи из командной строки")
+    parser.add_argument("--db", default="kanji.db", help="файл базы данных (по умолчанию kanji.db)")
+    parser.add_argument("--json", action="store_true", help="выводить результат в JSON")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="FILE",
+                        help="пакетный режим: запросы из FILE (или stdin), ответы в JSON Lines")
+    # --json можно указывать и после имени команды
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--json", action="store_true", default=argparse.SUPPRESS, help=argparse.SUPPRESS)
+    commands = parser.add_subparsers(dest="command")
+
+    search = commands.add_parser("search", parents=[common], help="поиск кандзи и слов")
+    search.add_argument("query", nargs="+")
+
+    reading = commands.add_parser("reading", parents=[common], help="кандзи и слова по чтению")
+    reading.add_argument("reading")
+
+    show = commands.add_parser("show", parents=[common], help="карточка кандзи или слова")
+    show.add_argument("kind", choices=["kanji", "word"])
+    show.add_argument("key", help="ID (или символ для кандзи)")
+    show.add_argument("--tree", action="store_true", help="для кандзи: дерево компонентов")
+
+    add = commands.add_parser("add", parents=[common], help="добавить кандзи или слово")
+    add_kinds = add.add_subparsers(dest="kind", required=True)
+    add_kanji = add_kinds.add_parser("kanji", parents=[common])
+    add_kanji.add_argument("character")
+    add_kanji.add_argument("--meaning", default="")
+    add_kanji.add_argument("--on", default="")
+    add_kanji.add_argument("--kun", default="")
+    add_kanji.add_argument("--jlpt", type=int)
+    add_kanji.add_argument("--components", help="символы компонентов через запятую")
+    add_kanji.add_argument("--variants", help="варианты написания через запятую")
+    add_kanji.add_argument("--notes", default="")
+    add_word = add_kinds.add_parser("word", parents=[common])
+    add_word.add_argument("japanese")
+    add_word.add_argument("--reading", default="")
+    add_word.add_argument("--translation", default="")
+    add_word.add_argument("--kanji", help="кандзи в слове через запятую")
+    add_word.add_argument("--notes", default="")
+
+    import_cmd = commands.add_parser("import", parents=[common], help="импорт из JSON Lines")
+    import_cmd.add_argument("file", help="файл или - для stdin")
+
+    export_cmd = commands.add_parser("export", parents=[common], help="экспорт в JSON Lines")
+    export_cmd.add_argument("file", nargs="?", default="-", help="файл (по умолчанию stdout)")
+
+    commands.add_parser("stats", parents=[common], help="сводка по базе")
+    commands.add_parser("build-index", parents=[common],
+                        help="построить файловый индекс поиска по символу и чтению")
+    maintenance = commands.add_parser("maintenance", parents=[common],
+                                      help="обслуживание базы: статистика, висячие связи, целостность, VACUUM")
+    maintenance.add_argument("--check", action="store_true",
+                             help="только проверить и показать отчет, ничего не меняя")
+    study_stats = commands.add_parser("study-stats", parents=[common], help="статистика занятий")
+    study_stats.add_argument("--rebuild", action="store_true", help="пересчитать сводки по всему журналу")
+    return parser
+
+
+def open_input(path: str) -> TextIO:
+    return sys.stdin if path == "-" else open(path, encoding="utf-8")
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.batch is None and args.command is None:
+        parser.print_help()
+        return 2
+
+    setup_logging()
+    controller = KanjiController(args.db)
+    controller.db_manager.initialize_database()
+    # Одно соединение на весь запуск
+    controller.db_manager.pin_connection()
+    try:
+        if args.batch is not None:
+            with open_input(args.batch) as source:
+                return run_batch(controller, source, sys.stdout)
+        return run_command(controller, args)
+    except CliError as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    finally:
+        controller.db_manager.release_connection()
+
+
+def run_command(controller: KanjiController, args) -> int:
+    if args.command == "search":
+        emit(run_search(controller, " ".join(args.query)), args.json, print_search)
+
+    elif args.command == "reading":
+        emit(run_reading(controller, args.reading), args.json, print_search)
+
+    elif args.command == "show":
+        if args.tree:
+            if args.kind != "kanji":
+                raise CliError("Дерево компонентов есть только у кандзи")
+            kanji_id = run_show(controller, "kanji", args.key)['id']
+            emit(run_components(controller, kanji_id), args.json, print_tree)
+        else:
+            emit(run_show(controller, args.kind, args.key), args.json, print_item)
+
+    elif args.command == "add":
+        if args.kind == "kanji":
+            components = split_list(args.components)
+            kanji = Kanji(character=args.character, meaning=args.meaning, on_readings=args.on,
+                          kun_readings=args.kun, jlpt_level=args.jlpt, is_complex=bool(components),
+                          notes=args.notes)
+            item_id = controller.add_kanji_with_details(kanji, split_list(args.variants), components)
+        else:
+            word = Word(japanese=args.japanese, reading=args.reading, translation=args.translation,
+                        notes=args.notes)
+            item_id = controller.add_vocabulary_with_details(word, split_list(args.kanji))
+        if not item_id:
+            raise CliError("Не удалось добавить (возможно, запись уже существует)")
+        emit({'id': item_id}, args.json, lambda data: print(f"Добавлено, ID {data['id']}"))
+
+    elif args.command == "import":
+        with open_input(args.file) as source:
+            records = []
+            for number, line in enumerate(source, 1):
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise CliError(f"Строка {number}: некорректный JSON ({e})")
+        counts = import_records(controller, records)
+        emit(counts, args.json, lambda data: print(
+            f"Импортировано кандзи: {data['kanji']}, слов: {data['words']}, пропущено: {data['skipped']}"))
+
+    elif args.command == "export":
+        out = sys.stdout if args.file == "-" else open(args.file, "w", encoding="utf-8")
+        try:
+            for record in export_records(controller):
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+    elif args.command == "build-index":
+        emit(run_build_index(controller), args.json, lambda data: print(
+            f"Индекс {data['path']} (версия {data['data_version']}): кандзи {data['kanji']}, "
+            f"слов {data['words']}, чтений {data['readings']}"))
+
+    elif args.command == "maintenance":
+        report = run_maintenance(controller, repair=not args.check)
+        emit(report, args.json, print_maintenance)
+        if report['integrity_errors'] or report['errors']:
+            return 1
+
+    elif args.command == "study-stats":
+        if args.rebuild:
+            controller.rebuild_review_rollups()
+        emit(controller.get_review_statistics(), args.json, print_study_stats)
+
+    elif args.command == "stats":
+        stats = controller.db_manager.get_statistics()
+        stats['db_size_bytes'] = os.path.getsize(controller.db_name) if os.path.exists(controller.db_name) else 0
+        emit(stats, args.json, print_stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
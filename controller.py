@@ -1,25 +1,317 @@
-from typing import List, Optional
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import List, Optional, Set, Tuple
 from database import DatabaseManager
-from entities import Kanji, Word, KanjiComponent
+from entities import Kanji, Word, KanjiComponent, ComponentNode, KanjiTile, ReviewEvent, SrsState, StudyCard
+from deinflection import candidate_terms, deinflect
+from fuzzy_index import FuzzyIndex
+from instrumentation import instrument_class
+from search_query import ascii_lower, normalize_query, parse_search_query
+from review_log import merge_rollups, rollup_deltas
+from srs import INITIAL_EASE
 
+logger = logging.getLogger(__name__)
 
+# Хирагана, катакана и иероглифы
+JAPANESE_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u9fff]")
+
+# Запрос только из каны (с точкой окуригана и дефисами) ищется и как чтение
+KANA_PATTERN = re.compile(r"[\u3041-\u30ff.\-]+")
+
+# Наборы базового поиска крупнее этого не сохраняются для уточнения в памяти
+MAX_REFINE_CANDIDATES = 5000
+
+
+@instrument_class
 class KanjiController:
     """
     Контроллер для бизнес-логики приложения.
     Координирует сложные операции, используя DatabaseManager.
     """
 
-    def __init__(self, db_name: str = "kanji.db"):
+    def __init__(self, db_name: str = "kanji.db", snapshot: Optional[bool] = None):
         self.db_name = db_name
-        self.db_manager = DatabaseManager(db_name)
+        # snapshot: читать из копии базы в памяти (см. DatabaseManager)
+        self.db_manager = DatabaseManager(db_name, snapshot=snapshot)
+        # Индекс для поиска с опечатками строится лениво при первом обращении
+        self._fuzzy_index: Optional[FuzzyIndex] = None
+        self._fuzzy_lock = threading.Lock()
+        # Результаты поиска словарных форм по спрягаемой форме (LRU)
+        self._deinflection_cache: "OrderedDict[str, List[Word]]" = OrderedDict()
+        self._deinflection_cache_size = 1024
+        self._deinflection_hits = 0
+        self._deinflection_misses = 0
+        # Кэш читается из главного потока и сбрасывается из потока базы данных
+        self._cache_lock = threading.Lock()
+        # Результаты search() по (нормализованный запрос, версия данных), LRU
+        self._search_cache: "OrderedDict[Tuple[str, int], Tuple[List[Kanji], List[Word]]]" = OrderedDict()
+        self._search_cache_size = 256
+        self._search_hits = 0
+        self._search_misses = 0
+        # Последние наборы базового поиска (LIKE) для уточнения при наборе текста:
+        # (вид, запрос) -> (версия данных, результаты)
+        self._refine_cache: "OrderedDict[Tuple[str, str], Tuple[int, list]]" = OrderedDict()
+        self._refine_cache_size = 16
+        self._refine_hits = 0
+        self._refine_misses = 0
+        # Версия данных: увеличивается после фиксации каждой записи через контроллер
+        # и после изменений базы, замеченных check_data_version
+        self.data_version = 0
+        # Версия из db_meta при последней проверке (check_data_version)
+        self._db_version: Optional[int] = None
+
+    def _invalidate_caches(self) -> None:
+        """
+        Сбрасывает кэши, зависящие от содержимого базы. Вызывается после каждой записи.
+
+        Внутри транзакции (например, групповой фиксации потока базы) сброс
+        откладывается до ее фиксации: иначе поиск из другого потока успел бы
+        прочитать старые строки и сохранить их в кэш под новой версией.
+        """
+        self.db_manager.after_commit(self._clear_caches)
+
+    def _clear_caches(self) -> None:
+        with self._cache_lock:
+            self.data_version += 1
+            self._deinflection_cache.clear()
+            # Записи со старой версией больше не будут запрошены
+            self._search_cache.clear()
+            self._refine_cache.clear()
+
+    def check_data_version(self) -> Optional[int]:
+        """
+        Сверяет версию данных в файле базы (db_meta, общая для всех процессов)
+        с последней увиденной. Если база изменилась, в том числе другим
+        процессом, сбрасывает кэши, индекс нечеткого поиска и копию базы в
+        памяти. Возвращает версию из базы.
+        """
+        version = self.db_manager.get_data_version()
+        with self._cache_lock:
+            changed, self._db_version = version != self._db_version, version
+        if changed:
+            self._clear_caches()
+            with self._fuzzy_lock:
+                self._fuzzy_index = None
+            if self.db_manager.snapshot is not None:
+                self.db_manager.snapshot.invalidate()
+        return version
 
     def search_kanji(self, query: str) -> List[Kanji]:
-        """Поиск кандзи"""
-        return self.db_manager.search_kanji_basic(query)
+        """
+        Поиск кандзи.
+        Запрос с условиями вида jlpt:3, on:コウ, has:言 выполняется через
+        планировщик структурированного поиска, простой текст - как раньше.
+        """
+        parsed = parse_search_query(query)
+        if parsed.is_structured:
+            return self.db_manager.search_kanji_structured(parsed)
+        # Совпадения по основам слов значения идут раньше совпадений по подстроке
+        results = self._merge_ranked(self.db_manager.search_kanji_by_meaning(query),
+                                     self._search_basic('kanji', query))
+        if KANA_PATTERN.fullmatch(query.strip()):
+            # Точное совпадение чтения (いち -> 一 с онъёми イチ) - первым
+            results = self._merge_ranked(self.lookup_reading(query)[0], results)
+        return results
 
     def search_vocabulary(self, query: str) -> List[Word]:
-        """Поиск слов"""
-        return self.db_manager.search_vocabulary_basic(query)
+        """Поиск слов (поддерживает условия meaning: и has:)"""
+        parsed = parse_search_query(query)
+        if parsed.is_structured:
+            return self.db_manager.search_vocabulary_structured(parsed)
+        results = self._merge_ranked(self.db_manager.search_vocabulary_by_translation(query),
+                                     self._search_basic('word', query))
+        if JAPANESE_PATTERN.search(query):
+            # Словарные формы спрягаемого слова (食べました -> 食べる) идут первыми
+            results = self._merge_ranked(self.lookup_deinflected(query), results)
+        if KANA_PATTERN.fullmatch(query.strip()):
+            results = self._merge_ranked(self.lookup_reading(query)[1], results)
+        return results
+
+    def lookup_reading(self, reading: str) -> Tuple[List[Kanji], List[Word]]:
+        """Кандзи и слова с точно совпадающим чтением (кана любого вида, без учета окуригана)"""
+        return self.db_manager.get_entries_by_reading(reading)
+
+    def _search_basic(self, kind: str, query: str) -> list:
+        """
+        Базовый поиск (LIKE по полям) с уточнением в памяти.
+
+        Если запрос расширяет один из недавних (sch -> scho), результат может
+        только сузиться, поэтому прежний набор фильтруется тем же условием в
+        Python. К базе запрос уходит, когда он не расширяет недавние, когда
+        прежний набор был слишком велик, чтобы его хранить, или когда данные
+        изменились.
+        """
+        if kind == 'kanji':
+            fetch, matches = self.db_manager.search_kanji_basic, self.db_manager.kanji_matches_basic
+        else:
+            fetch, matches = self.db_manager.search_vocabulary_basic, self.db_manager.word_matches_basic
+
+        # Версия до чтения: если данные изменились во время поиска, набор не сохраняется
+        version = self.data_version
+        base = self._refine_base(kind, query, version)
+        if base is not None:
+            results = [item for item in base if matches(item, query)]
+        else:
+            results = fetch(query)
+
+        with self._cache_lock:
+            if len(results) <= MAX_REFINE_CANDIDATES and version == self.data_version:
+                key = (kind, query)
+                self._refine_cache[key] = (version, results)
+                self._refine_cache.move_to_end(key)
+                if len(self._refine_cache) > self._refine_cache_size:
+                    self._refine_cache.popitem(last=False)
+        return list(results)
+
+    def _refine_base(self, kind: str, query: str, version: int) -> Optional[list]:
+        """Наименьший сохраненный набор версии version, который можно уточнить до query, или None"""
+        # % и _ в LIKE - шаблоны, а число сравнивается с уровнем JLPT на равенство:
+        # такие запросы не сужают прежний результат
+        if '%' in query or '_' in query or (kind == 'kanji' and query.isdigit()):
+            return None
+        needle = ascii_lower(query)
+        best = None
+        with self._cache_lock:
+            for (cached_kind, cached_query), (cached_version, items) in self._refine_cache.items():
+                if (cached_kind != kind or cached_version != version or not cached_query
+                        or '%' in cached_query or '_' in cached_query
+                        or ascii_lower(cached_query) not in needle):
+                    continue
+                if best is None or len(items) < len(best):
+                    best = items
+            if best is None:
+                self._refine_misses += 1
+            else:
+                self._refine_hits += 1
+        return best
+
+    def lookup_deinflected(self, surface: str) -> List[Word]:
+        """
+        Найти слова по спрягаемой форме.
+        Кандидаты словарных форм проверяются одним запросом, результат кэшируется по форме.
+        """
+        surface = surface.strip()
+        with self._cache_lock:
+            cached = self._deinflection_cache.get(surface)
+            if cached is not None:
+                self._deinflection_hits += 1
+                self._deinflection_cache.move_to_end(surface)
+                return list(cached)
+            self._deinflection_misses += 1
+
+        terms = candidate_terms(surface)
+        words = self.db_manager.get_words_by_forms(terms)
+        # Порядок: чем меньше шагов приведения, тем выше слово
+        rank = {term: i for i, term in enumerate(terms)}
+        words.sort(key=lambda w: min(rank.get(w.japanese, len(rank)), rank.get(w.reading, len(rank))))
+
+        with self._cache_lock:
+            self._deinflection_cache[surface] = words
+            if len(self._deinflection_cache) > self._deinflection_cache_size:
+                self._deinflection_cache.popitem(last=False)
+        return list(words)
+
+    @staticmethod
+    def _merge_ranked(primary: list, secondary: list) -> list:
+        """Объединяет результаты без повторов: сначала primary, затем остальные из secondary"""
+        seen = {item.id for item in primary}
+        return primary + [item for item in secondary if item.id not in seen]
+
+    def search(self, query: str) -> Tuple[List[Kanji], List[Word]]:
+        """
+        Поиск кандзи и слов.
+        Если обычный поиск ничего не нашел, выполняется поиск по значениям
+        и переводам с учетом опечаток.
+        Результат кэшируется по нормализованному запросу и версии данных,
+        поэтому повторный поиск (например, при возврате на страницу поиска)
+        не обращается к базе, пока ничего не изменилось.
+        """
+        query = normalize_query(query)
+        with self._cache_lock:
+            key = (query, self.data_version)
+            cached = self._search_cache.get(key)
+            if cached is not None:
+                self._search_hits += 1
+                self._search_cache.move_to_end(key)
+                return list(cached[0]), list(cached[1])
+            self._search_misses += 1
+
+        kanji_results, word_results = self._search_uncached(query)
+
+        with self._cache_lock:
+            # Если во время поиска прошла запись, версия уже другая и запись не попадет в кэш
+            if key[1] == self.data_version:
+                self._search_cache[key] = (kanji_results, word_results)
+                if len(self._search_cache) > self._search_cache_size:
+                    self._search_cache.popitem(last=False)
+        return list(kanji_results), list(word_results)
+
+    def _search_uncached(self, query: str) -> Tuple[List[Kanji], List[Word]]:
+        kanji_results = self.search_kanji(query)
+        word_results = self.search_vocabulary(query)
+        if kanji_results or word_results or parse_search_query(query).is_structured:
+            return kanji_results, word_results
+        return self.fuzzy_search_meaning(query)
+
+    def _get_fuzzy_index(self) -> FuzzyIndex:
+        """Возвращает индекс опечаток, при первом вызове строит его по базе"""
+        with self._fuzzy_lock:
+            if self._fuzzy_index is None:
+                index = FuzzyIndex()
+                for kanji_id, meaning in self.db_manager.get_all_kanji_meanings():
+                    index.add_document(('kanji', kanji_id), meaning)
+                for word_id, translation in self.db_manager.get_all_vocabulary_translations():
+                    index.add_document(('word', word_id), translation)
+                self._fuzzy_index = index
+            return self._fuzzy_index
+
+    def _update_fuzzy_index(self, kind: str, item_id: int, text: Optional[str]) -> None:
+        """
+        Инкрементально обновляет индекс опечаток после записи (внутри транзакции -
+        после ее фиксации, откаченная запись индекс не меняет).
+        text=None означает удаление. Если индекс еще не построен, ничего не делает.
+        """
+        self.db_manager.after_commit(lambda: self._apply_fuzzy_update(kind, item_id, text))
+
+    def _apply_fuzzy_update(self, kind: str, item_id: int, text: Optional[str]) -> None:
+        with self._fuzzy_lock:
+            if self._fuzzy_index is None or item_id is None:
+                return
+            if text is None:
+                self._fuzzy_index.remove_document((kind, item_id))
+            else:
+                self._fuzzy_index.add_document((kind, item_id), text)
+
+    def fuzzy_search_meaning(self, query: str, limit: int = 50) -> Tuple[List[Kanji], List[Word]]:
+        """Поиск кандзи и слов по значению/переводу с учетом опечаток"""
+        matches = self._get_fuzzy_index().search(query, limit=limit)
+        kanji_ids = [item_id for (kind, item_id), _ in matches if kind == 'kanji']
+        word_ids = [item_id for (kind, item_id), _ in matches if kind == 'word']
+        return self.db_manager.get_kanji_by_ids(kanji_ids), self.db_manager.get_words_by_ids(word_ids)
+
+    def get_cache_stats(self) -> dict:
+        """
+        Статистика кэшей и индексов для страницы диагностики.
+        Для каждого кэша: size и, если применимо, hits/misses.
+        """
+        rules_info = deinflect.cache_info()
+        fuzzy_index = self._fuzzy_index
+        return {
+            'search_results': {'hits': self._search_hits, 'misses': self._search_misses,
+                               'size': len(self._search_cache)},
+            'search_refinement': {'hits': self._refine_hits, 'misses': self._refine_misses,
+                                  'size': len(self._refine_cache)},
+            'deinflection_results': {'hits': self._deinflection_hits,
+                                     'misses': self._deinflection_misses,
+                                     'size': len(self._deinflection_cache)},
+            'deinflection_rules': {'hits': rules_info.hits, 'misses': rules_info.misses,
+                                   'size': rules_info.currsize},
+            'fuzzy_index': {'size': len(fuzzy_index) if fuzzy_index is not None else 0},
+        }
 
     def get_kanji_info(self, kanji_id: int) -> Optional[Kanji]:
         """
@@ -49,6 +341,27 @@ class KanjiController:
 
         return kanji
 
+    def get_component_tree(self, kanji_id: int, max_depth: int = 8) -> Optional[ComponentNode]:
+        """
+        Получить дерево компонентов кандзи на всю глубину.
+        Повторно встреченные кандзи (циклы в данных) не раскрываются.
+        """
+        kanji = self.db_manager.get_kanji_by_id(kanji_id)
+        if not kanji:
+            return None
+
+        def build(node_kanji: Kanji, variant_form: Optional[str], depth: int, path: set) -> ComponentNode:
+            children = []
+            if node_kanji.is_complex and depth < max_depth and node_kanji.id not in path:
+                path = path | {node_kanji.id}
+                for component in self.db_manager.get_kanji_components(node_kanji.id):
+                    component_variants = self.db_manager.get_kanji_variants(component.id)
+                    children.append(build(component, component_variants[0] if component_variants else None,
+                                          depth + 1, path))
+            return ComponentNode(kanji=node_kanji, variant_form=variant_form, components=children)
+
+        return build(kanji, None, 0, set())
+
     def get_word_info(self, word_id: int) -> Optional[Word]:
         """Получить полную информацию о слове с кандзи"""
         word = self.db_manager.get_word_by_id(word_id)
@@ -68,48 +381,58 @@ class KanjiController:
         Координирует несколько операций с БД.
         """
         try:
-            # 1. Добавляем основное кандзи
-            kanji_id = self.db_manager.add_kanji(kanji_obj)
-            if not kanji_id:
-                return None
-
-            # 2. Добавляем варианты написания
-            if variants:
-                for variant in variants:
-                    self.db_manager.add_kanji_variant(kanji_id, variant)
-
-            # 3. Добавляем компоненты
-            if components and kanji_obj.is_complex:
-                for char in components:
-                    component_kanji = self.db_manager.get_kanji_by_character(char)
-                    if component_kanji:
-                        self.db_manager.add_kanji_component(kanji_id, component_kanji.id)
-
+            with self.db_manager.transaction():
+                # 1. Добавляем основное кандзи
+                kanji_id = self.db_manager.add_kanji(kanji_obj)
+                if not kanji_id:
+                    return None
+
+                # 2. Добавляем варианты написания
+                if variants:
+                    for variant in variants:
+                        self.db_manager.add_kanji_variant(kanji_id, variant)
+
+                # 3. Добавляем компоненты
+                if components and kanji_obj.is_complex:
+                    for char in components:
+                        component_kanji = self.db_manager.get_kanji_by_character(char)
+                        if component_kanji:
+                            self.db_manager.add_kanji_component(kanji_id, component_kanji.id)
+
+            self._update_fuzzy_index('kanji', kanji_id, kanji_obj.meaning)
+            self._invalidate_caches()
             return kanji_id
 
         except Exception as e:
-            print(f"Ошибка при добавлении кандзи с деталями: {e}")
+            logger.error("Ошибка при добавлении кандзи с деталями: %s", e, exc_info=True,
+                         extra={"context": {'operation': 'add_kanji_with_details',
+                                            'character': kanji_obj.character}})
             return None
 
     def add_vocabulary_with_details(self, word_obj: Word, kanji_chars: List[str] = None) -> Optional[int]:
         """Добавить слово со связанными кандзи"""
         try:
-            # 1. Добавляем слово
-            word_id = self.db_manager.add_vocabulary(word_obj)
-            if not word_id:
-                return None
-
-            # 2. Связываем с кандзи
-            if kanji_chars:
-                for char in kanji_chars:
-                    kanji = self.db_manager.get_kanji_by_character(char)
-                    if kanji:
-                        self.db_manager.add_vocabulary_kanji(word_id, kanji.id)
-
+            with self.db_manager.transaction():
+                # 1. Добавляем слово
+                word_id = self.db_manager.add_vocabulary(word_obj)
+                if not word_id:
+                    return None
+
+                # 2. Связываем с кандзи
+                if kanji_chars:
+                    for char in kanji_chars:
+                        kanji = self.db_manager.get_kanji_by_character(char)
+                        if kanji:
+                            self.db_manager.add_vocabulary_kanji(word_id, kanji.id)
+
+            self._update_fuzzy_index('word', word_id, word_obj.translation)
+            self._invalidate_caches()
             return word_id
 
         except Exception as e:
-            print(f"Ошибка при добавлении слова с деталями: {e}")
+            logger.error("Ошибка при добавлении слова с деталями: %s", e, exc_info=True,
+                         extra={"context": {'operation': 'add_vocabulary_with_details',
+                                            'japanese': word_obj.japanese}})
             return None
 
     def update_kanji_full(self, kanji_obj: Kanji, new_variants: List[str] = None,
@@ -117,70 +440,347 @@ class KanjiController:
         """
         Полное обновление кандзи со всеми связями.
         Бизнес-логика: атомарное обновление.
+
+        В базу записываются только изменившиеся поля (Kanji.changed_fields) и
+        разница между текущими и новыми связями. Если ничего не изменилось,
+        кэши не сбрасываются.
         """
         try:
-            # 1. Обновляем основную информацию
-            if not self.db_manager.update_kanji(kanji_obj):
-                return False
-
-            # 2. Обновляем варианты написания
-            if new_variants is not None:  # None означает "не обновлять"
-                self.db_manager.delete_kanji_variants(kanji_obj.id)
-                for variant in new_variants:
-                    self.db_manager.add_kanji_variant(kanji_obj.id, variant)
-
-            # 3. Обновляем компоненты
-            if new_components is not None and kanji_obj.is_complex:
-                self.db_manager.delete_kanji_components(kanji_obj.id)
-                for char in new_components:
-                    component_kanji = self.db_manager.get_kanji_by_character(char)
-                    if component_kanji:
-                        self.db_manager.add_kanji_component(kanji_obj.id, component_kanji.id)
-
+            with self.db_manager.transaction():
+                # 1. Обновляем изменившиеся поля
+                fields = kanji_obj.changed_fields()
+                if not self.db_manager.update_kanji_fields(kanji_obj, fields):
+                    return False
+                changed = bool(fields)
+
+                # 2. Обновляем варианты написания
+                if new_variants is not None:  # None означает "не обновлять"
+                    changed |= self._sync_kanji_variants(kanji_obj.id, new_variants)
+
+                # 3. Обновляем компоненты
+                if new_components is not None and kanji_obj.is_complex:
+                    target_ids = self._resolve_kanji_ids(new_components)
+                    changed |= self._sync_links(self.db_manager.get_kanji_component_ids(kanji_obj.id), target_ids,
+                                                lambda component_id: self.db_manager.add_kanji_component(
+                                                    kanji_obj.id, component_id),
+                                                lambda component_id: self.db_manager.delete_kanji_component(
+                                                    kanji_obj.id, component_id))
+
+            kanji_obj.mark_clean()
+            if changed:
+                if 'meaning' in fields:
+                    self._update_fuzzy_index('kanji', kanji_obj.id, kanji_obj.meaning)
+                self._invalidate_caches()
             return True
 
         except Exception as e:
-            print(f"Ошибка при полном обновлении кандзи: {e}")
+            logger.error("Ошибка при полном обновлении кандзи: %s", e, exc_info=True,
+                         extra={"context": {'operation': 'update_kanji_full', 'kanji_id': kanji_obj.id}})
             return False
 
     def update_vocabulary_full(self, word_obj: Word, new_kanji_chars: List[str] = None) -> bool:
-        """Полное обновление слова со связями"""
+        """Полное обновление слова со связями (записываются только изменения, как в update_kanji_full)"""
         try:
-            # 1. Обновляем основную информацию
-            if not self.db_manager.update_vocabulary(word_obj):
-                return False
-
-            # 2. Обновляем связанные кандзи
-            if new_kanji_chars is not None:
-                self.db_manager.delete_vocabulary_kanji(word_obj.id)
-                for char in new_kanji_chars:
-                    kanji = self.db_manager.get_kanji_by_character(char)
-                    if kanji:
-                        self.db_manager.add_vocabulary_kanji(word_obj.id, kanji.id)
-
+            with self.db_manager.transaction():
+                # 1. Обновляем изменившиеся поля
+                fields = word_obj.changed_fields()
+                if not self.db_manager.update_vocabulary_fields(word_obj, fields):
+                    return False
+                changed = bool(fields)
+
+                # 2. Обновляем связанные кандзи
+                if new_kanji_chars is not None:
+                    target_ids = self._resolve_kanji_ids(new_kanji_chars)
+                    changed |= self._sync_links(self.db_manager.get_word_kanji_ids(word_obj.id), target_ids,
+                                                lambda kanji_id: self.db_manager.add_vocabulary_kanji(
+                                                    word_obj.id, kanji_id),
+                                                lambda kanji_id: self.db_manager.delete_vocabulary_kanji_link(
+                                                    word_obj.id, kanji_id))
+
+            word_obj.mark_clean()
+            if changed:
+                if 'translation' in fields:
+                    self._update_fuzzy_index('word', word_obj.id, word_obj.translation)
+                self._invalidate_caches()
             return True
 
         except Exception as e:
-            print(f"Ошибка при полном обновлении слова: {e}")
+            logger.error("Ошибка при полном обновлении слова: %s", e, exc_info=True,
+                         extra={"context": {'operation': 'update_vocabulary_full', 'word_id': word_obj.id}})
             return False
 
+    def _resolve_kanji_ids(self, characters: List[str]) -> List[int]:
+        """ID кандзи по символам в исходном порядке; отсутствующие в базе пропускаются"""
+        ids = []
+        for char in characters:
+            kanji = self.db_manager.get_kanji_by_character(char)
+            if kanji and kanji.id not in ids:
+                ids.append(kanji.id)
+        return ids
+
+    @staticmethod
+    def _sync_links(current_ids: List[int], target_ids: List[int], add, delete) -> bool:
+        """Приводит набор связей к target_ids, удаляя и добавляя только разницу. True, если что-то изменилось"""
+        current, target = set(current_ids), set(target_ids)
+        for item_id in current - target:
+            delete(item_id)
+        for item_id in target_ids:
+            if item_id not in current:
+                add(item_id)
+        return current != target
+
+    def _sync_kanji_variants(self, kanji_id: int, new_variants: List[str]) -> bool:
+        """
+        Приводит варианты написания к new_variants. True, если что-то изменилось.
+
+        Порядок вариантов важен (первый используется как форма компонента),
+        поэтому удаляются лишние строки и дописываются недостающие; если после
+        этого порядок не совпал бы с new_variants, варианты перезаписываются целиком.
+        """
+        rows = self.db_manager.get_kanji_variant_rows(kanji_id)
+        if [form for _, form in rows] == list(new_variants):
+            return False
+
+        remaining = list(new_variants)
+        kept, removed = [], []
+        for row_id, form in rows:
+            if form in remaining:
+                remaining.remove(form)
+                kept.append(form)
+            else:
+                removed.append(row_id)
+
+        if kept + remaining != list(new_variants):
+            self.db_manager.delete_kanji_variants(kanji_id)
+            remaining = list(new_variants)
+        elif removed:
+            self.db_manager.delete_kanji_variant_rows(removed)
+        for variant in remaining:
+            self.db_manager.add_kanji_variant(kanji_id, variant)
+        return True
+
     def delete_kanji_cascade(self, kanji_id: int) -> bool:
         """Удалить кандзи и все его связи."""
         # Проверка на то используется ли кандзи в словах
         word_usage = self.db_manager.get_word_kanji(kanji_id)
         if word_usage:
-            print(f"Предупреждение: кандзи используется в {len(word_usage)} словах")
+            logger.warning("Кандзи используется в %d словах", len(word_usage),
+                           extra={"context": {'operation': 'delete_kanji_cascade', 'kanji_id': kanji_id}})
 
-        return self.db_manager.delete_kanji(kanji_id)
+        success = self.db_manager.delete_kanji(kanji_id)
+        if success:
+            self._update_fuzzy_index('kanji', kanji_id, None)
+            self._invalidate_caches()
+        return success
 
     def delete_vocabulary_cascade(self, word_id: int) -> bool:
         """Удалить слово и все его связи"""
-        return self.db_manager.delete_vocabulary(word_id)
+        success = self.db_manager.delete_vocabulary(word_id)
+        if success:
+            self._update_fuzzy_index('word', word_id, None)
+            self._invalidate_caches()
+        return success
+
+    # --- Пакетные операции (одна транзакция на вызов) ---
+
+    def delete_many(self, kanji_ids: List[int] = (), word_ids: List[int] = ()) -> int:
+        """
+        Удалить несколько кандзи и слов одной транзакцией.
+
+        Returns:
+            Количество удаленных записей (0 при ошибке - изменения откатываются).
+        """
+        try:
+            with self.db_manager.transaction():
+                deleted = (self.db_manager.delete_kanji_many(kanji_ids)
+                           + self.db_manager.delete_vocabulary_many(word_ids))
+        except Exception as e:
+            logger.error("Ошибка при пакетном удалении: %s", e, exc_info=True,
+                         extra={"context": {'operation': 'delete_many', 'kanji_count': len(kanji_ids),
+                                            'word_count': len(word_ids)}})
+            return 0
+        if deleted:
+            for kanji_id in kanji_ids:
+                self._update_fuzzy_index('kanji', kanji_id, None)
+            for word_id in word_ids:
+                self._update_fuzzy_index('word', word_id, None)
+            self._invalidate_caches()
+        return deleted
+
+    def set_jlpt_many(self, kanji_ids: List[int], jlpt_level: Optional[int]) -> int:
+        """Установить уровень JLPT нескольким кандзи. Возвращает количество измененных."""
+        return self._bulk_write('set_jlpt_many', self.db_manager.set_jlpt_many, kanji_ids, jlpt_level)
+
+    def append_notes_many(self, text: str, kanji_ids: List[int] = (), word_ids: List[int] = ()) -> int:
+        """Дописать text в заметки нескольких кандзи и слов. Возвращает количество измененных."""
+        return self._bulk_write('append_notes_many', lambda: (
+            self.db_manager.append_notes_many(kanji_ids, text, True)
+            + self.db_manager.append_notes_many(word_ids, text, False)))
+
+    def relink_components_many(self, kanji_ids: Optional[List[int]], old_component_id: int,
+                               new_component_id: int) -> int:
+        """
+        Заменить компонент у нескольких кандзи (kanji_ids=None - у всех, где он встречается).
+        Возвращает количество кандзи, у которых компонент заменен.
+        """
+        if old_component_id == new_component_id:
+            return 0
+        return self._bulk_write('relink_components_many', self.db_manager.relink_components_many,
+                                kanji_ids, old_component_id, new_component_id)
+
+    def _bulk_write(self, operation: str, func, *args) -> int:
+        """Выполняет пакетную запись в транзакции; при ошибке откатывает ее и возвращает 0"""
+        try:
+            with self.db_manager.transaction():
+                changed = func(*args)
+        except Exception as e:
+            logger.error("Ошибка пакетной операции %s: %s", operation, e, exc_info=True,
+                         extra={"context": {'operation': operation}})
+            return 0
+        if changed:
+            self._invalidate_caches()
+        return changed
 
     def update_notes(self, item_id: int, new_notes: str, is_kanji: bool) -> bool:
         """Обновить заметки"""
-        return self.db_manager.update_notes(item_id, new_notes, is_kanji)
+        success = self.db_manager.update_notes(item_id, new_notes, is_kanji)
+        if success:
+            self._invalidate_caches()
+        return success
 
     def get_kanji_by_character(self, character: str) -> Optional[Kanji]:
         """Получить кандзи по символу (с возможностью кэширования)"""
-        return self.db_manager.get_kanji_by_character(character)
\ No newline at end of file
+        return self.db_manager.get_kanji_by_character(character)
+
+    def get_kanji_tiles(self, jlpt_level: Optional[int] = None, component: Optional[str] = None) -> List[KanjiTile]:
+        """Кандзи для сетки: по уровню JLPT и/или по символу компонента (неизвестный компонент - пусто)"""
+        component_id = None
+        if component:
+            component_kanji = self.db_manager.get_kanji_by_character(component)
+            if component_kanji is None:
+                return []
+            component_id = component_kanji.id
+        return self.db_manager.get_kanji_tiles(jlpt_level, component_id)
+
+    # --- Интервальное повторение ---
+
+    def get_due_cards(self, now: int, limit: int,
+                      exclude: Optional[Set[Tuple[str, int]]] = None) -> List[StudyCard]:
+        """
+        Карточки к повторению по возрастанию срока, с загруженными кандзи и словами.
+
+        Кандзи и слова порции читаются двумя запросами (по ID), а не по одному
+        на карточку.
+
+        Args:
+            now: Текущее время (Unix, секунды).
+            limit: Наибольшее число карточек.
+            exclude: Пары (item_type, item_id), уже загруженные в сессию.
+        """
+        states = self.db_manager.get_due_srs_states(now, limit, exclude)
+        kanji = {kanji.id: kanji for kanji in self.db_manager.get_kanji_by_ids(
+            [state.item_id for state in states if state.item_type == 'kanji'])}
+        words = {word.id: word for word in self.db_manager.get_words_by_ids(
+            [state.item_id for state in states if state.item_type == 'word'])}
+        cards = []
+        for state in states:
+            item = (kanji if state.item_type == 'kanji' else words).get(state.item_id)
+            if item is not None:
+                cards.append(StudyCard(state, item))
+        return cards
+
+    def save_review_states(self, states: List[SrsState]) -> int:
+        """
+        Записать пачку оценок одной транзакцией.
+
+        Ошибка не перехватывается: сессия повторения оставляет оценки у себя
+        и повторяет запись со следующей пачкой.
+        """
+        return self.db_manager.save_srs_states(states)
+
+    def enroll_study(self, kanji_ids: List[int] = (), word_ids: List[int] = ()) -> int:
+        """Добавить кандзи и слова к изучению (к повторению сразу). Возвращает количество добавленных."""
+        now = int(time.time())
+        return self._enroll('enroll_study', lambda: (
+            self.db_manager.enroll_srs('kanji', list(kanji_ids), now, INITIAL_EASE)
+            + self.db_manager.enroll_srs('word', list(word_ids), now, INITIAL_EASE)))
+
+    def enroll_jlpt(self, jlpt_level: int) -> int:
+        """Добавить к изучению все кандзи уровня JLPT. Возвращает количество добавленных."""
+        return self._enroll('enroll_jlpt', lambda: self.db_manager.enroll_srs_jlpt(
+            jlpt_level, int(time.time()), INITIAL_EASE))
+
+    def _enroll(self, operation: str, func) -> int:
+        """Как _bulk_write, но без сброса кэшей поиска: карточки повторения в поиске не участвуют"""
+        try:
+            with self.db_manager.transaction():
+                return func()
+        except Exception as e:
+            logger.error("Ошибка операции %s: %s", operation, e, exc_info=True,
+                         extra={"context": {'operation': operation}})
+            return 0
+
+    def get_study_counts(self, now: Optional[int] = None) -> dict:
+        """Число карточек к повторению сейчас, на ближайшие сутки и всего"""
+        return self.db_manager.get_srs_counts(int(time.time()) if now is None else now)
+
+    # --- Журнал занятий и статистика ---
+
+    def record_review_events(self, events: List[ReviewEvent]) -> int:
+        """
+        Записать пачку событий в журнал и обновить сводки одной транзакцией.
+
+        Ошибка не перехватывается: события остаются в буфере окна и
+        записываются со следующей пачкой.
+        """
+        with self.db_manager.transaction():
+            count = self.db_manager.append_review_log(events)
+            self.db_manager.add_review_rollups(rollup_deltas(events))
+        return count
+
+    def rebuild_review_rollups(self, chunk_size: int = 5000) -> int:
+        """Пересчитать сводки по всему журналу (восстановление). Возвращает число событий"""
+        with self.db_manager.transaction():
+            self.db_manager.clear_review_rollups()
+            last_id, total = 0, 0
+            while True:
+                chunk = self.db_manager.get_review_log_chunk(last_id, chunk_size)
+                if not chunk:
+                    break
+                self.db_manager.add_review_rollups(rollup_deltas(event for _, event in chunk))
+                last_id, total = chunk[-1][0], total + len(chunk)
+        logger.info("Сводки журнала занятий пересчитаны: %d событий", total,
+                    extra={"context": {'operation': 'rebuild_review_rollups', 'events': total}})
+        return total
+
+    def get_review_statistics(self, days: int = 14, weeks: int = 8, today: Optional[date] = None) -> dict:
+        """
+        Статистика занятий из сводок (журнал не просматривается).
+
+        Returns:
+            Словарь: 'days' и 'weeks' - списки (дата начала, счетчики) за
+            последние days дней и weeks недель, включая пустые периоды;
+            'total' - счетчики за все время; 'by_jlpt' - счетчики за все
+            время по уровням и 'kanji_by_jlpt' - число кандзи уровня;
+            'study' - число карточек к повторению.
+        """
+        today = today or date.today()
+        day_starts = [(today - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+        monday = today - timedelta(days=today.weekday())
+        week_starts = [(monday - timedelta(weeks=offset)).isoformat() for offset in range(weeks - 1, -1, -1)]
+
+        def by_start(period: str, starts: List[str]) -> list:
+            rows = {}
+            for row in self.db_manager.get_review_rollups(period, starts[0]):
+                rows.setdefault(row.period_start, []).append(row)
+            return [(start, merge_rollups(rows.get(start, ()))) for start in starts]
+
+        totals = self.db_manager.get_review_rollups('total')
+        return {
+            'days': by_start('day', day_starts),
+            'weeks': by_start('week', week_starts),
+            'total': merge_rollups(totals),
+            'by_jlpt': {row.jlpt_level: merge_rollups([row]) for row in totals},
+            'kanji_by_jlpt': self.db_manager.get_kanji_counts_by_jlpt(),
+            'study': self.get_study_counts(),
+        }
@@ -1,8 +1,30 @@
+import logging
+import os
 import sqlite3
-from typing import List, Optional
-from entities import Kanji, Word
-
-
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from db_snapshot import SNAPSHOT_ENABLED, MemorySnapshot
+from entities import Kanji, KanjiTile, ReviewEvent, ReviewRollup, SrsState, Word
+from instrumentation import TRACE_ENABLED, instrument_class, sql_trace_callback
+from lookup_index import LOOKUP_INDEX_ENABLED, LookupIndexManager
+from search_query import SearchQuery, ascii_lower, normalize_reading, reading_keys, to_katakana
+from stemming import stem_terms
+
+logger = logging.getLogger(__name__)
+
+# Наибольшее число значений в одном IN пакетных операций (старые SQLite допускают 999 параметров)
+IN_CHUNK_SIZE = 500
+
+# Столбцы srs_state в порядке полей SrsState
+SRS_COLUMNS = 'item_type, item_id, due_at, interval_days, ease, repetitions, lapses, last_review_at'
+# Столбцы review_log и review_rollup в порядке полей ReviewEvent и ReviewRollup
+REVIEW_LOG_COLUMNS = 'event, item_type, item_id, at, grade, repetitions, duration_ms, jlpt_level'
+REVIEW_ROLLUP_COLUMNS = 'period, period_start, jlpt_level, reviews, correct, learned, lapses, views, duration_ms'
+
+
+@instrument_class
 class DatabaseManager:
     """
     Класс для низкоуровневых операций с базой данных.
@@ -12,16 +34,244 @@ class DatabaseManager:
 
     Attributes:
         db_name (str): Имя файла базы данных SQLite.
+        snapshot (MemorySnapshot): Копия базы в памяти для чтений или None.
+        lookup_index (LookupIndexManager): Файловый индекс точного поиска по символу
+            и чтению или None.
     """
 
-    def __init__(self, db_name: str = "kanji.db") -> None:
+    def __init__(self, db_name: str = "kanji.db", snapshot: Optional[bool] = None,
+                 lookup_index: Optional[bool] = None) -> None:
         """
         Инициализирует менеджер базы данных.
 
         Args:
             db_name: Имя файла базы данных. По умолчанию "kanji.db".
+            snapshot: Читать из копии базы в памяти (см. db_snapshot). Копия
+                загружается в фоне; до ее готовности чтения идут к файлу.
+                По умолчанию - по переменной окружения KANJIAPP_SNAPSHOT.
+            lookup_index: Отвечать на поиск кандзи по символу и записей по чтению
+                из файлового индекса (см. lookup_index) без обращения к SQLite.
+                По умолчанию включено; отключается KANJIAPP_LOOKUP_INDEX=0.
         """
         self.db_name = db_name
+        # Сколько соединений открыто с запуска, включая уже закрытые (для диагностики)
+        self.connection_count = 0
+        # Закрепленное соединение и глубина транзакции - свои у каждого потока
+        self._local = threading.local()
+        # Проверена ли база, созданная до индексов основ (_ensure_term_index)
+        self._term_index_checked = False
+        self._schema_lock = threading.Lock()
+        if snapshot is None:
+            snapshot = SNAPSHOT_ENABLED
+        self.snapshot: Optional[MemorySnapshot] = None
+        # Соединения с копией в памяти по идентификатору потока (чтобы прервать запрос)
+        self._snapshot_readers: Dict[int, sqlite3.Connection] = {}
+        if snapshot:
+            self.snapshot = MemorySnapshot(db_name)
+            self.snapshot.start()
+        if lookup_index is None:
+            lookup_index = LOOKUP_INDEX_ENABLED
+        self.lookup_index: Optional[LookupIndexManager] = None
+        if lookup_index:
+            self.lookup_index = LookupIndexManager(db_name, self.get_data_version, self.get_lookup_source)
+
+    def _open_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_name)
+        self.connection_count += 1
+        if TRACE_ENABLED:
+            conn.set_trace_callback(sql_trace_callback)
+        if not self._term_index_checked:
+            self._ensure_term_index(conn)
+        return conn
+
+    def pin_connection(self) -> sqlite3.Connection:
+        """
+        Закрепляет за текущим потоком одно соединение.
+
+        Все последующие вызовы методов из этого потока используют его, а не
+        открывают новое. Нужно долгоживущим потокам (например, потоку базы данных).
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open_connection()
+            self._local.pinned = True
+        return conn
+
+    def release_connection(self) -> None:
+        """Закрывает соединение, закрепленное за текущим потоком."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and getattr(self._local, "pinned", False):
+            self._local.conn = None
+            self._local.pinned = False
+            conn.close()
+        reader = getattr(self._local, "snapshot_conn", None)
+        if reader is not None:
+            self._local.snapshot_conn = None
+            self._snapshot_readers.pop(threading.get_ident(), None)
+            reader.close()
+
+    def interrupt_snapshot_read(self, thread_id: int) -> None:
+        """Прерывает запрос, который поток thread_id выполняет по копии в памяти."""
+        conn = self._snapshot_readers.get(thread_id)
+        if conn is not None:
+            conn.interrupt()
+
+    def close(self) -> None:
+        """Останавливает загрузку копии в памяти и построение индекса поиска."""
+        if self.snapshot is not None:
+            self.snapshot.stop()
+        if self.lookup_index is not None:
+            self.lookup_index.stop()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Объединяет вызовы методов внутри блока with в одну транзакцию.
+
+        Пока блок выполняется, методы текущего потока работают через одно
+        соединение и не фиксируют изменения сами: фиксация происходит один раз
+        при выходе из внешнего блока, при исключении - откат всего блока.
+        Вложенный блок присоединяется к внешней транзакции через SAVEPOINT:
+        исключение в нем откатывает только его изменения (и отменяет его
+        after_commit), а внешняя транзакция продолжается, если исключение
+        перехвачено. Функции, переданные в after_commit, вызываются после
+        фиксации внешнего блока.
+        """
+        local = self._local
+        if getattr(local, "depth", 0):
+            conn = local.conn
+            savepoint = f"nested_{local.depth}"
+            conn.execute(f"SAVEPOINT {savepoint}")
+            callbacks_before = len(local.after_commit)
+            local.depth += 1
+            try:
+                yield conn
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                    conn.execute(f"RELEASE {savepoint}")
+                del local.after_commit[callbacks_before:]
+                raise
+            else:
+                conn.execute(f"RELEASE {savepoint}")
+            finally:
+                local.depth -= 1
+            return
+
+        pinned = getattr(local, "pinned", False)
+        conn = local.conn if pinned else self._open_connection()
+        local.conn = conn
+        local.depth = 1
+        local.after_commit = []
+        callbacks = []
+        changes = conn.total_changes
+        try:
+            with conn:
+                # Явный BEGIN: иначе транзакцию открыл бы SAVEPOINT вложенного
+                # блока, и его RELEASE зафиксировал бы все сделанное до него
+                if not conn.in_transaction:
+                    conn.execute("BEGIN")
+                yield conn
+            self._committed(conn, changes)
+            callbacks = local.after_commit
+        finally:
+            local.depth = 0
+            local.after_commit = []
+            if not pinned:
+                local.conn = None
+                conn.close()
+        for callback in callbacks:
+            callback()
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        """
+        Вызывает callback, когда изменения текущего потока зафиксированы.
+
+        Внутри transaction() - после фиксации внешнего блока (при откате не
+        вызывается), иначе - сразу: методы вне транзакции фиксируют запись сами.
+        """
+        if getattr(self._local, "depth", 0):
+            self._local.after_commit.append(callback)
+        else:
+            callback()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Выдает соединение с базой на время блока with.
+
+        Внутри transaction() возвращается соединение транзакции, и фиксацию
+        выполняет она. Иначе при выходе из блока транзакция фиксируется (или
+        откатывается при исключении); временное соединение при этом закрывается,
+        закрепленное (pin_connection) остается открытым. При включенной
+        трассировке (KANJIAPP_TRACE) все запросы передаются в instrumentation.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            if getattr(self._local, "depth", 0):
+                yield conn
+            else:
+                changes = conn.total_changes
+                with conn:
+                    yield conn
+                self._committed(conn, changes)
+            return
+
+        conn = self._open_connection()
+        try:
+            changes = conn.total_changes
+            with conn:
+                yield conn
+            self._committed(conn, changes)
+        finally:
+            conn.close()
+
+    def _committed(self, conn: sqlite3.Connection, changes_before: int) -> None:
+        """После фиксации: если соединение что-то изменило, копия в памяти устарела, а индекс поиска сверит версию"""
+        if conn.total_changes == changes_before:
+            return
+        if self.snapshot is not None:
+            self.snapshot.invalidate()
+        if self.lookup_index is not None:
+            self.lookup_index.invalidate()
+
+    def _lookup(self):
+        """Актуальный индекс поиска или None (внутри transaction() индекс не видит незафиксированных записей)"""
+        if self.lookup_index is None or getattr(self._local, "depth", 0):
+            return None
+        return self.lookup_index.current()
+
+    @contextmanager
+    def _read(self) -> Iterator[sqlite3.Connection]:
+        """
+        Выдает соединение для чтения.
+
+        Если копия базы в памяти актуальна и поток не находится внутри
+        transaction(), чтение идет по копии (соединение с ней у каждого потока
+        свое и переоткрывается после перезагрузки копии). Иначе - как _connect().
+        """
+        snapshot = self.snapshot
+        if snapshot is None or getattr(self._local, "depth", 0) or not snapshot.is_ready:
+            with self._connect() as conn:
+                yield conn
+            return
+
+        local = self._local
+        conn = getattr(local, "snapshot_conn", None)
+        if conn is None or local.snapshot_generation != snapshot.generation:
+            opened = snapshot.connect()
+            if opened is None:
+                with self._connect() as conn:
+                    yield conn
+                return
+            if conn is not None:
+                conn.close()
+            local.snapshot_generation, conn = opened
+            local.snapshot_conn = self._snapshot_readers[threading.get_ident()] = conn
+            self.connection_count += 1
+            if TRACE_ENABLED:
+                conn.set_trace_callback(sql_trace_callback)
+        yield conn
 
     def initialize_database(self) -> None:
         """
@@ -36,8 +286,11 @@ class DatabaseManager:
 
         Также создает индексы для ускорения поиска.
         """
-        with sqlite3.connect(self.db_name) as conn:
+        with self._connect() as conn:
             conn.execute("PRAGMA foreign_keys = ON")
+            # Свободные страницы возвращаются порциями (maintenance); действует
+            # только для новой пустой базы, старую переводит обслуживание
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
 
             # Таблица слов
             conn.execute('''
@@ -99,6 +352,247 @@ class DatabaseManager:
             # Индексы для ускорения поиска
             conn.execute('CREATE INDEX IF NOT EXISTS idx_kanji_character ON kanji(character)')
             conn.execute('CREATE INDEX IF NOT EXISTS idx_vocabulary_japanese ON vocabulary(japanese)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_vocabulary_reading ON vocabulary(reading)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_kanji_jlpt ON kanji(jlpt_level)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_kanji_components_component '
+                         'ON kanji_components(component_id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_vocabulary_kanji_kanji '
+                         'ON vocabulary_kanji(kanji_id)')
+
+            self._create_term_index(conn)
+
+            # Версия данных, общая для всех процессов: по ней файловый индекс
+            # поиска (lookup_index) узнает, что устарел, а сервер выдает ETag.
+            # Ее увеличивает любая запись в словарные таблицы, включая
+            # варианты, компоненты и связи слово-кандзи. Начальное значение -
+            # время создания в мс, чтобы версии пересозданной базы не совпали
+            # с версиями старых файлов индекса.
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS db_meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            ''')
+            conn.execute("INSERT OR IGNORE INTO db_meta (key, value) VALUES ('data_version', ?)",
+                         (int(time.time() * 1000),))
+            for table in ('kanji', 'vocabulary', 'kanji_variants', 'kanji_components', 'vocabulary_kanji'):
+                for event in ('INSERT', 'UPDATE', 'DELETE'):
+                    conn.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version
+                        AFTER {event} ON {table}
+                        BEGIN
+                            UPDATE db_meta SET value = value + 1 WHERE key = 'data_version';
+                        END
+                    ''')
+
+            # Интервальное повторение (srs): состояние карточки кандзи или слова.
+            # Индекс по due_at - следующая карточка к повторению находится
+            # поиском по индексу при любом числе карточек.
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS srs_state (
+                    item_type TEXT NOT NULL,
+                    item_id INTEGER NOT NULL,
+                    due_at INTEGER NOT NULL,
+                    interval_days REAL NOT NULL DEFAULT 0,
+                    ease REAL NOT NULL,
+                    repetitions INTEGER NOT NULL DEFAULT 0,
+                    lapses INTEGER NOT NULL DEFAULT 0,
+                    last_review_at INTEGER,
+                    PRIMARY KEY (item_type, item_id)
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_srs_state_due ON srs_state(due_at)')
+            # item_id ссылается на kanji или vocabulary в зависимости от item_type,
+            # поэтому вместо внешнего ключа - триггеры удаления
+            for table, item_type in (('kanji', 'kanji'), ('vocabulary', 'word')):
+                conn.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_{table}_delete_srs
+                    AFTER DELETE ON {table}
+                    BEGIN
+                        DELETE FROM srs_state WHERE item_type = '{item_type}' AND item_id = OLD.id;
+                    END
+                ''')
+
+            # Журнал занятий: строки только добавляются, индексов кроме rowid нет,
+            # чтобы вставка оставалась дешевой. Статистика читается из сводок
+            # review_rollup, которые обновляются вместе с каждой пачкой событий.
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS review_log (
+                    id INTEGER PRIMARY KEY,
+                    event TEXT NOT NULL,
+                    item_type TEXT NOT NULL,
+                    item_id INTEGER NOT NULL,
+                    at INTEGER NOT NULL,
+                    grade INTEGER,
+                    repetitions INTEGER,
+                    duration_ms INTEGER NOT NULL DEFAULT 0,
+                    jlpt_level INTEGER
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS review_rollup (
+                    period TEXT NOT NULL,
+                    period_start TEXT NOT NULL,
+                    jlpt_level INTEGER NOT NULL,
+                    reviews INTEGER NOT NULL DEFAULT 0,
+                    correct INTEGER NOT NULL DEFAULT 0,
+                    learned INTEGER NOT NULL DEFAULT 0,
+                    lapses INTEGER NOT NULL DEFAULT 0,
+                    views INTEGER NOT NULL DEFAULT 0,
+                    duration_ms INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (period, period_start, jlpt_level)
+                ) WITHOUT ROWID
+            ''')
+
+            # База, созданная до появления индекса, заполняется один раз
+            if (conn.execute('SELECT 1 FROM kanji_meaning_terms LIMIT 1').fetchone() is None
+                    and conn.execute('SELECT 1 FROM vocabulary_translation_terms LIMIT 1').fetchone() is None):
+                self._rebuild_term_index(conn)
+
+    @staticmethod
+    def _create_term_index(conn: sqlite3.Connection) -> None:
+        """Создает инвертированные индексы основ слов значений и переводов."""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS kanji_meaning_terms (
+                term TEXT NOT NULL,
+                kanji_id INTEGER NOT NULL,
+                PRIMARY KEY (term, kanji_id),
+                FOREIGN KEY (kanji_id) REFERENCES kanji (id) ON DELETE CASCADE
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS vocabulary_translation_terms (
+                term TEXT NOT NULL,
+                vocabulary_id INTEGER NOT NULL,
+                PRIMARY KEY (term, vocabulary_id),
+                FOREIGN KEY (vocabulary_id) REFERENCES vocabulary (id) ON DELETE CASCADE
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_kanji_meaning_terms_kanji '
+                     'ON kanji_meaning_terms(kanji_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_vocabulary_translation_terms_vocabulary '
+                     'ON vocabulary_translation_terms(vocabulary_id)')
+
+    def _ensure_term_index(self, conn: sqlite3.Connection) -> None:
+        """
+        Создает и заполняет индексы основ в базе, созданной до их появления.
+
+        Вызывается при открытии первого соединения, поэтому поиск и запись
+        работают со старой базой и без initialize_database(). Проверка
+        выполняется один раз за время жизни DatabaseManager.
+        """
+        with self._schema_lock:
+            if self._term_index_checked:
+                return
+            self._term_index_checked = True
+            try:
+                with conn:
+                    tables = {name for (name,) in conn.execute(
+                        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN "
+                        "('kanji', 'vocabulary', 'kanji_meaning_terms', 'vocabulary_translation_terms')")}
+                    # Новую базу целиком создает initialize_database()
+                    if not {'kanji', 'vocabulary'} <= tables or \
+                            {'kanji_meaning_terms', 'vocabulary_translation_terms'} <= tables:
+                        return
+                    self._create_term_index(conn)
+                    self._rebuild_term_index(conn)
+            except sqlite3.Error as e:
+                logger.error("Не удалось создать индекс основ: %s", e,
+                             extra={"context": {'operation': 'ensure_term_index', 'db': self.db_name}})
+                return
+            logger.info("Создан индекс основ для базы %s", self.db_name)
+            if self.snapshot is not None:
+                self.snapshot.invalidate()
+
+    @staticmethod
+    def _index_kanji_meaning(conn: sqlite3.Connection, kanji_id: int, meaning: str) -> None:
+        """Перестраивает записи индекса основ для значения одного кандзи."""
+        conn.execute('DELETE FROM kanji_meaning_terms WHERE kanji_id = ?', (kanji_id,))
+        conn.executemany('INSERT OR IGNORE INTO kanji_meaning_terms (term, kanji_id) VALUES (?, ?)',
+                         [(term, kanji_id) for term in stem_terms(meaning)])
+
+    @staticmethod
+    def _index_vocabulary_translation(conn: sqlite3.Connection, word_id: int, translation: str) -> None:
+        """Перестраивает записи индекса основ для перевода одного слова."""
+        conn.execute('DELETE FROM vocabulary_translation_terms WHERE vocabulary_id = ?', (word_id,))
+        conn.executemany('INSERT OR IGNORE INTO vocabulary_translation_terms (term, vocabulary_id) VALUES (?, ?)',
+                         [(term, word_id) for term in stem_terms(translation)])
+
+    def _rebuild_term_index(self, conn: sqlite3.Connection) -> None:
+        """Полностью перестраивает индексы основ по таблицам kanji и vocabulary."""
+        conn.execute('DELETE FROM kanji_meaning_terms')
+        conn.execute('DELETE FROM vocabulary_translation_terms')
+        for kanji_id, meaning in conn.execute('SELECT id, meaning FROM kanji').fetchall():
+            self._index_kanji_meaning(conn, kanji_id, meaning)
+        for word_id, translation in conn.execute('SELECT id, translation FROM vocabulary').fetchall():
+            self._index_vocabulary_translation(conn, word_id, translation)
+
+    @staticmethod
+    def _term_index_clause(table: str, id_column: str) -> str:
+        """Условие поиска по индексу основ: точное совпадение или совпадение по префиксу основы."""
+        return f'SELECT {id_column} FROM {table} WHERE term = ? OR (term > ? AND term < ?)'
+
+    @staticmethod
+    def _term_params(term: str) -> list:
+        return [term, term, term + '\U0010ffff']
+
+    def _search_term_index(self, table: str, id_column: str, text: str) -> List[int]:
+        """
+        Ищет идентификаторы по индексу основ.
+
+        Каждое слово запроса должно совпасть с основой целиком или быть ее
+        префиксом. Записи, где все слова совпали целиком, идут первыми.
+
+        Returns:
+            Список идентификаторов, отсортированный по релевантности.
+        """
+        terms = stem_terms(text)
+        if not terms:
+            return []
+
+        scores = None
+        with self._read() as conn:
+            for term in terms:
+                rows = conn.execute(f'''
+                    SELECT {id_column}, MAX(term = ?) FROM {table}
+                    WHERE term = ? OR (term > ? AND term < ?)
+                    GROUP BY {id_column}
+                ''', [term] + self._term_params(term)).fetchall()
+                term_scores = {item_id: exact for item_id, exact in rows}
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {item_id: scores[item_id] + exact
+                              for item_id, exact in term_scores.items() if item_id in scores}
+                if not scores:
+                    return []
+
+        return [item_id for item_id, _ in sorted(scores.items(), key=lambda item: (-item[1], item[0]))]
+
+    def search_kanji_by_meaning(self, text: str) -> List[Kanji]:
+        """
+        Ищет кандзи по значению через индекс основ слов.
+
+        Args:
+            text: Слова на русском или английском в любой форме.
+
+        Returns:
+            Список Kanji: сначала совпадения по основам целиком, затем по префиксу.
+        """
+        return self.get_kanji_by_ids(self._search_term_index('kanji_meaning_terms', 'kanji_id', text))
+
+    def search_vocabulary_by_translation(self, text: str) -> List[Word]:
+        """
+        Ищет слова по переводу через индекс основ слов.
+
+        Args:
+            text: Слова на русском или английском в любой форме.
+
+        Returns:
+            Список Word: сначала совпадения по основам целиком, затем по префиксу.
+        """
+        return self.get_words_by_ids(
+            self._search_term_index('vocabulary_translation_terms', 'vocabulary_id', text))
 
     def get_kanji_by_id(self, kanji_id: int) -> Optional[Kanji]:
         """
@@ -110,16 +604,18 @@ class DatabaseManager:
         Returns:
             Объект Kanji если найден, иначе None.
         """
-        with sqlite3.connect(self.db_name) as conn:
+        with self._read() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM kanji WHERE id = ?', (kanji_id,))
             row = cursor.fetchone()
             if row:
-                return Kanji(
+                kanji = Kanji(
                     id=row[0], character=row[1], meaning=row[2],
                     on_readings=row[3], kun_readings=row[4],
                     jlpt_level=row[5], is_complex=bool(row[6]), notes=row[7]
                 )
+                kanji.mark_clean()
+                return kanji
             return None
 
     def get_kanji_by_character(self, character: str) -> Optional[Kanji]:
@@ -132,7 +628,10 @@ class DatabaseManager:
         Returns:
             Объект Kanji если найден, иначе None.
         """
-        with sqlite3.connect(self.db_name) as conn:
+        index = self._lookup()
+        if index is not None:
+            return index.kanji_by_character(character)
+        with self._read() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM kanji WHERE character = ?', (character,))
             row = cursor.fetchone()
@@ -144,6 +643,398 @@ class DatabaseManager:
                 )
             return None
 
+    def get_kanji_by_ids(self, kanji_ids: List[int]) -> List[Kanji]:
+        """
+        Получает несколько кандзи одним запросом.
+
+        Args:
+            kanji_ids: Список идентификаторов.
+
+        Returns:
+            Список найденных объектов Kanji в порядке kanji_ids.
+        """
+        if not kanji_ids:
+            return []
+        placeholders = ", ".join("?" * len(kanji_ids))
+        with self._read() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'SELECT * FROM kanji WHERE id IN ({placeholders})', list(kanji_ids))
+
+            by_id = {}
+            for row in cursor.fetchall():
+                by_id[row[0]] = Kanji(
+                    id=row[0], character=row[1], meaning=row[2],
+                    on_readings=row[3], kun_readings=row[4],
+                    jlpt_level=row[5], is_complex=bool(row[6]), notes=row[7]
+                )
+            return [by_id[kanji_id] for kanji_id in kanji_ids if kanji_id in by_id]
+
+    def get_words_by_ids(self, word_ids: List[int]) -> List[Word]:
+        """
+        Получает несколько слов одним запросом.
+
+        Args:
+            word_ids: Список идентификаторов.
+
+        Returns:
+            Список найденных объектов Word в порядке word_ids.
+        """
+        if not word_ids:
+            return []
+        placeholders = ", ".join("?" * len(word_ids))
+        with self._read() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, japanese, reading, translation, notes
+                FROM vocabulary WHERE id IN ({placeholders})
+            ''', list(word_ids))
+
+            by_id = {}
+            for row in cursor.fetchall():
+                by_id[row[0]] = Word(
+                    id=row[0], japanese=row[1], reading=row[2],
+                    translation=row[3], notes=row[4]
+                )
+            return [by_id[word_id] for word_id in word_ids if word_id in by_id]
+
+    def get_words_by_forms(self, forms: List[str]) -> List[Word]:
+        """
+        Получает слова, у которых написание или чтение точно совпадает
+        с одной из форм. Выполняется одним запросом по индексам.
+
+        Args:
+            forms: Список словарных форм-кандидатов.
+
+        Returns:
+            Список объектов Word.
+        """
+        if not forms:
+            return []
+        placeholders = ", ".join("?" * len(forms))
+        with self._read() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, japanese, reading, translation, notes
+                FROM vocabulary
+                WHERE japanese IN ({placeholders}) OR reading IN ({placeholders})
+            ''', list(forms) + list(forms))
+
+            results = []
+            for row in cursor.fetchall():
+                word = Word(
+                    id=row[0], japanese=row[1], reading=row[2],
+                    translation=row[3], notes=row[4]
+                )
+                results.append(word)
+            return results
+
+    def get_all_kanji_meanings(self) -> List[Tuple[int, str]]:
+        """
+        Получает значения всех кандзи (для построения поисковых индексов).
+
+        Returns:
+            Список пар (id, meaning).
+        """
+        with self._read() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id, meaning FROM kanji')
+            return cursor.fetchall()
+
+    def get_all_vocabulary_translations(self) -> List[Tuple[int, str]]:
+        """
+        Получает переводы всех слов (для построения поисковых индексов).
+
+        Returns:
+            Список пар (id, translation).
+        """
+        with self._read() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id, translation FROM vocabulary')
+            return cursor.fetchall()
+
+    def get_entries_by_reading(self, reading: str) -> Tuple[List[Kanji], List[Word]]:
+        """
+        Получает кандзи и слова с точно совпадающим чтением.
+
+        Чтение сравнивается в хирагане и без знаков окуригана: "いち" находит
+        кандзи с онъёми イチ, "ひとつ" и "ひと" - кандзи с кунъёми ひと.つ.
+
+        Args:
+            reading: Чтение хираганой или катаканой.
+
+        Returns:
+            (кандзи по возрастанию ID, слова по возрастанию ID).
+        """
+        key = normalize_reading(reading)
+        if not key:
+            return [], []
+        index = self._lookup()
+        if index is not None:
+            return index.entries_by_reading(key)
+
+        # Без индекса: кандидаты по LIKE, точное совпадение ключа - в Python
+        katakana = to_katakana(key)
+        with self._read() as conn:
+            kanji = []
+            for row in conn.execute('''
+                SELECT * FROM kanji
+                WHERE REPLACE(on_readings, '.', '') LIKE ? OR REPLACE(on_readings, '.', '') LIKE ?
+                   OR REPLACE(kun_readings, '.', '') LIKE ? OR REPLACE(kun_readings, '.', '') LIKE ?
+                ORDER BY id
+            ''', (f"%{katakana}%", f"%{key}%", f"%{katakana}%", f"%{key}%")):
+                if key in reading_keys(row[3]) or key in reading_keys(row[4]):
+                    kanji.append(Kanji(
+                        id=row[0], character=row[1], meaning=row[2],
+                        on_readings=row[3], kun_readings=row[4],
+                        jlpt_level=row[5], is_complex=bool(row[6]), notes=row[7]
+                    ))
+            words = [
+                Word(id=row[0], japanese=row[1], reading=row[2], translation=row[3], notes=row[4])
+                for row in conn.execute('''
+                    SELECT id, japanese, reading, translation, notes FROM vocabulary
+                    WHERE REPLACE(reading, '.', '') LIKE ? OR REPLACE(reading, '.', '') LIKE ? ORDER BY id
+                ''', (f"%{katakana}%", f"%{key}%"))
+                if key in reading_keys(row[2])
+            ]
+            return kanji, words
+
+    def get_data_version(self) -> Optional[int]:
+        """
+        Версия данных из db_meta (общая для всех процессов) или None, если
+        база создана без нее и еще не инициализирована заново. Читается из
+        файла, а не из копии в памяти: копия не видит записей других процессов.
+        """
+        with self._connect() as conn:
+            try:
+                row = conn.execute("SELECT value FROM db_meta WHERE key = 'data_version'").fetchone()
+            except sqlite3.OperationalError:
+                return None
+            return row[0] if row else None
+
+    def get_lookup_source(self) -> Optional[Tuple[int, list, list]]:
+        """
+        Данные для построения индекса поиска (lookup_index).
+
+        Returns:
+            (версия данных, строки kanji, строки vocabulary) или None, если
+            версии нет или данные изменились во время чтения.
+        """
+        # Из файла, а не из копии в памяти: версию индекса сверяют с файлом
+        # (get_data_version), а копия не видит записей других процессов
+        with self._connect() as conn:
+            try:
+                version_sql = "SELECT value FROM db_meta WHERE key = 'data_version'"
+                version = conn.execute(version_sql).fetchone()
+                kanji_rows = conn.execute('''
+                    SELECT id, character, meaning, on_readings, kun_readings, jlpt_level, is_complex, notes
+                    FROM kanji
+                ''').fetchall()
+                word_rows = conn.execute(
+                    'SELECT id, japanese, reading, translation, notes FROM vocabulary').fetchall()
+                version_after = conn.execute(version_sql).fetchone()
+            except sqlite3.OperationalError:
+                return None
+        if version is None or version != version_after:
+            return None
+        return version[0], kanji_rows, word_rows
+
+    def get_kanji_tiles(self, jlpt_level: Optional[int] = None,
+                        component_id: Optional[int] = None) -> List[KanjiTile]:
+        """
+        Получает кандзи для сетки: только столбцы, нужные плитке.
+
+        Args:
+            jlpt_level: Только кандзи этого уровня (None - любого).
+            component_id: Только кандзи, содержащие этот компонент (None - все).
+
+        Returns:
+            Список KanjiTile: по уровню JLPT от N5 к N1, затем по ID.
+        """
+        sql = 'SELECT k.id, k.character, k.meaning, k.jlpt_level FROM kanji k'
+        conditions, params = [], []
+        if component_id is not None:
+            sql += ' JOIN kanji_components kc ON kc.kanji_id = k.id'
+            conditions.append('kc.component_id = ?')
+            params.append(component_id)
+        if jlpt_level is not None:
+            conditions.append('k.jlpt_level = ?')
+            params.append(jlpt_level)
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY k.jlpt_level IS NULL, k.jlpt_level DESC, k.id'
+        with self._read() as conn:
+            return [KanjiTile(*row) for row in conn.execute(sql, params)]
+
+    def get_all_kanji_ids(self) -> List[int]:
+        """Получает ID всех кандзи по возрастанию (для экспорта)."""
+        with self._read() as conn:
+            return [row[0] for row in conn.execute('SELECT id FROM kanji ORDER BY id')]
+
+    def get_all_vocabulary_ids(self) -> List[int]:
+        """Получает ID всех слов по возрастанию (для экспорта)."""
+        with self._read() as conn:
+            return [row[0] for row in conn.execute('SELECT id FROM vocabulary ORDER BY id')]
+
+    def get_statistics(self) -> dict:
+        """
+        Собирает сводку по содержимому базы.
+
+        Returns:
+            Словарь с количеством кандзи, слов, связей и распределением кандзи по JLPT.
+        """
+        with self._read() as conn:
+            def count(table: str) -> int:
+                return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+            by_jlpt = dict(conn.execute(
+                'SELECT jlpt_level, COUNT(*) FROM kanji GROUP BY jlpt_level ORDER BY jlpt_level').fetchall())
+            return {
+                'kanji': count('kanji'),
+                'complex_kanji': conn.execute('SELECT COUNT(*) FROM kanji WHERE is_complex').fetchone()[0],
+                'words': count('vocabulary'),
+                'kanji_variants': count('kanji_variants'),
+                'kanji_components': count('kanji_components'),
+                'vocabulary_kanji': count('vocabulary_kanji'),
+                'kanji_by_jlpt': by_jlpt,
+            }
+
+    def get_meta(self, key: str) -> Optional[int]:
+        """Значение из служебной таблицы db_meta или None."""
+        with self._read() as conn:
+            try:
+                row = conn.execute('SELECT value FROM db_meta WHERE key = ?', (key,)).fetchone()
+            except sqlite3.OperationalError:
+                return None
+            return row[0] if row else None
+
+    def set_meta(self, key: str, value: int) -> None:
+        """Записывает значение в служебную таблицу db_meta."""
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO db_meta (key, value) VALUES (?, ?)', (key, value))
+
+    def get_storage_stats(self) -> dict:
+        """
+        Сводка по файлу базы для обслуживания.
+
+        Returns:
+            Словарь: размер файла, размер и число страниц, свободные страницы
+            и режим auto_vacuum (0 - нет, 1 - полный, 2 - инкрементальный).
+        """
+        with self._connect() as conn:
+            def pragma(name: str) -> int:
+                return conn.execute(f'PRAGMA {name}').fetchone()[0]
+
+            return {
+                'file_size': os.path.getsize(self.db_name) if os.path.exists(self.db_name) else 0,
+                'page_size': pragma('page_size'),
+                'page_count': pragma('page_count'),
+                'freelist_pages': pragma('freelist_count'),
+                'auto_vacuum': pragma('auto_vacuum'),
+            }
+
+    def get_table_names(self) -> List[str]:
+        """Имена пользовательских таблиц базы."""
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+
+    def get_foreign_key_tables(self) -> List[str]:
+        """Таблицы, у которых есть внешние ключи (связи и индексы основ)."""
+        with self._connect() as conn:
+            return [name for name, in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")
+                if conn.execute(f'PRAGMA foreign_key_list("{name}")').fetchone() is not None]
+
+    @staticmethod
+    def _orphan_condition(conn: sqlite3.Connection, table: str) -> Optional[str]:
+        """Условие WHERE для строк table с висячими внешними ключами (None - ключей нет)"""
+        conditions = [
+            f'("{table}"."{column}" IS NOT NULL AND NOT EXISTS '
+            f'(SELECT 1 FROM "{parent}" WHERE "{parent}"."{parent_column or "rowid"}" = "{table}"."{column}"))'
+            for _, _, parent, column, parent_column, *_ in conn.execute(f'PRAGMA foreign_key_list("{table}")')
+        ]
+        return " OR ".join(conditions) if conditions else None
+
+    def count_orphans(self, table: str) -> int:
+        """
+        Число строк table, ссылающихся на несуществующие кандзи или слова.
+
+        Внешние ключи соединений не включены (PRAGMA foreign_keys действует
+        только на соединение initialize_database), поэтому ON DELETE CASCADE
+        не срабатывает, и после удалений в таблицах связей остаются висячие строки.
+        Проверяется то же, что в PRAGMA foreign_key_check, но считаются строки,
+        а не нарушения (строка связи может ссылаться на два удаленных кандзи).
+        """
+        with self._connect() as conn:
+            condition = self._orphan_condition(conn, table)
+            if condition is None:
+                return 0
+            return conn.execute(f'SELECT COUNT(*) FROM "{table}" WHERE {condition}').fetchone()[0]
+
+    def delete_orphans(self, table: str) -> int:
+        """
+        Удаляет строки table с висячими внешними ключами.
+
+        Returns:
+            Число удаленных строк.
+        """
+        with self._connect() as conn:
+            condition = self._orphan_condition(conn, table)
+            if condition is None:
+                return 0
+            return conn.execute(f'DELETE FROM "{table}" WHERE {condition}').rowcount
+
+    def integrity_check(self, table: Optional[str] = None) -> List[str]:
+        """
+        Проверка целостности таблицы и ее индексов (table=None - всей базы).
+
+        Returns:
+            Список найденных проблем (пустой, если все в порядке).
+        """
+        sql = f'PRAGMA integrity_check("{table}")' if table else 'PRAGMA integrity_check'
+        with self._connect() as conn:
+            messages = [row[0] for row in conn.execute(sql)]
+        return [] if messages == ['ok'] else messages
+
+    def optimize_statistics(self, analysis_limit: int = 400) -> None:
+        """
+        Обновляет статистику планировщика запросов.
+
+        При первом запуске (статистики еще нет) выполняется ANALYZE, затем -
+        PRAGMA optimize, который анализирует только таблицы, где это нужно.
+        analysis_limit ограничивает число просматриваемых строк индекса.
+        """
+        with self._connect() as conn:
+            conn.execute(f'PRAGMA analysis_limit = {int(analysis_limit)}')
+            has_stats = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'").fetchone()
+            conn.execute('PRAGMA optimize' if has_stats else 'ANALYZE')
+
+    def incremental_vacuum(self, pages: int) -> int:
+        """
+        Возвращает системе до pages свободных страниц (нужен auto_vacuum = INCREMENTAL).
+
+        Returns:
+            Число свободных страниц, оставшихся после шага.
+        """
+        with self._connect() as conn:
+            # Каждый шаг оператора освобождает одну страницу, а execute() делает
+            # один шаг: выполнение до конца дает только executescript()
+            conn.executescript(f'PRAGMA incremental_vacuum({int(pages)});')
+            return conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+    def enable_incremental_vacuum(self) -> None:
+        """
+        Переводит существующую базу в режим auto_vacuum = INCREMENTAL.
+
+        Для этого база один раз перезаписывается целиком (VACUUM), поэтому
+        шаг не ограничен по времени и выполняется только при заметной доле
+        свободных страниц.
+        """
+        with self._connect() as conn:
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+
     def search_kanji_basic(self, query: str) -> List[Kanji]:
         """
         Выполняет базовый поиск кандзи по различным полям.
@@ -161,7 +1052,7 @@ class DatabaseManager:
         Returns:
             Список объектов Kanji, удовлетворяющих запросу.
         """
-        with sqlite3.connect(self.db_name) as conn:
+        with self._read() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT * FROM kanji
@@ -198,7 +1089,7 @@ class DatabaseManager:
         Returns:
             Список объектов Word, удовлетворяющих запросу.
         """
-        with sqlite3.connect(self.db_name) as conn:
+        with self._read() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT id, japanese, reading, translation, notes
@@ -217,6 +1108,184 @@ class DatabaseManager:
                 results.append(word)
             return results
 
+    @staticmethod
+    def _like_contains(value: Optional[str], query: str) -> bool:
+        """Аналог value LIKE '%query%': без учета регистра только для латиницы, как в SQLite."""
+        return value is not None and ascii_lower(query) in ascii_lower(value)
+
+    @classmethod
+    def kanji_matches_basic(cls, kanji: Kanji, query: str) -> bool:
+        """
+        Проверяет кандзи условием search_kanji_basic без обращения к базе.
+        Нужно для уточнения уже найденных результатов в памяти.
+        """
+        return (kanji.character == query
+                or cls._like_contains(kanji.meaning, query)
+                or cls._like_contains(kanji.on_readings, query)
+                or cls._like_contains(kanji.kun_readings, query)
+                or (query.isascii() and query.isdigit() and kanji.jlpt_level == int(query)))
+
+    @classmethod
+    def word_matches_basic(cls, word: Word, query: str) -> bool:
+        """Проверяет слово условием search_vocabulary_basic без обращения к базе."""
+        return (cls._like_contains(word.japanese, query)
+                or cls._like_contains(word.reading, query)
+                or cls._like_contains(word.translation, query))
+
+    @staticmethod
+    def _plan_kanji_query(query: SearchQuery) -> Tuple[str, list]:
+        """
+        Строит WHERE-условие для структурированного поиска кандзи.
+
+        Условия объединяются через AND. Порядок их проверки выбирает
+        планировщик SQLite, а не порядок в запросе, поэтому каждое условие
+        записано так, чтобы его можно было выполнить по индексу: has: и
+        meaning: - подзапросы по индексам связей и основ, jlpt: - по
+        idx_kanji_jlpt. Условия on:, kun: и свободный текст (LIKE) индексов не
+        используют и проверяются на строках, отобранных остальными.
+
+        Args:
+            query: Разобранный поисковый запрос.
+
+        Returns:
+            Кортеж (SQL-условие, список параметров).
+        """
+        clauses = []
+        params = []
+
+        for predicate in query.predicates:
+            if predicate.field == 'has':
+                clauses.append('id IN (SELECT kc.kanji_id FROM kanji_components kc '
+                               'JOIN kanji c ON c.id = kc.component_id WHERE c.character = ?)')
+                params.append(predicate.value)
+            elif predicate.field == 'jlpt':
+                clauses.append('jlpt_level = ?')
+                params.append(int(predicate.value))
+            elif predicate.field == 'on':
+                clauses.append('on_readings LIKE ?')
+                params.append(f"%{predicate.value}%")
+            elif predicate.field == 'kun':
+                clauses.append('kun_readings LIKE ?')
+                params.append(f"%{predicate.value}%")
+            elif predicate.field == 'meaning':
+                terms = stem_terms(predicate.value)
+                if terms:
+                    for term in terms:
+                        clauses.append('id IN (' + DatabaseManager._term_index_clause(
+                            'kanji_meaning_terms', 'kanji_id') + ')')
+                        params.extend(DatabaseManager._term_params(term))
+                else:
+                    clauses.append('meaning LIKE ?')
+                    params.append(f"%{predicate.value}%")
+
+        if query.free_text:
+            text = query.free_text
+            clauses.append('(character = ? OR meaning LIKE ? OR on_readings LIKE ? OR kun_readings LIKE ?)')
+            params.extend([text, f"%{text}%", f"%{text}%", f"%{text}%"])
+
+        return " AND ".join(clauses) or "1", params
+
+    @staticmethod
+    def _plan_vocabulary_query(query: SearchQuery) -> Tuple[str, list]:
+        """
+        Строит WHERE-условие для структурированного поиска слов.
+
+        has: ищет слово по связям слово-кандзи (vocabulary_kanji, индекс
+        idx_vocabulary_kanji_kanji): проверка вхождения символа в написание
+        заставила бы просматривать всю таблицу слов.
+
+        Args:
+            query: Разобранный поисковый запрос (без условий только для кандзи).
+
+        Returns:
+            Кортеж (SQL-условие, список параметров).
+        """
+        clauses = []
+        params = []
+
+        for predicate in query.predicates:
+            if predicate.field == 'has':
+                clauses.append('id IN (SELECT vk.vocabulary_id FROM vocabulary_kanji vk '
+                               'JOIN kanji k ON k.id = vk.kanji_id WHERE k.character = ?)')
+                params.append(predicate.value)
+            elif predicate.field == 'meaning':
+                terms = stem_terms(predicate.value)
+                if terms:
+                    for term in terms:
+                        clauses.append('id IN (' + DatabaseManager._term_index_clause(
+                            'vocabulary_translation_terms', 'vocabulary_id') + ')')
+                        params.extend(DatabaseManager._term_params(term))
+                else:
+                    clauses.append('translation LIKE ?')
+                    params.append(f"%{predicate.value}%")
+
+        if query.free_text:
+            text = query.free_text
+            clauses.append('(japanese LIKE ? OR reading LIKE ? OR translation LIKE ?)')
+            params.extend([f"%{text}%", f"%{text}%", f"%{text}%"])
+
+        return " AND ".join(clauses) or "1", params
+
+    def search_kanji_structured(self, query: SearchQuery) -> List[Kanji]:
+        """
+        Выполняет поиск кандзи по структурированному запросу.
+
+        В отличие от search_kanji_basic условия объединяются через AND,
+        что позволяет SQLite использовать индексы.
+
+        Args:
+            query: Разобранный поисковый запрос.
+
+        Returns:
+            Список объектов Kanji, удовлетворяющих всем условиям.
+        """
+        where, params = self._plan_kanji_query(query)
+        with self._read() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'SELECT * FROM kanji WHERE {where}', params)
+
+            results = []
+            for row in cursor.fetchall():
+                kanji = Kanji(
+                    id=row[0], character=row[1], meaning=row[2],
+                    on_readings=row[3], kun_readings=row[4],
+                    jlpt_level=row[5], is_complex=bool(row[6]), notes=row[7]
+                )
+                results.append(kanji)
+            return results
+
+    def search_vocabulary_structured(self, query: SearchQuery) -> List[Word]:
+        """
+        Выполняет поиск слов по структурированному запросу.
+
+        Args:
+            query: Разобранный поисковый запрос.
+
+        Returns:
+            Список объектов Word. Пустой, если запрос содержит условия,
+            применимые только к кандзи (jlpt, on, kun).
+        """
+        if query.is_kanji_only:
+            return []
+
+        where, params = self._plan_vocabulary_query(query)
+        with self._read() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, japanese, reading, translation, notes
+                FROM vocabulary
+                WHERE {where}
+            ''', params)
+
+            results = []
+            for row in cursor.fetchall():
+                word = Word(
+                    id=row[0], japanese=row[1], reading=row[2],
+                    translation=row[3], notes=row[4]
+                )
+                results.append(word)
+            return results
+
     def add_kanji(self, kanji: Kanji) -> Optional[int]:
         """
         Добавляет новое кандзи в базу данных.
@@ -231,7 +1300,7 @@ class DatabaseManager:
             sqlite3.IntegrityError: Если кандзи с таким символом уже существует.
         """
         try:
-            with sqlite3.connect(self.db_name) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT INTO kanji (character, meaning, on_readings, kun_readings,
@@ -240,10 +1309,12 @@ class DatabaseManager:
                 ''', (kanji.character, kanji.meaning, kanji.on_readings,
                       kanji.kun_readings, kanji.jlpt_level,
                       kanji.is_complex, kanji.notes))
-                conn.commit()
-                return cursor.lastrowid
+                kanji_id = cursor.lastrowid
+                self._index_kanji_meaning(conn, kanji_id, kanji.meaning)
+                return kanji_id
         except sqlite3.IntegrityError as e:
-            print(f"Ошибка при добавлении кандзи: {e}")
+            logger.warning("Ошибка при добавлении кандзи: %s", e,
+                           extra={"context": {'operation': 'add_kanji', 'character': kanji.character}})
             return None
 
     def update_kanji(self, kanji: Kanji) -> bool:
@@ -257,7 +1328,7 @@ class DatabaseManager:
             True если обновление прошло успешно, иначе False.
         """
         try:
-            with sqlite3.connect(self.db_name) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     UPDATE kanji
@@ -267,12 +1338,52 @@ class DatabaseManager:
                 ''', (kanji.character, kanji.meaning, kanji.on_readings,
                       kanji.kun_readings, kanji.jlpt_level,
                       kanji.is_complex, kanji.notes, kanji.id))
-                conn.commit()
-                return cursor.rowcount > 0
+                updated = cursor.rowcount > 0
+                if updated:
+                    self._index_kanji_meaning(conn, kanji.id, kanji.meaning)
+                return updated
         except Exception as e:
-            print(f"Ошибка при обновлении кандзи: {e}")
+            logger.error("Ошибка при обновлении кандзи: %s", e,
+                         exc_info=True, extra={"context": {'operation': 'update_kanji', 'kanji_id': kanji.id}})
             return False
 
+    def update_kanji_fields(self, kanji: Kanji, fields: List[str]) -> bool:
+        """
+        Обновляет только указанные поля кандзи.
+
+        Args:
+            kanji: Объект Kanji с новыми значениями (должен содержать id).
+            fields: Имена изменившихся полей из Kanji.FIELDS. Пустой список -
+                только проверка, что кандзи существует.
+
+        Returns:
+            True если кандзи найдено и обновлено, иначе False.
+        """
+        try:
+            with self._connect() as conn:
+                updated = self._update_row(conn, 'kanji', Kanji.FIELDS, kanji, fields)
+                if updated and 'meaning' in fields:
+                    self._index_kanji_meaning(conn, kanji.id, kanji.meaning)
+                return updated
+        except Exception as e:
+            logger.error("Ошибка при обновлении кандзи: %s", e,
+                         exc_info=True, extra={"context": {'operation': 'update_kanji_fields',
+                                                           'kanji_id': kanji.id, 'fields': list(fields)}})
+            return False
+
+    @staticmethod
+    def _update_row(conn: sqlite3.Connection, table: str, allowed: tuple, item, fields: List[str]) -> bool:
+        """UPDATE только перечисленных столбцов строки item.id; True, если строка существует"""
+        unknown = set(fields) - set(allowed)
+        if unknown:
+            raise ValueError(f"Неизвестные поля {table}: {sorted(unknown)}")
+        if not fields:
+            return conn.execute(f'SELECT 1 FROM {table} WHERE id = ?', (item.id,)).fetchone() is not None
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        cursor = conn.execute(f'UPDATE {table} SET {assignments} WHERE id = ?',
+                              [getattr(item, field) for field in fields] + [item.id])
+        return cursor.rowcount > 0
+
     def delete_kanji(self, kanji_id: int) -> bool:
         """
         Удаляет кандзи из базы данных по идентификатору.
@@ -284,13 +1395,14 @@ class DatabaseManager:
             True если удаление прошло успешно, иначе False.
         """
         try:
-            with sqlite3.connect(self.db_name) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('DELETE FROM kanji WHERE id = ?', (kanji_id,))
-                conn.commit()
+                conn.execute('DELETE FROM kanji_meaning_terms WHERE kanji_id = ?', (kanji_id,))
                 return cursor.rowcount > 0
         except Exception as e:
-            print(f"Ошибка при удалении кандзи: {e}")
+            logger.error("Ошибка при удалении кандзи: %s", e,
+                         exc_info=True, extra={"context": {'operation': 'delete_kanji', 'kanji_id': kanji_id}})
             return False
 
     def get_word_by_id(self, word_id: int) -> Optional[Word]:
@@ -303,17 +1415,31 @@ class DatabaseManager:
         Returns:
             Объект Word если найден, иначе None.
         """
-        with sqlite3.connect(self.db_name) as conn:
+        with self._read() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM vocabulary WHERE id = ?', (word_id,))
             row = cursor.fetchone()
             if row:
-                return Word(
+                word = Word(
                     id=row[0], japanese=row[1], reading=row[2],
                     translation=row[3], notes=row[4]
                 )
+                word.mark_clean()
+                return word
             return None
 
+    def find_word_id(self, japanese: str, reading: str) -> Optional[int]:
+        """
+        Ищет слово с тем же написанием и чтением (по индексу написания).
+
+        Returns:
+            ID слова или None, если такого нет.
+        """
+        with self._read() as conn:
+            row = conn.execute('SELECT id FROM vocabulary WHERE japanese = ? AND reading = ? LIMIT 1',
+                               (japanese, reading)).fetchone()
+            return row[0] if row else None
+
     def add_vocabulary(self, word: Word) -> Optional[int]:
         """
         Добавляет новое слово в базу данных.
@@ -325,16 +1451,18 @@ class DatabaseManager:
             ID добавленного слова в случае успеха, иначе None.
         """
         try:
-            with sqlite3.connect(self.db_name) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT INTO vocabulary (japanese, reading, translation, notes)
                     VALUES (?, ?, ?, ?)
                 ''', (word.japanese, word.reading, word.translation, word.notes))
-                conn.commit()
-                return cursor.lastrowid
+                word_id = cursor.lastrowid
+                self._index_vocabulary_translation(conn, word_id, word.translation)
+                return word_id
         except Exception as e:
-            print(f"Ошибка при добавлении слова: {e}")
+            logger.error("Ошибка при добавлении слова: %s", e,
+                         exc_info=True, extra={"context": {'operation': 'add_vocabulary', 'japanese': word.japanese}})
             return None
 
     def update_vocabulary(self, word: Word) -> bool:
@@ -348,17 +1476,39 @@ class DatabaseManager:
             True если обновление прошло успешно, иначе False.
         """
         try:
-            with sqlite3.connect(self.db_name) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     UPDATE vocabulary
                     SET japanese = ?, reading = ?, translation = ?, notes = ?
                     WHERE id = ?
                 ''', (word.japanese, word.reading, word.translation, word.notes, word.id))
-                conn.commit()
-                return cursor.rowcount > 0
+                updated = cursor.rowcount > 0
+                if updated:
+                    self._index_vocabulary_translation(conn, word.id, word.translation)
+                return updated
+        except Exception as e:
+            logger.error("Ошибка при обновлении слова: %s", e,
+                         exc_info=True, extra={"context": {'operation': 'update_vocabulary', 'word_id': word.id}})
+            return False
+
+    def update_vocabulary_fields(self, word: Word, fields: List[str]) -> bool:
+        """
+        Обновляет только указанные поля слова (см. update_kanji_fields).
+
+        Returns:
+            True если слово найдено и обновлено, иначе False.
+        """
+        try:
+            with self._connect() as conn:
+                updated = self._update_row(conn, 'vocabulary', Word.FIELDS, word, fields)
+                if updated and 'translation' in fields:
+                    self._index_vocabulary_translation(conn, word.id, word.translation)
+                return updated
         except Exception as e:
-            print(f"Ошибка при обновлении слова: {e}")
+            logger.error("Ошибка при обновлении слова: %s", e,
+                         exc_info=True, extra={"context": {'operation': 'update_vocabulary_fields',
+                                                           'word_id': word.id, 'fields': list(fields)}})
             return False
 
     def delete_vocabulary(self, word_id: int) -> bool:
@@ -372,13 +1522,14 @@ class DatabaseManager:
             True если удаление прошло успешно, иначе False.
         """
         try:
-            with sqlite3.connect(self.db_name) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('DELETE FROM vocabulary WHERE id = ?', (word_id,))
-                conn.commit()
+                conn.execute('DELETE FROM vocabulary_translation_terms WHERE vocabulary_id = ?', (word_id,))
                 return cursor.rowcount > 0
         except Exception as e:
-            print(f"Ошибка при удалении слова: {e}")
+            logger.error("Ошибка при удалении слова: %s", e,
+                         exc_info=True, extra={"context": {'operation': 'delete_vocabulary', 'word_id': word_id}})
             return False
 
     def get_kanji_variants(self, kanji_id: int) -> List[str]:
@@ -391,11 +1542,28 @@ class DatabaseManager:
         Returns:
             Список строк с вариантами написания.
         """
-        with sqlite3.connect(self.db_name) as conn:
+        with self._read() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT variant_form FROM kanji_variants WHERE kanji_id = ?', (kanji_id,))
             return [row[0] for row in cursor.fetchall()]
 
+    def get_kanji_variant_rows(self, kanji_id: int) -> List[Tuple[int, str]]:
+        """Варианты написания кандзи с идентификаторами строк, в порядке добавления."""
+        with self._read() as conn:
+            return conn.execute('SELECT id, variant_form FROM kanji_variants WHERE kanji_id = ? ORDER BY id',
+                                (kanji_id,)).fetchall()
+
+    def delete_kanji_variant_rows(self, row_ids: List[int]) -> bool:
+        """Удаляет строки вариантов написания по идентификаторам."""
+        try:
+            with self._connect() as conn:
+                conn.executemany('DELETE FROM kanji_variants WHERE id = ?', [(row_id,) for row_id in row_ids])
+                return True
+        except Exception as e:
+            logger.error("Ошибка при удалении вариантов: %s", e,
+                         exc_info=True, extra={"context": {'operation': 'delete_kanji_variant_rows', 'row_ids': list(row_ids)}})
+            return False
+
     def add_kanji_variant(self, kanji_id: int, variant_form: str) -> bool:
         """
         Добавляет вариант написания для кандзи.
@@ -408,16 +1576,16 @@ class DatabaseManager:
             True если добавление прошло успешно, иначе False.
         """
         try:
-            with sqlite3.connect(self.db_name) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT INTO kanji_variants (kanji_id, variant_form)
                     VALUES (?, ?)
                 ''', (kanji_id, variant_form))
-                conn.commit()
                 return True
         except Exception as e:
-            print(f"Ошибка при добавлении варианта: {e}")
+            logger.error("Ошибка при добавлении варианта: %s", e,
+                         exc_info=True, extra={"context": {'operation': 'add_kanji_variant', 'kanji_id': kanji_id, 'variant_form': variant_form}})
             return False
 
     def delete_kanji_variants(self, kanji_id: int) -> bool:
@@ -431,13 +1599,13 @@ class DatabaseManager:
             True если удаление прошло успешно, иначе False.
         """
         try:
-            with sqlite3.connect(self.db_name) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('DELETE FROM kanji_variants WHERE kanji_id = ?', (kanji_id,))
-                conn.commit()
                 return True
         except Exception as e:
-            print(f"Ошибка при удалении вариантов: {e}")
+            logger.error("Ошибка при удалении вариантов: %s", e,
+                         exc_info=True, extra={"context": {'operation': 'delete_kanji_variants', 'kanji_id': kanji_id}})
             return False
 
     def get_kanji_components(self, kanji_id: int) -> List[Kanji]:
@@ -450,7 +1618,7 @@ class DatabaseManager:
         Returns:
             Список объектов Kanji, являющихся компонентами.
         """
-        with sqlite3.connect(self.db_name) as conn:
+        with self._read() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT k.* FROM kanji k
@@ -468,6 +1636,24 @@ class DatabaseManager:
                 components.append(kanji)
             return components
 
+    def get_kanji_component_ids(self, kanji_id: int) -> List[int]:
+        """Идентификаторы компонентов кандзи."""
+        with self._read() as conn:
+            return [row[0] for row in conn.execute(
+                'SELECT component_id FROM kanji_components WHERE kanji_id = ?', (kanji_id,))]
+
+    def delete_kanji_component(self, kanji_id: int, component_id: int) -> bool:
+        """Удаляет одну связь кандзи с компонентом."""
+        try:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM kanji_components WHERE kanji_id = ? AND component_id = ?',
+                             (kanji_id, component_id))
+                return True
+        except Exception as e:
+            logger.error("Ошибка при удалении компонента: %s", e,
+                         exc_info=True, extra={"context": {'operation': 'delete_kanji_component', 'kanji_id': kanji_id, 'component_id': component_id}})
+            return False
+
     def add_kanji_component(self, kanji_id: int, component_id: int) -> bool:
         """
         Добавляет связь между кандзи и его компонентом.
@@ -480,16 +1666,16 @@ class DatabaseManager:
             True если связь добавлена успешно, иначе False.
         """
         try:
-            with sqlite3.connect(self.db_name) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT OR IGNORE INTO kanji_components (kanji_id, component_id)
                     VALUES (?, ?)
                 ''', (kanji_id, component_id))
-                conn.commit()
                 return True
         except Exception as e:
-            print(f"Ошибка при добавлении компонента: {e}")
+            logger.error("Ошибка при добавлении компонента: %s", e,
+                         exc_info=True, extra={"context": {'operation': 'add_kanji_component', 'kanji_id': kanji_id, 'component_id': component_id}})
             return False
 
     def delete_kanji_components(self, kanji_id: int) -> bool:
@@ -503,13 +1689,13 @@ class DatabaseManager:
             True если удаление прошло успешно, иначе False.
         """
         try:
-            with sqlite3.connect(self.db_name) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('DELETE FROM kanji_components WHERE kanji_id = ?', (kanji_id,))
-                conn.commit()
                 return True
         except Exception as e:
-            print(f"Ошибка при удалении компонентов: {e}")
+            logger.error("Ошибка при удалении компонентов: %s", e,
+                         exc_info=True, extra={"context": {'operation': 'delete_kanji_components', 'kanji_id': kanji_id}})
             return False
 
     def get_word_kanji(self, word_id: int) -> List[Kanji]:
@@ -522,7 +1708,7 @@ class DatabaseManager:
         Returns:
             Список объектов Kanji, используемых в слове.
         """
-        with sqlite3.connect(self.db_name) as conn:
+        with self._read() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT k.* FROM kanji k
@@ -540,6 +1726,24 @@ class DatabaseManager:
                 kanji_list.append(kanji)
             return kanji_list
 
+    def get_word_kanji_ids(self, word_id: int) -> List[int]:
+        """Идентификаторы кандзи, связанных со словом."""
+        with self._read() as conn:
+            return [row[0] for row in conn.execute(
+                'SELECT kanji_id FROM vocabulary_kanji WHERE vocabulary_id = ?', (word_id,))]
+
+    def delete_vocabulary_kanji_link(self, word_id: int, kanji_id: int) -> bool:
+        """Удаляет одну связь слова с кандзи."""
+        try:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM vocabulary_kanji WHERE vocabulary_id = ? AND kanji_id = ?',
+                             (word_id, kanji_id))
+                return True
+        except Exception as e:
+            logger.error("Ошибка при удалении связи слова с кандзи: %s", e,
+                         exc_info=True, extra={"context": {'operation': 'delete_vocabulary_kanji_link', 'word_id': word_id, 'kanji_id': kanji_id}})
+            return False
+
     def add_vocabulary_kanji(self, word_id: int, kanji_id: int) -> bool:
         """
         Добавляет связь между словом и кандзи.
@@ -552,16 +1756,16 @@ class DatabaseManager:
             True если связь добавлена успешно, иначе False.
         """
         try:
-            with sqlite3.connect(self.db_name) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT OR IGNORE INTO vocabulary_kanji (vocabulary_id, kanji_id)
                     VALUES (?, ?)
                 ''', (word_id, kanji_id))
-                conn.commit()
                 return True
         except Exception as e:
-            print(f"Ошибка при добавлении связи слова с кандзи: {e}")
+            logger.error("Ошибка при добавлении связи слова с кандзи: %s", e,
+                         exc_info=True, extra={"context": {'operation': 'add_vocabulary_kanji', 'word_id': word_id, 'kanji_id': kanji_id}})
             return False
 
     def delete_vocabulary_kanji(self, word_id: int) -> bool:
@@ -575,13 +1779,13 @@ class DatabaseManager:
             True если удаление прошло успешно, иначе False.
         """
         try:
-            with sqlite3.connect(self.db_name) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute('DELETE FROM vocabulary_kanji WHERE vocabulary_id = ?', (word_id,))
-                conn.commit()
                 return True
         except Exception as e:
-            print(f"Ошибка при удалении связей слова: {e}")
+            logger.error("Ошибка при удалении связей слова: %s", e,
+                         exc_info=True, extra={"context": {'operation': 'delete_vocabulary_kanji', 'word_id': word_id}})
             return False
 
     def update_notes(self, item_id: int, new_notes: str, is_kanji: bool) -> bool:
@@ -598,13 +1802,251 @@ class DatabaseManager:
         """
         table_name = "kanji" if is_kanji else "vocabulary"
         try:
-            with sqlite3.connect(self.db_name) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute(f'''
                     UPDATE {table_name} SET notes = ? WHERE id = ?
                 ''', (new_notes, item_id))
-                conn.commit()
                 return cursor.rowcount > 0
         except Exception as e:
-            print(f"Ошибка при обновлении заметок: {e}")
+            logger.error("Ошибка при обновлении заметок: %s", e,
+                         exc_info=True, extra={"context": {'operation': 'update_notes', 'item_id': item_id, 'is_kanji': is_kanji}})
             return False
+
+    # --- Пакетные операции ---
+    # Выполняются запросами с IN по частям; ошибки не перехватываются, чтобы
+    # транзакция вызывающего кода откатилась целиком.
+
+    @staticmethod
+    def _id_chunks(ids: List[int]) -> Iterator[Tuple[str, list]]:
+        """Делит ids (без повторов) на части: (заполнители для IN, значения)"""
+        ids = list(dict.fromkeys(ids))
+        for start in range(0, len(ids), IN_CHUNK_SIZE):
+            chunk = ids[start:start + IN_CHUNK_SIZE]
+            yield ", ".join("?" * len(chunk)), chunk
+
+    def delete_kanji_many(self, kanji_ids: List[int]) -> int:
+        """
+        Удаляет несколько кандзи (как delete_kanji для каждого).
+
+        Returns:
+            Количество удаленных кандзи.
+        """
+        deleted = 0
+        with self._connect() as conn:
+            for placeholders, chunk in self._id_chunks(kanji_ids):
+                deleted += conn.execute(f'DELETE FROM kanji WHERE id IN ({placeholders})', chunk).rowcount
+                conn.execute(f'DELETE FROM kanji_meaning_terms WHERE kanji_id IN ({placeholders})', chunk)
+        return deleted
+
+    def delete_vocabulary_many(self, word_ids: List[int]) -> int:
+        """Удаляет несколько слов (как delete_vocabulary для каждого). Возвращает количество удаленных."""
+        deleted = 0
+        with self._connect() as conn:
+            for placeholders, chunk in self._id_chunks(word_ids):
+                deleted += conn.execute(f'DELETE FROM vocabulary WHERE id IN ({placeholders})', chunk).rowcount
+                conn.execute(f'DELETE FROM vocabulary_translation_terms WHERE vocabulary_id IN ({placeholders})',
+                             chunk)
+        return deleted
+
+    def set_jlpt_many(self, kanji_ids: List[int], jlpt_level: Optional[int]) -> int:
+        """Устанавливает уровень JLPT нескольким кандзи. Возвращает количество измененных."""
+        updated = 0
+        with self._connect() as conn:
+            for placeholders, chunk in self._id_chunks(kanji_ids):
+                updated += conn.execute(
+                    f'UPDATE kanji SET jlpt_level = ? WHERE id IN ({placeholders}) '
+                    f'AND jlpt_level IS NOT ?', [jlpt_level] + chunk + [jlpt_level]).rowcount
+        return updated
+
+    def append_notes_many(self, item_ids: List[int], text: str, is_kanji: bool) -> int:
+        """
+        Дописывает text в заметки нескольких кандзи или слов (с новой строки,
+        если заметка не пуста).
+
+        Returns:
+            Количество измененных записей.
+        """
+        table_name = "kanji" if is_kanji else "vocabulary"
+        updated = 0
+        with self._connect() as conn:
+            for placeholders, chunk in self._id_chunks(item_ids):
+                updated += conn.execute(f'''
+                    UPDATE {table_name}
+                    SET notes = CASE WHEN notes IS NULL OR notes = '' THEN ? ELSE notes || char(10) || ? END
+                    WHERE id IN ({placeholders})
+                ''', [text, text] + chunk).rowcount
+        return updated
+
+    def relink_components_many(self, kanji_ids: Optional[List[int]], old_component_id: int,
+                               new_component_id: int) -> int:
+        """
+        Заменяет компонент old_component_id на new_component_id у нескольких кандзи.
+
+        Args:
+            kanji_ids: Кандзи, у которых выполняется замена; None - у всех,
+                где встречается old_component_id.
+            old_component_id: ID заменяемого компонента.
+            new_component_id: ID нового компонента.
+
+        Returns:
+            Количество кандзи, у которых компонент был заменен.
+        """
+        with self._connect() as conn:
+            if kanji_ids is None:
+                kanji_ids = [row[0] for row in conn.execute(
+                    'SELECT kanji_id FROM kanji_components WHERE component_id = ?', (old_component_id,))]
+            relinked = 0
+            for placeholders, chunk in self._id_chunks(kanji_ids):
+                conn.execute(f'''
+                    INSERT OR IGNORE INTO kanji_components (kanji_id, component_id)
+                    SELECT kanji_id, ? FROM kanji_components
+                    WHERE component_id = ? AND kanji_id IN ({placeholders}) AND kanji_id != ?
+                ''', [new_component_id, old_component_id] + chunk + [new_component_id])
+                relinked += conn.execute(
+                    f'DELETE FROM kanji_components WHERE component_id = ? AND kanji_id IN ({placeholders})',
+                    [old_component_id] + chunk).rowcount
+        return relinked
+
+    # --- Интервальное повторение ---
+
+    def get_due_srs_states(self, now: int, limit: int,
+                           exclude: Optional[Set[Tuple[str, int]]] = None) -> List[SrsState]:
+        """
+        Карточки, срок повторения которых наступил, по возрастанию срока.
+
+        Выборка идет по индексу idx_srs_state_due и читает не больше limit
+        строк (плюс исключаемые), сколько бы карточек ни было в базе.
+
+        Args:
+            now: Текущее время (Unix, секунды).
+            limit: Наибольшее число карточек.
+            exclude: Пары (item_type, item_id), которые не нужно возвращать
+                (уже загруженные в сессию).
+        """
+        exclude = exclude or set()
+        with self._read() as conn:
+            rows = conn.execute(f'''
+                SELECT {SRS_COLUMNS} FROM srs_state
+                WHERE due_at <= ? ORDER BY due_at LIMIT ?
+            ''', (now, limit + len(exclude))).fetchall()
+        states = [SrsState(*row) for row in rows if (row[0], row[1]) not in exclude]
+        return states[:limit]
+
+    def get_srs_counts(self, now: int) -> dict:
+        """Число карточек к повторению сейчас, на ближайшие сутки и всего"""
+        with self._read() as conn:
+            def due(until: int) -> int:
+                return conn.execute('SELECT COUNT(*) FROM srs_state WHERE due_at <= ?', (until,)).fetchone()[0]
+
+            return {
+                'due': due(now),
+                'due_day': due(now + 24 * 60 * 60),
+                'total': conn.execute('SELECT COUNT(*) FROM srs_state').fetchone()[0],
+            }
+
+    def save_srs_states(self, states: List[SrsState]) -> int:
+        """Записывает состояния карточек одной транзакцией. Возвращает количество записанных"""
+        if not states:
+            return 0
+        with self._connect() as conn:
+            conn.executemany(f'''
+                INSERT INTO srs_state ({SRS_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (item_type, item_id) DO UPDATE SET
+                    due_at = excluded.due_at, interval_days = excluded.interval_days,
+                    ease = excluded.ease, repetitions = excluded.repetitions,
+                    lapses = excluded.lapses, last_review_at = excluded.last_review_at
+            ''', [tuple(state) for state in states])
+        return len(states)
+
+    def delete_srs_states(self, keys: List[Tuple[str, int]]) -> int:
+        """Удаляет карточки по парам (item_type, item_id). Возвращает количество удаленных"""
+        with self._connect() as conn:
+            return sum(conn.execute('DELETE FROM srs_state WHERE item_type = ? AND item_id = ?', key).rowcount
+                       for key in keys)
+
+    def enroll_srs(self, item_type: str, item_ids: List[int], now: int, ease: float) -> int:
+        """
+        Добавляет карточки к изучению (уже добавленные не меняются).
+
+        Args:
+            item_type: 'kanji' или 'word'.
+            item_ids: ID кандзи или слов.
+            now: Срок первого повторения.
+            ease: Начальный коэффициент легкости.
+
+        Returns:
+            Количество добавленных карточек.
+        """
+        table = 'kanji' if item_type == 'kanji' else 'vocabulary'
+        added = 0
+        with self._connect() as conn:
+            for placeholders, chunk in self._id_chunks(item_ids):
+                added += conn.execute(f'''
+                    INSERT OR IGNORE INTO srs_state (item_type, item_id, due_at, ease)
+                    SELECT ?, id, ?, ? FROM {table} WHERE id IN ({placeholders})
+                ''', [item_type, now, ease] + chunk).rowcount
+        return added
+
+    def enroll_srs_jlpt(self, jlpt_level: int, now: int, ease: float) -> int:
+        """Добавляет к изучению все кандзи уровня JLPT. Возвращает количество добавленных"""
+        with self._connect() as conn:
+            return conn.execute('''
+                INSERT OR IGNORE INTO srs_state (item_type, item_id, due_at, ease)
+                SELECT 'kanji', id, ?, ? FROM kanji WHERE jlpt_level = ? ORDER BY id
+            ''', (now, ease, jlpt_level)).rowcount
+
+    # --- Журнал занятий ---
+
+    def append_review_log(self, events: List[ReviewEvent]) -> int:
+        """Добавляет события в журнал одним executemany. Возвращает количество добавленных"""
+        if not events:
+            return 0
+        with self._connect() as conn:
+            conn.executemany(f'INSERT INTO review_log ({REVIEW_LOG_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                             [tuple(event) for event in events])
+        return len(events)
+
+    def add_review_rollups(self, deltas: List[ReviewRollup]) -> None:
+        """Прибавляет приращения к строкам сводки (отсутствующие строки создаются)"""
+        if not deltas:
+            return
+        with self._connect() as conn:
+            conn.executemany(f'''
+                INSERT INTO review_rollup ({REVIEW_ROLLUP_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (period, period_start, jlpt_level) DO UPDATE SET
+                    reviews = reviews + excluded.reviews, correct = correct + excluded.correct,
+                    learned = learned + excluded.learned, lapses = lapses + excluded.lapses,
+                    views = views + excluded.views, duration_ms = duration_ms + excluded.duration_ms
+            ''', [tuple(delta) for delta in deltas])
+
+    def get_review_rollups(self, period: str, since: str = '') -> List[ReviewRollup]:
+        """
+        Строки сводки за период начиная с since (по первичному ключу, без просмотра журнала).
+
+        Args:
+            period: 'day', 'week' или 'total'.
+            since: Дата начала первого периода (YYYY-MM-DD).
+        """
+        with self._read() as conn:
+            return [ReviewRollup(*row) for row in conn.execute(f'''
+                SELECT {REVIEW_ROLLUP_COLUMNS} FROM review_rollup
+                WHERE period = ? AND period_start >= ? ORDER BY period_start, jlpt_level
+            ''', (period, since))]
+
+    def get_review_log_chunk(self, after_id: int, limit: int) -> List[Tuple[int, ReviewEvent]]:
+        """События журнала с id больше after_id по возрастанию id: пары (id, ReviewEvent)"""
+        with self._read() as conn:
+            return [(row[0], ReviewEvent(*row[1:])) for row in conn.execute(
+                f'SELECT id, {REVIEW_LOG_COLUMNS} FROM review_log WHERE id > ? ORDER BY id LIMIT ?',
+                (after_id, limit))]
+
+    def clear_review_rollups(self) -> None:
+        with self._connect() as conn:
+            conn.execute('DELETE FROM review_rollup')
+
+    def get_kanji_counts_by_jlpt(self) -> Dict[int, int]:
+        """Число кандзи по уровням JLPT (по индексу idx_kanji_jlpt; 0 - без уровня)"""
+        with self._read() as conn:
+            return {level or 0: count for level, count in conn.execute(
+                'SELECT jlpt_level, COUNT(*) FROM kanji GROUP BY jlpt_level')}
@@ -0,0 +1,158 @@
+# db_snapshot.py
+"""
+Копия базы данных в памяти для сессий, где данные почти только читаются.
+
+Файл базы копируется в именованную базу :memory: (общий кэш SQLite) через
+backup API в фоновом потоке. Пока копия актуальна, чтения DatabaseManager
+выполняются по ней и не обращаются к диску. Записи по-прежнему идут в файл;
+после фиксации записи копия считается устаревшей и перезагружается в фоне,
+а до окончания перезагрузки чтения снова идут к файлу.
+
+Включается параметром snapshot у DatabaseManager/KanjiController или
+переменной окружения KANJIAPP_SNAPSHOT=1. Изменения, внесенные в файл другим
+процессом, копия не замечает до следующей записи через этот процесс.
+"""
+
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ENABLED = os.environ.get("KANJIAPP_SNAPSHOT") == "1"
+
+# Имена баз в памяти должны быть уникальны в пределах процесса
+_snapshot_ids = itertools.count(1)
+
+
+class MemorySnapshot:
+    """
+    Копия файла базы в памяти с фоновой перезагрузкой.
+
+    Attributes:
+        db_name (str): Файл базы данных, с которого снимается копия.
+        generation (int): Номер текущей загруженной копии (0 - еще не загружена).
+        load_count (int): Число выполненных загрузок.
+        last_load_ms (float): Длительность последней загрузки.
+    """
+
+    def __init__(self, db_name: str) -> None:
+        self.db_name = db_name
+        self.generation = 0
+        self.load_count = 0
+        self.last_load_ms: Optional[float] = None
+        self._id = next(_snapshot_ids)
+        self._lock = threading.Lock()
+        # Соединение, удерживающее базу в памяти, пока копия используется
+        self._anchor: Optional[sqlite3.Connection] = None
+        self._uri: Optional[str] = None
+        # Счетчик изменений файла и его значение на момент загрузки текущей копии
+        self._changes = 0
+        self._loaded_changes = -1
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Запускает фоновую загрузку копии."""
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._wake.set()
+        self._thread = threading.Thread(target=self._run, name="db-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Останавливает фоновый поток и освобождает память копии."""
+        if self._thread is not None:
+            self._stopping = True
+            self._wake.set()
+            self._thread.join(timeout)
+            self._thread = None
+        with self._lock:
+            anchor, self._anchor, self._uri = self._anchor, None, None
+        if anchor is not None:
+            anchor.close()
+
+    def invalidate(self) -> None:
+        """Отмечает, что файл изменился: копия перестает использоваться до перезагрузки."""
+        with self._lock:
+            self._changes += 1
+        self._wake.set()
+
+    @property
+    def is_ready(self) -> bool:
+        """Копия загружена и отражает все известные изменения файла."""
+        return self._anchor is not None and self._loaded_changes == self._changes
+
+    def connect(self) -> Optional[Tuple[int, sqlite3.Connection]]:
+        """
+        Открывает соединение только для чтения с текущей копией.
+
+        Returns:
+            (номер копии, соединение) или None, если актуальной копии нет.
+        """
+        with self._lock:
+            if self._anchor is None or self._loaded_changes != self._changes:
+                return None
+            generation, uri = self.generation, self._uri
+        conn = sqlite3.connect(uri, uri=True)
+        conn.execute("PRAGMA query_only = 1")
+        return generation, conn
+
+    def stats(self) -> dict:
+        """Сводка для страницы диагностики."""
+        return {'ready': self.is_ready, 'generation': self.generation,
+                'loads': self.load_count, 'last_load_ms': self.last_load_ms}
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._stopping:
+                return
+            if self.is_ready:
+                continue
+            try:
+                self._load()
+            except sqlite3.Error as e:
+                logger.error("Не удалось загрузить копию базы в память: %s", e,
+                             exc_info=True, extra={"context": {'operation': 'snapshot_load',
+                                                               'db_name': self.db_name}})
+
+    def _load(self) -> None:
+        with self._lock:
+            changes = self._changes
+        generation = self.generation + 1
+        uri = f"file:kanjiapp-snapshot-{self._id}-{generation}?mode=memory&cache=shared"
+        started = time.perf_counter()
+
+        anchor = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        source = sqlite3.connect(self.db_name)
+        try:
+            source.backup(anchor)
+        except BaseException:
+            anchor.close()
+            raise
+        finally:
+            source.close()
+
+        with self._lock:
+            old = self._anchor
+            self._anchor, self._uri = anchor, uri
+            self.generation = generation
+            # Если во время копирования файл изменился, копия сразу устаревает
+            # и будет загружена снова (событие уже выставлено в invalidate)
+            self._loaded_changes = changes
+        if old is not None:
+            # Читатели, еще работающие со старой копией, удерживают ее сами
+            old.close()
+
+        self.load_count += 1
+        self.last_load_ms = (time.perf_counter() - started) * 1000.0
+        logger.debug("Копия базы загружена в память за %.1f мс", self.last_load_ms,
+                     extra={"context": {'operation': 'snapshot_load', 'generation': generation}})
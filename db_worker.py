@@ -0,0 +1,165 @@
+# db_worker.py
+"""
+Поток базы данных.
+
+Вся работа с базой, которую инициирует GUI, выполняется в одном фоновом
+потоке, владеющем соединением. Запросы передаются через очередь, результат
+возвращается как concurrent.futures.Future. Записи, накопившиеся в очереди,
+фиксируются одной транзакцией (групповая фиксация).
+"""
+
+import logging
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+from database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Запрос к потоку базы: функция с аргументами, признак записи и Future для результата
+DbRequest = namedtuple('DbRequest', ['func', 'args', 'kwargs', 'write', 'future'])
+
+# Сигнал остановки потока (ставится в очередь после всех уже принятых запросов)
+_STOP = object()
+
+
+class DatabaseWorker:
+    """
+    Фоновый поток, выполняющий запросы к базе по очереди.
+
+    Чтения выполняются по одному. Подряд идущие записи выполняются в одной
+    транзакции; если она не удалась, откатывается целиком, и каждая запись
+    повторяется в своей транзакции, чтобы ошибка одной не затрагивала остальные.
+
+    Attributes:
+        db_manager (DatabaseManager): Менеджер базы, за потоком закрепляется его соединение.
+        max_batch (int): Наибольшее число запросов, забираемых из очереди за раз.
+        commit_count (int): Число выполненных фиксаций.
+        write_count (int): Число выполненных записей.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, max_batch: int = 64) -> None:
+        self.db_manager = db_manager
+        self.max_batch = max_batch
+        self.commit_count = 0
+        self.write_count = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="db-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Останавливает поток, предварительно выполнив все принятые запросы."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """Ставит в очередь чтение. Результат func будет доступен через Future."""
+        return self._submit(func, args, kwargs, write=False)
+
+    def submit_write(self, func: Callable, *args, **kwargs) -> Future:
+        """Ставит в очередь запись. Может быть зафиксирована вместе с соседними записями."""
+        return self._submit(func, args, kwargs, write=True)
+
+    def _submit(self, func: Callable, args: tuple, kwargs: dict, write: bool) -> Future:
+        if self._thread is None:
+            raise RuntimeError("Поток базы данных не запущен")
+        future = Future()
+        self._queue.put(DbRequest(func, args, kwargs, write, future))
+        return future
+
+    def stats(self) -> dict:
+        """Сводка для страницы диагностики."""
+        return {'queued': self._queue.qsize(), 'commits': self.commit_count, 'writes': self.write_count}
+
+    def _run(self) -> None:
+        self.db_manager.pin_connection()
+        try:
+            stopping = False
+            while not stopping:
+                request = self._queue.get()
+                if request is _STOP:
+                    break
+                batch = [request]
+                while len(batch) < self.max_batch:
+                    try:
+                        request = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if request is _STOP:
+                        stopping = True
+                        break
+                    batch.append(request)
+                self._process(batch)
+        finally:
+            self.db_manager.release_connection()
+
+    def _process(self, batch: List[DbRequest]) -> None:
+        """Выполняет пачку запросов в порядке поступления, группируя подряд идущие записи."""
+        writes = []
+        for request in batch:
+            if request.write:
+                writes.append(request)
+                continue
+            if writes:
+                self._commit_group(writes)
+                writes = []
+            if request.future.set_running_or_notify_cancel():
+                self._execute(request)
+        if writes:
+            self._commit_group(writes)
+
+    @staticmethod
+    def _execute(request: DbRequest) -> None:
+        try:
+            result = request.func(*request.args, **request.kwargs)
+        except BaseException as e:
+            request.future.set_exception(e)
+        else:
+            request.future.set_result(result)
+
+    def _execute_write(self, request: DbRequest) -> None:
+        """Выполняет одну запись в отдельной транзакции."""
+        try:
+            with self.db_manager.transaction():
+                result = request.func(*request.args, **request.kwargs)
+        except BaseException as e:
+            request.future.set_exception(e)
+        else:
+            self.commit_count += 1
+            self.write_count += 1
+            request.future.set_result(result)
+
+    def _commit_group(self, writes: List[DbRequest]) -> None:
+        active = [request for request in writes if request.future.set_running_or_notify_cancel()]
+        if len(active) <= 1:
+            for request in active:
+                self._execute_write(request)
+            return
+
+        results = []
+        try:
+            with self.db_manager.transaction():
+                for request in active:
+                    results.append(request.func(*request.args, **request.kwargs))
+        except Exception as e:
+            logger.warning("Групповая фиксация не удалась, записи повторяются по одной: %s", e,
+                           extra={"context": {'operation': 'group_commit', 'size': len(active)}})
+            for request in active:
+                self._execute_write(request)
+            return
+
+        self.commit_count += 1
+        self.write_count += len(active)
+        for request, result in zip(active, results):
+            request.future.set_result(result)
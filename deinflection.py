@@ -0,0 +1,207 @@
+# deinflection.py
+"""
+Приведение спрягаемых японских форм к словарной.
+
+Движок работает по таблице правил: каждое правило заменяет окончание
+спрягаемой формы на окончание словарной и указывает, какого типа слово
+получится. Правила применяются цепочкой (食べなかった -> 食べない -> 食べる),
+поэтому таблица описывает только отдельные шаги спряжения.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+from typing import List, Tuple
+
+# Типы слов:
+#   v1 - ичидан-глаголы (食べる), v5 - годан-глаголы (休む), vs - する, vk - 来る,
+#   adj-i - и-прилагательные и формы, спрягающиеся как они (ない, たい),
+#   te - те-форма (для цепочек ている -> て -> словарная форма).
+DeinflectionRule = namedtuple('DeinflectionRule', ['suffix_in', 'suffix_out', 'types_in', 'type_out', 'reason'])
+
+# Кандидат словарной формы: слово, его предполагаемый тип и цепочка примененных правил
+Deinflection = namedtuple('Deinflection', ['term', 'word_type', 'reasons'])
+
+# Ряды годан-глаголов: окончание словарной формы -> формы в рядах и, а, э, о
+_GODAN_ROWS = {
+    'う': ('い', 'わ', 'え', 'お'),
+    'く': ('き', 'か', 'け', 'こ'),
+    'ぐ': ('ぎ', 'が', 'げ', 'ご'),
+    'す': ('し', 'さ', 'せ', 'そ'),
+    'つ': ('ち', 'た', 'て', 'と'),
+    'ぬ': ('に', 'な', 'ね', 'の'),
+    'ぶ': ('び', 'ば', 'べ', 'ぼ'),
+    'む': ('み', 'ま', 'め', 'も'),
+    'る': ('り', 'ら', 'れ', 'ろ'),
+}
+
+# Те/та-формы годан-глаголов
+_GODAN_TE = {
+    'う': ('って', 'った'), 'つ': ('って', 'った'), 'る': ('って', 'った'),
+    'く': ('いて', 'いた'), 'ぐ': ('いで', 'いだ'), 'す': ('して', 'した'),
+    'ぬ': ('んで', 'んだ'), 'ぶ': ('んで', 'んだ'), 'む': ('んで', 'んだ'),
+}
+
+# Окончания, присоединяемые к основе -ます (連用形)
+_MASU_SUFFIXES = (
+    ('ます', 'вежливая форма'),
+    ('ました', 'вежливое прошедшее'),
+    ('ません', 'вежливое отрицание'),
+    ('ませんでした', 'вежливое отрицание прошедшего'),
+    ('ましょう', 'вежливое предложение'),
+    ('まして', 'вежливая те-форма'),
+    ('ながら', 'одновременность'),
+    ('なさい', 'вежливый приказ'),
+)
+
+_ANY = frozenset()
+_ADJ = frozenset({'adj-i'})
+_V1 = frozenset({'v1'})
+_TE = frozenset({'te'})
+
+
+def _build_rules() -> Tuple[DeinflectionRule, ...]:
+    """Строит таблицу правил из описаний рядов и окончаний."""
+    rules = []
+
+    def add(suffix_in, suffix_out, types_in, type_out, reason):
+        rules.append(DeinflectionRule(suffix_in, suffix_out, frozenset(types_in), type_out, reason))
+
+    # Вежливые формы и прочие окончания основы -ます
+    for suffix, reason in _MASU_SUFFIXES:
+        add(suffix, 'る', _ANY, 'v1', reason)
+        add('し' + suffix, 'する', _ANY, 'vs', reason)
+        add('き' + suffix, 'くる', _ANY, 'vk', reason)
+        for ending, (i_form, _, _, _) in _GODAN_ROWS.items():
+            add(i_form + suffix, ending, _ANY, 'v5', reason)
+
+    # Желательная форма -たい спрягается как прилагательное
+    add('たい', 'る', _ADJ, 'v1', 'желание')
+    add('したい', 'する', _ADJ, 'vs', 'желание')
+    add('きたい', 'くる', _ADJ, 'vk', 'желание')
+    for ending, (i_form, _, _, _) in _GODAN_ROWS.items():
+        add(i_form + 'たい', ending, _ADJ, 'v5', 'желание')
+
+    # Отрицание -ない (спрягается как прилагательное)
+    add('ない', 'る', _ADJ, 'v1', 'отрицание')
+    add('しない', 'する', _ADJ, 'vs', 'отрицание')
+    add('こない', 'くる', _ADJ, 'vk', 'отрицание')
+    for ending, (_, a_form, _, _) in _GODAN_ROWS.items():
+        add(a_form + 'ない', ending, _ADJ, 'v5', 'отрицание')
+
+    # Те-форма и прошедшее время
+    add('て', 'る', _TE, 'v1', 'те-форма')
+    add('た', 'る', _ANY, 'v1', 'прошедшее')
+    add('して', 'する', _TE, 'vs', 'те-форма')
+    add('した', 'する', _ANY, 'vs', 'прошедшее')
+    add('きて', 'くる', _TE, 'vk', 'те-форма')
+    add('きた', 'くる', _ANY, 'vk', 'прошедшее')
+    add('行って', '行く', _TE, 'v5', 'те-форма')
+    add('行った', '行く', _ANY, 'v5', 'прошедшее')
+    add('いって', 'いく', _TE, 'v5', 'те-форма')
+    add('いった', 'いく', _ANY, 'v5', 'прошедшее')
+    for ending, (te_form, ta_form) in _GODAN_TE.items():
+        add(te_form, ending, _TE, 'v5', 'те-форма')
+        add(ta_form, ending, _ANY, 'v5', 'прошедшее')
+
+    # Длительный вид: ている/てる/ていた -> те-форма
+    add('ている', 'て', _V1, 'te', 'длительный вид')
+    add('てる', 'て', _V1, 'te', 'длительный вид (разг.)')
+    add('でいる', 'で', _V1, 'te', 'длительный вид')
+    add('でる', 'で', _V1, 'te', 'длительный вид (разг.)')
+
+    # Потенциальная, страдательная и побудительная формы (спрягаются как v1)
+    add('られる', 'る', _V1, 'v1', 'страдательный/потенциальный залог')
+    add('させる', 'る', _V1, 'v1', 'побудительный залог')
+    add('される', 'する', _V1, 'vs', 'страдательный залог')
+    add('できる', 'する', _V1, 'vs', 'потенциальная форма')
+    add('こられる', 'くる', _V1, 'vk', 'страдательный/потенциальный залог')
+    for ending, (_, a_form, e_form, _) in _GODAN_ROWS.items():
+        add(e_form + 'る', ending, _V1, 'v5', 'потенциальная форма')
+        add(a_form + 'れる', ending, _V1, 'v5', 'страдательный залог')
+        add(a_form + 'せる', ending, _V1, 'v5', 'побудительный залог')
+
+    # Повелительное предложение и условная форма
+    add('よう', 'る', _ANY, 'v1', 'предложение')
+    add('しよう', 'する', _ANY, 'vs', 'предложение')
+    add('こよう', 'くる', _ANY, 'vk', 'предложение')
+    add('れば', 'る', _ANY, 'v1', 'условная форма')
+    add('すれば', 'する', _ANY, 'vs', 'условная форма')
+    add('くれば', 'くる', _ANY, 'vk', 'условная форма')
+    for ending, (_, _, e_form, o_form) in _GODAN_ROWS.items():
+        add(o_form + 'う', ending, _ANY, 'v5', 'предложение')
+        add(e_form + 'ば', ending, _ANY, 'v5', 'условная форма')
+
+    # И-прилагательные
+    add('かった', 'い', _ANY, 'adj-i', 'прошедшее')
+    add('くない', 'い', _ADJ, 'adj-i', 'отрицание')
+    add('くて', 'い', _TE, 'adj-i', 'те-форма')
+    add('ければ', 'い', _ANY, 'adj-i', 'условная форма')
+    add('く', 'い', _ANY, 'adj-i', 'наречие')
+    add('さ', 'い', _ANY, 'adj-i', 'существительное')
+
+    return tuple(rules)
+
+
+RULES = _build_rules()
+
+# Ограничение глубины цепочки защищает от зацикливания на коротких словах
+MAX_CHAIN = 6
+
+
+@lru_cache(maxsize=4096)
+def deinflect(surface: str) -> Tuple[Deinflection, ...]:
+    """
+    Возвращает все возможные словарные формы для спрягаемой формы.
+
+    Первым кандидатом всегда идет сама форма (для точного совпадения).
+    Результат кэшируется по строке формы, так как зависит только от таблицы правил.
+
+    Args:
+        surface: Слово в том виде, в котором его ввел пользователь.
+
+    Returns:
+        Кортеж Deinflection без повторов (по слову и типу).
+    """
+    surface = surface.strip()
+    if not surface:
+        return ()
+
+    results = [Deinflection(surface, None, ())]
+    seen = {(surface, None)}
+    frontier = list(results)
+
+    for _ in range(MAX_CHAIN):
+        next_frontier = []
+        for candidate in frontier:
+            for rule in RULES:
+                if not candidate.term.endswith(rule.suffix_in):
+                    continue
+                if candidate.word_type is not None and candidate.word_type not in rule.types_in:
+                    continue
+                stem = candidate.term[:len(candidate.term) - len(rule.suffix_in)]
+                if not stem and rule.suffix_out in ('る', 'い'):
+                    # Одно окончание без основы словом не является
+                    continue
+                term = stem + rule.suffix_out
+                key = (term, rule.type_out)
+                if key in seen:
+                    continue
+                seen.add(key)
+                reasons = candidate.reasons + ((rule.reason,) if rule.reason else ())
+                derived = Deinflection(term, rule.type_out, reasons)
+                results.append(derived)
+                next_frontier.append(derived)
+        if not next_frontier:
+            break
+        frontier = next_frontier
+
+    return tuple(results)
+
+
+def candidate_terms(surface: str) -> List[str]:
+    """Возвращает уникальные слова-кандидаты в порядке их получения."""
+    terms = []
+    for candidate in deinflect(surface):
+        if candidate.term not in terms:
+            terms.append(candidate.term)
+    return terms
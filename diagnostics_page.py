@@ -0,0 +1,191 @@
+# diagnostics_page.py
+"""
+Страница диагностики. Вынесена в отдельный модуль и импортируется только при
+первом переходе на нее, чтобы не замедлять запуск приложения.
+
+Профиль cProfile записывается вперед: с нажатия кнопки на заданное число
+секунд. Профиль уже прошедших секунд потребовал бы держать cProfile
+включенным все время работы приложения, а он замедляет Python-код GUI в
+несколько раз.
+"""
+import os
+import time
+import cProfile
+import tracemalloc
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QTextEdit, QSpinBox
+from instrumentation import TRACE_ENABLED, get_latency_stats
+
+
+class DiagnosticsPage(QWidget):
+    """Живые показатели производительности: соединения, кэши, задержки, память, зависания GUI."""
+
+    def __init__(self, parent_window, kanji_controller):
+        super().__init__()
+        self.parent_window = parent_window
+        self.controller = kanji_controller
+
+        layout = QVBoxLayout()
+
+        title_label = QLabel("Диагностика")
+        title_label.setProperty("class", "title")
+        title_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(title_label)
+
+        self.stats_view = QTextEdit()
+        self.stats_view.setReadOnly(True)
+        self.stats_view.setProperty("class", "diagnostics")
+        layout.addWidget(self.stats_view)
+
+        controls_layout = QHBoxLayout()
+
+        self.tracemalloc_button = QPushButton()
+        self.tracemalloc_button.clicked.connect(self.toggle_tracemalloc)
+        controls_layout.addWidget(self.tracemalloc_button)
+
+        controls_layout.addWidget(QLabel("Профиль следующих секунд:"))
+        self.profile_seconds_spin = QSpinBox()
+        self.profile_seconds_spin.setRange(1, 600)
+        self.profile_seconds_spin.setValue(10)
+        controls_layout.addWidget(self.profile_seconds_spin)
+
+        self.profile_button = QPushButton("Начать запись профиля")
+        self.profile_button.setToolTip("cProfile главного потока с момента нажатия на заданное число секунд")
+        self.profile_button.clicked.connect(self.start_profile)
+        controls_layout.addWidget(self.profile_button)
+        controls_layout.addStretch()
+        layout.addLayout(controls_layout)
+
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
+        back_button = QPushButton("Назад")
+        back_button.clicked.connect(self.parent_window.go_back)
+        layout.addWidget(back_button)
+
+        self.setLayout(layout)
+
+        self.profiler = None
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh_stats)
+        self.refresh_timer.start(1000)
+
+        self.update_tracemalloc_button()
+        self.refresh_stats()
+
+    def toggle_tracemalloc(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        else:
+            tracemalloc.start()
+        self.update_tracemalloc_button()
+        self.refresh_stats()
+
+    def update_tracemalloc_button(self):
+        if tracemalloc.is_tracing():
+            self.tracemalloc_button.setText("Остановить tracemalloc")
+        else:
+            self.tracemalloc_button.setText("Включить tracemalloc")
+
+    def start_profile(self):
+        if self.profiler is not None:
+            return
+        seconds = self.profile_seconds_spin.value()
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        self.profile_button.setEnabled(False)
+        self.status_label.setText(f"Идет запись профиля: следующие {seconds} с...")
+        QTimer.singleShot(seconds * 1000, self.finish_profile)
+
+    def finish_profile(self):
+        if self.profiler is None:
+            return
+        self.profiler.disable()
+        path = os.path.abspath(time.strftime("profile_%Y%m%d_%H%M%S.prof"))
+        self.profiler.dump_stats(path)
+        self.profiler = None
+        self.profile_button.setEnabled(True)
+        self.status_label.setText(f"Профиль сохранен: {path}")
+
+    def refresh_stats(self):
+        if not self.isVisible() and self.stats_view.toPlainText():
+            return
+
+        lines = []
+        window = self.parent_window
+        lines.append("<b>Страницы</b>")
+        lines.append(f"page_stack: {len(window.page_stack)}, stacked_widget: {window.stacked_widget.count()}")
+
+        lines.append("<br><b>База данных</b>")
+        lines.append(f"Соединений открыто с запуска: {self.controller.db_manager.connection_count}")
+        worker_stats = window.db_worker.stats()
+        lines.append(f"Поток базы: в очереди {worker_stats['queued']}, записей {worker_stats['writes']}, "
+                     f"фиксаций {worker_stats['commits']}")
+        snapshot = self.controller.db_manager.snapshot
+        if snapshot is not None:
+            snapshot_stats = snapshot.stats()
+            state = "актуальна" if snapshot_stats['ready'] else "загружается"
+            load_ms = snapshot_stats['last_load_ms']
+            lines.append(f"Копия в памяти: {state}, загрузок {snapshot_stats['loads']}"
+                         + (f", последняя {load_ms:.1f} мс" if load_ms is not None else ""))
+        lookup_index = self.controller.db_manager.lookup_index
+        if lookup_index is not None:
+            index_stats = lookup_index.stats()
+            state = "актуален" if index_stats['ready'] else "строится"
+            build_ms = index_stats['last_build_ms']
+            lines.append(f"Индекс поиска: {state}, версия {index_stats['data_version']}, "
+                         f"построений {index_stats['builds']}"
+                         + (f", последнее {build_ms:.1f} мс" if build_ms is not None else ""))
+
+        scheduler = window.maintenance_scheduler
+        if scheduler is not None:
+            report = scheduler.last_report
+            if scheduler.in_progress:
+                lines.append("Обслуживание: выполняется")
+            elif report is not None:
+                after = report['after']
+                lines.append(f"Обслуживание: {report['steps']} шагов за {report['duration_ms']:.0f} мс, "
+                             f"файл {after['file_size'] // 1024} КБ, свободных страниц {after['freelist_pages']}, "
+                             f"удалено висячих связей {sum(report['orphans_removed'].values())}, "
+                             f"ошибок целостности {len(report['integrity_errors'])}")
+
+        lines.append("<br><b>Кэши</b>")
+        for name, stats in self.controller.get_cache_stats().items():
+            text = f"{name}: размер {stats.get('size', 0)}"
+            if 'hits' in stats:
+                total = stats['hits'] + stats['misses']
+                rate = stats['hits'] / total * 100 if total else 0.0
+                text += f", попаданий {stats['hits']}/{total} ({rate:.0f}%)"
+            lines.append(text)
+
+        lines.append("<br><b>Задержки запросов (мс)</b>")
+        if TRACE_ENABLED:
+            latency = sorted(get_latency_stats().items(), key=lambda item: item[1]['p95'], reverse=True)
+            for name, stats in latency[:15]:
+                lines.append(f"{name}: n={stats['count']} p50={stats['p50']:.1f} "
+                             f"p95={stats['p95']:.1f} p99={stats['p99']:.1f} max={stats['max']:.1f}")
+            if not latency:
+                lines.append("Пока нет данных")
+        else:
+            lines.append("Трассировка выключена (запустите с KANJIAPP_TRACE=1)")
+
+        lines.append("<br><b>Память Python</b>")
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            lines.append(f"Сейчас: {current / 1024 / 1024:.1f} МБ, пик: {peak / 1024 / 1024:.1f} МБ")
+        else:
+            lines.append("tracemalloc выключен")
+
+        lines.append("<br><b>Цикл событий GUI</b>")
+        stall_stats = window.stall_watchdog.stats()
+        lines.append(f"Макс. задержка: {stall_stats['max_lag_ms']:.0f} мс "
+                     f"(за последние {stall_stats['window_s']:.0f} с), "
+                     f"зависаний > {stall_stats['threshold_ms']:.0f} мс: {stall_stats['stall_count']}")
+        last_stall = stall_stats['last_stall']
+        if last_stall is not None:
+            lines.append(f"Последнее: {last_stall.duration_ms:.0f} мс, "
+                         f"действие: {last_stall.action or 'неизвестно'} "
+                         f"({time.strftime('%H:%M:%S', time.localtime(last_stall.started_at))})")
+
+        self.stats_view.setHtml("<br>".join(lines))
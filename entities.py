@@ -1,12 +1,86 @@
 # entities.py
 
-from typing import List
+from typing import List, Optional
 from collections import namedtuple
 
 # Новый тип для представления радикала и его варианта в сложном кандзи
 KanjiComponent = namedtuple('KanjiComponent', ['kanji', 'variant_form'])
 
-class Kanji:
+
+class ComponentNode(namedtuple('ComponentNode', ['kanji', 'variant_form', 'components'])):
+    """Узел дерева компонентов: кандзи, его вариант написания и компоненты следующего уровня"""
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.kanji.id,
+            'character': self.kanji.character,
+            'meaning': self.kanji.meaning,
+            'variant_form': self.variant_form,
+            'components': [child.to_dict() for child in self.components],
+        }
+
+# Плитка сетки кандзи: только то, что нужно для отрисовки и подсказки
+KanjiTile = namedtuple('KanjiTile', ['id', 'character', 'meaning', 'jlpt_level'])
+
+# Состояние интервального повторения одного кандзи или слова (item_type: 'kanji' или 'word').
+# due_at и last_review_at - Unix-время в секундах, interval_days - текущий интервал в днях.
+SrsState = namedtuple('SrsState', ['item_type', 'item_id', 'due_at', 'interval_days', 'ease',
+                                   'repetitions', 'lapses', 'last_review_at'])
+
+# Карточка для повторения: состояние и сам Kanji или Word
+StudyCard = namedtuple('StudyCard', ['state', 'item'])
+
+# Событие журнала занятий: event - 'review' (ответ при повторении) или 'view'
+# (просмотр карточки); at - Unix-время в секундах; grade и repetitions (число
+# успешных повторений до ответа) есть только у 'review'; jlpt_level - уровень
+# кандзи или None.
+ReviewEvent = namedtuple('ReviewEvent', ['event', 'item_type', 'item_id', 'at', 'grade', 'repetitions',
+                                         'duration_ms', 'jlpt_level'])
+
+# Строка сводки журнала за период: period - 'day', 'week' или 'total',
+# period_start - дата начала периода (YYYY-MM-DD, для 'total' пустая строка),
+# jlpt_level - 0 для слов и кандзи без уровня
+ReviewRollup = namedtuple('ReviewRollup', ['period', 'period_start', 'jlpt_level', 'reviews', 'correct',
+                                           'learned', 'lapses', 'views', 'duration_ms'])
+
+
+class TrackedEntity:
+    """
+    Отслеживание измененных полей.
+
+    mark_clean() запоминает значения полей FIELDS (например, сразу после
+    загрузки из базы), changed_fields() возвращает поля, изменившиеся с тех пор.
+    Для объекта, который ни разу не отмечался, изменившимися считаются все поля.
+    """
+
+    FIELDS: tuple = ()
+
+    _clean: Optional[dict] = None
+
+    def mark_clean(self, *fields: str) -> None:
+        """
+        Отмечает поля сохраненными (без аргументов - все поля).
+        Отдельные поля отмечаются только у объекта, уже отмеченного целиком.
+        """
+        if not fields:
+            self._clean = {field: getattr(self, field) for field in self.FIELDS}
+        elif self._clean is not None:
+            self._clean.update((field, getattr(self, field)) for field in fields)
+
+    def changed_fields(self) -> List[str]:
+        if self._clean is None:
+            return list(self.FIELDS)
+        return [field for field in self.FIELDS if getattr(self, field) != self._clean[field]]
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self.changed_fields())
+
+
+class Kanji(TrackedEntity):
+    # Поля, хранящиеся в строке таблицы kanji
+    FIELDS = ('character', 'meaning', 'on_readings', 'kun_readings', 'jlpt_level', 'is_complex', 'notes')
+
     def __init__(self, id=None, character="", meaning="", on_readings="",
                  kun_readings="", jlpt_level=None, is_complex=False, notes=""):
         self.id = id
@@ -20,11 +94,44 @@ class Kanji:
         self.radicals: List[KanjiComponent] = [] # Теперь список KanjiComponent
         self.variations: List[str] = [] # Варианты, как радикал
 
-class Word:
+    def to_dict(self) -> dict:
+        """Представление для JSON (радикалы - без вложенных радикалов)"""
+        return {
+            'id': self.id,
+            'character': self.character,
+            'meaning': self.meaning,
+            'on_readings': self.on_readings,
+            'kun_readings': self.kun_readings,
+            'jlpt_level': self.jlpt_level,
+            'is_complex': bool(self.is_complex),
+            'notes': self.notes,
+            'radicals': [{'id': component.kanji.id, 'character': component.kanji.character,
+                          'meaning': component.kanji.meaning, 'variant_form': component.variant_form}
+                         for component in self.radicals],
+            'variations': list(self.variations),
+        }
+
+
+class Word(TrackedEntity):
+    # Поля, хранящиеся в строке таблицы vocabulary
+    FIELDS = ('japanese', 'reading', 'translation', 'notes')
+
     def __init__(self, id=None, japanese="", reading="", translation="", notes=""):
         self.id = id
         self.japanese = japanese
         self.reading = reading
         self.translation = translation
         self.notes = notes
-        self.kanji_vocabulary: List[Kanji] = []
\ No newline at end of file
+        self.kanji_vocabulary: List[Kanji] = []
+
+    def to_dict(self) -> dict:
+        """Представление для JSON"""
+        return {
+            'id': self.id,
+            'japanese': self.japanese,
+            'reading': self.reading,
+            'translation': self.translation,
+            'notes': self.notes,
+            'kanji': [{'id': kanji.id, 'character': kanji.character, 'meaning': kanji.meaning}
+                      for kanji in self.kanji_vocabulary],
+        }
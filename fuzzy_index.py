@@ -0,0 +1,186 @@
+# fuzzy_index.py
+
+import re
+from typing import Dict, Hashable, List, Set, Tuple
+
+# Слова значений и переводов: латиница и кириллица
+TOKEN_PATTERN = re.compile(r"[a-zà-öø-ÿа-яё]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Разбивает текст значения/перевода на слова в нижнем регистре."""
+    return TOKEN_PATTERN.findall((text or "").lower())
+
+
+def max_distance_for(token: str, max_distance: int) -> int:
+    """Допустимое число опечаток в зависимости от длины слова."""
+    if len(token) <= 2:
+        return 0
+    if len(token) <= 4:
+        return min(1, max_distance)
+    return max_distance
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Расстояние Дамерау-Левенштейна (с перестановкой соседних символов).
+
+    Вычисление прекращается, как только расстояние превысило limit;
+    в этом случае возвращается limit + 1.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]
+                    and previous_previous is not None):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+            row_min = min(row_min, current[j])
+        if row_min > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+def _deletes(token: str, distance: int) -> Set[str]:
+    """Все варианты слова с удалением до distance символов (включая само слово)."""
+    result = {token}
+    frontier = {token}
+    for _ in range(distance):
+        next_frontier = set()
+        for word in frontier:
+            for i in range(len(word)):
+                next_frontier.add(word[:i] + word[i + 1:])
+        result |= next_frontier
+        frontier = next_frontier
+    return result
+
+
+class FuzzyIndex:
+    """
+    Индекс для поиска с опечатками по алгоритму SymSpell.
+
+    Для каждого слова словаря заранее сохраняются все его варианты с удалением
+    до max_distance символов. При поиске генерируются удаления запроса, и
+    кандидаты находятся прямым обращением к словарю удалений, без перебора
+    всех строк. Найденные кандидаты проверяются точным расстоянием.
+
+    Документы идентифицируются произвольным ключом, например ('kanji', 5).
+
+    Attributes:
+        max_distance (int): Максимальное число опечаток в одном слове.
+    """
+
+    def __init__(self, max_distance: int = 2) -> None:
+        self.max_distance = max_distance
+        self._postings: Dict[str, Set[Hashable]] = {}   # слово -> документы
+        self._deletes: Dict[str, Set[str]] = {}          # удаление -> слова
+        self._documents: Dict[Hashable, Set[str]] = {}   # документ -> слова
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def _add_term(self, term: str) -> None:
+        for variant in _deletes(term, max_distance_for(term, self.max_distance)):
+            self._deletes.setdefault(variant, set()).add(term)
+
+    def _remove_term(self, term: str) -> None:
+        for variant in _deletes(term, max_distance_for(term, self.max_distance)):
+            terms = self._deletes.get(variant)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self._deletes[variant]
+
+    def add_document(self, key: Hashable, text: str) -> None:
+        """
+        Добавляет (или заменяет) документ в индексе.
+
+        Args:
+            key: Идентификатор документа.
+            text: Текст значения или перевода.
+        """
+        self.remove_document(key)
+        terms = set(tokenize(text))
+        if not terms:
+            return
+        self._documents[key] = terms
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = set()
+                self._add_term(term)
+            postings.add(key)
+
+    def remove_document(self, key: Hashable) -> None:
+        """Удаляет документ из индекса, если он там есть."""
+        terms = self._documents.pop(key, None)
+        if not terms:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.discard(key)
+            if not postings:
+                del self._postings[term]
+                self._remove_term(term)
+
+    def lookup_term(self, token: str) -> Dict[str, int]:
+        """
+        Находит слова словаря, близкие к token.
+
+        Returns:
+            Словарь: слово словаря -> расстояние до token.
+        """
+        limit = max_distance_for(token, self.max_distance)
+        matches = {}
+        for variant in _deletes(token, limit):
+            for term in self._deletes.get(variant, ()):
+                if term in matches:
+                    continue
+                distance = edit_distance(token, term, limit)
+                if distance <= limit:
+                    matches[term] = distance
+        return matches
+
+    def search(self, text: str, limit: int = 50) -> List[Tuple[Hashable, int]]:
+        """
+        Ищет документы, содержащие все слова запроса с учетом опечаток.
+
+        Args:
+            text: Поисковый запрос.
+            limit: Максимальное количество результатов.
+
+        Returns:
+            Список (ключ документа, суммарное расстояние), лучшие первыми.
+        """
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+
+        scores = None
+        for token in tokens:
+            token_scores: Dict[Hashable, int] = {}
+            for term, distance in self.lookup_term(token).items():
+                for key in self._postings.get(term, ()):
+                    if distance < token_scores.get(key, distance + 1):
+                        token_scores[key] = distance
+
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {key: scores[key] + d for key, d in token_scores.items() if key in scores}
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: item[1])
+        return ranked[:limit]
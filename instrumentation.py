@@ -0,0 +1,174 @@
+# instrumentation.py
+"""
+Трассировка запросов и замер времени работы методов.
+
+Включается переменной окружения KANJIAPP_TRACE=1. Без нее декоратор
+instrument_class возвращает класс без изменений, и накладных расходов нет.
+
+Переменные окружения:
+    KANJIAPP_TRACE      - включить трассировку (1/0).
+    KANJIAPP_SLOW_MS    - порог медленного вызова в миллисекундах (по умолчанию 50).
+    KANJIAPP_SLOW_LOG   - файл журнала медленных вызовов (по умолчанию slow_queries.log).
+"""
+
+import functools
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List
+
+TRACE_ENABLED = os.environ.get("KANJIAPP_TRACE", "").strip() not in ("", "0", "false", "no")
+SLOW_CALL_MS = float(os.environ.get("KANJIAPP_SLOW_MS", "50"))
+SLOW_LOG_PATH = os.environ.get("KANJIAPP_SLOW_LOG", "slow_queries.log")
+
+# Сколько последних замеров хранить для расчета перцентилей
+HISTOGRAM_WINDOW = 1024
+
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+
+class LatencyHistogram:
+    """
+    Скользящее окно замеров времени одного метода.
+
+    Attributes:
+        count (int): Общее число вызовов.
+        total_ms (float): Суммарное время всех вызовов.
+        max_ms (float): Максимальное время вызова.
+    """
+
+    def __init__(self, window: int = HISTOGRAM_WINDOW) -> None:
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms: float) -> None:
+        with self._lock:
+            self._samples.append(elapsed_ms)
+            self.count += 1
+            self.total_ms += elapsed_ms
+            if elapsed_ms > self.max_ms:
+                self.max_ms = elapsed_ms
+
+    def snapshot(self) -> Dict[str, float]:
+        """Возвращает count, p50, p95, p99 и max по текущему окну."""
+        with self._lock:
+            samples = sorted(self._samples)
+            count, max_ms = self.count, self.max_ms
+        if not samples:
+            return {"count": count, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": max_ms}
+
+        def percentile(p):
+            index = min(len(samples) - 1, int(round(p / 100.0 * (len(samples) - 1))))
+            return samples[index]
+
+        return {"count": count, "p50": percentile(50), "p95": percentile(95),
+                "p99": percentile(99), "max": max_ms}
+
+
+_histograms: Dict[str, LatencyHistogram] = {}
+_histograms_lock = threading.Lock()
+_slow_log_lock = threading.Lock()
+_local = threading.local()
+
+
+def _histogram(name: str) -> LatencyHistogram:
+    histogram = _histograms.get(name)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(name, LatencyHistogram())
+    return histogram
+
+
+def record_latency(name: str, elapsed_ms: float) -> None:
+    """Добавляет замер для произвольной операции (например, обработки HTTP-запроса)."""
+    _histogram(name).record(elapsed_ms)
+
+
+def get_latency_stats() -> Dict[str, Dict[str, float]]:
+    """Возвращает перцентили по всем отслеживаемым методам."""
+    with _histograms_lock:
+        items = list(_histograms.items())
+    return {name: histogram.snapshot() for name, histogram in sorted(items)}
+
+
+def reset_latency_stats() -> None:
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def sql_trace_callback(statement: str) -> None:
+    """
+    Callback для sqlite3.Connection.set_trace_callback.
+    Запоминает SQL, выполненный внутри отслеживаемых вызовов текущего потока.
+    """
+    for statements in getattr(_local, "stack", ()):
+        statements.append(statement)
+
+
+def _explain(db_name: str, statement: str) -> str:
+    """Возвращает EXPLAIN QUERY PLAN для запроса в виде текста."""
+    if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+        return ""
+    try:
+        conn = sqlite3.connect(db_name)
+        try:
+            rows = conn.execute("EXPLAIN QUERY PLAN " + statement).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        return f"    (план недоступен: {e})"
+    return "\n".join(f"    {row[-1]}" for row in rows)
+
+
+def _write_slow_log(name: str, elapsed_ms: float, statements: List[str], db_name: str) -> None:
+    lines = [f"{time.strftime('%Y-%m-%d %H:%M:%S')} {name} {elapsed_ms:.1f} ms"]
+    for statement in dict.fromkeys(statements):
+        lines.append("  " + " ".join(statement.split()))
+        if db_name:
+            plan = _explain(db_name, statement)
+            if plan:
+                lines.append(plan)
+    with _slow_log_lock:
+        with open(SLOW_LOG_PATH, "a", encoding="utf-8") as log_file:
+            log_file.write("\n".join(lines) + "\n\n")
+
+
+def _wrap(name: str, method: Callable) -> Callable:
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        statements = []
+        stack.append(statements)
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            stack.pop()
+            _histogram(name).record(elapsed_ms)
+            if elapsed_ms >= SLOW_CALL_MS:
+                _write_slow_log(name, elapsed_ms, statements, getattr(self, "db_name", None))
+
+    return wrapper
+
+
+def instrument_class(cls):
+    """
+    Декоратор класса: оборачивает все публичные методы замером времени.
+
+    При выключенной трассировке возвращает класс как есть.
+    """
+    if not TRACE_ENABLED:
+        return cls
+    for attr_name, value in list(vars(cls).items()):
+        if attr_name.startswith("_") or not callable(value) or isinstance(value, (staticmethod, classmethod)):
+            continue
+        setattr(cls, attr_name, _wrap(f"{cls.__name__}.{attr_name}", value))
+    return cls
@@ -0,0 +1,327 @@
+# kanji_grid.py
+"""
+Сетка кандзи: тысячи плиток с символами в одном QListView (режим значков).
+
+Модель отдает строки порциями (fetchMore) по мере прокрутки, а плитки
+одинакового размера раскладываются без опроса каждой строки, поэтому
+открытие сетки не зависит от числа кандзи. Символы
+рисуются в QImage в пуле потоков (concurrent.futures, как в async_controller:
+Python-код в потоках QThreadPool роняет интерпретатор в PySide6 6.12) и
+хранятся в QPixmapCache ограниченного размера; вытесненные из кэша символы
+перерисовываются при следующем показе.
+
+Модуль импортируется только при первом переходе на страницу сетки.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from PySide6.QtCore import (Qt, QAbstractListModel, QCoreApplication, QModelIndex, QObject, QRect, QSize,
+                            QTimer, Signal)
+from PySide6.QtGui import QColor, QFont, QImage, QPainter, QPixmap, QPixmapCache
+from PySide6.QtWidgets import (QComboBox, QHBoxLayout, QLabel, QLineEdit, QListView, QPushButton,
+                               QVBoxLayout, QWidget)
+
+from entities import KanjiTile
+from stall_watchdog import tracked_action
+
+logger = logging.getLogger(__name__)
+
+# Размер плитки и символа на ней, пикселей
+TILE_SIZE = 72
+GLYPH_SIZE = 56
+
+# Лимит QPixmapCache: символ 56x56 занимает ~12 КБ, в кэш помещается ~1300 символов
+GLYPH_CACHE_KB = 16 * 1024
+
+# Потоков отрисовки символов и символов в одной задаче пула
+GLYPH_RENDER_THREADS = 2
+GLYPH_TASK_SIZE = 32
+
+# Готовые символы сообщаются представлению не чаще раза в кадр
+GLYPH_UPDATE_MS = 16
+
+
+class GlyphRenderer(QObject):
+    """
+    Отрисовка символов в фоне с кэшированием в QPixmapCache.
+
+    QPixmap можно создавать только в главном потоке, поэтому в пуле символ
+    рисуется в QImage, а в QPixmap переводится и кладется в кэш уже в главном
+    потоке (сигнал rendered доставляется через очередь событий).
+    """
+    # список (символ, QImage) - из потока пула
+    rendered = Signal(object)
+    # список символов, которые появились в кэше (одна порция - один сигнал)
+    glyph_ready = Signal(object)
+
+    def __init__(self, size: int = GLYPH_SIZE) -> None:
+        super().__init__()
+        self.size = size
+        self._pending = set()
+        self._pool = ThreadPoolExecutor(max_workers=GLYPH_RENDER_THREADS, thread_name_prefix="glyph-render")
+        # Задачи, поставленные до cancel_pending (с меньшим номером), пропускаются
+        self._generation = 0
+        self._pen = QColor(Qt.black)
+        # Прозрачная полоса на самую большую порцию
+        self._blank = QImage(size * GLYPH_TASK_SIZE, size, QImage.Format_ARGB32_Premultiplied)
+        self._blank.fill(Qt.transparent)
+        self.rendered.connect(self._store)
+        if QPixmapCache.cacheLimit() < GLYPH_CACHE_KB:
+            QPixmapCache.setCacheLimit(GLYPH_CACHE_KB)
+
+    def _key(self, character: str) -> str:
+        return f"kanji-glyph:{self.size}:{character}"
+
+    def pixmap(self, character: str) -> Optional[QPixmap]:
+        """Символ из кэша; если его там нет - None, а символ ставится в очередь на отрисовку"""
+        pixmap = QPixmapCache.find(self._key(character))
+        if pixmap is None:
+            self.request([character])
+        return pixmap
+
+    def request(self, characters: Sequence[str]) -> None:
+        """Ставит символы на отрисовку задачами по GLYPH_TASK_SIZE (уже ожидающие пропускаются)"""
+        batch = [character for character in dict.fromkeys(characters) if character not in self._pending]
+        self._pending.update(batch)
+        for start in range(0, len(batch), GLYPH_TASK_SIZE):
+            self._pool.submit(self._render_batch, self._generation, batch[start:start + GLYPH_TASK_SIZE])
+
+    def prefetch(self, characters: Sequence[str]) -> None:
+        """Заранее рисует символы, которых еще нет в кэше"""
+        self.request([character for character in characters
+                      if QPixmapCache.find(self._key(character)) is None])
+
+    def cancel_pending(self) -> None:
+        """Снимает с очереди еще не начатую отрисовку (например, при смене набора плиток)"""
+        self._generation += 1
+        self._pending.clear()
+
+    def shutdown(self) -> None:
+        """Останавливает пул при выходе из приложения, не дорисовывая очередь"""
+        self._generation += 1
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _render_batch(self, generation: int, characters: List[str]) -> None:
+        """Выполняется в потоке пула; результат доставляется в главный поток сигналом rendered"""
+        if generation != self._generation:
+            return
+        self.rendered.emit(list(zip(characters, self.render(characters))))
+
+    def render(self, characters: Sequence[str]) -> List[QImage]:
+        """
+        Рисует символы в QImage (по одному на символ). Выполняется в потоке пула.
+
+        Вся порция рисуется одним QPainter в общую полосу, которая затем
+        режется на символы: шрифт и перо задаются один раз на порцию, а не на
+        каждый символ (сглаживание текста у QPainter включено по умолчанию).
+        """
+        size = self.size
+        strip = self._blank.copy(0, 0, size * len(characters), size)
+        # QFont реентерабелен, но не потокобезопасен - у каждой порции свой
+        font = QFont()
+        font.setPixelSize(int(size * 0.8))
+        painter = QPainter(strip)
+        try:
+            painter.setFont(font)
+            painter.setPen(self._pen)
+            for number, character in enumerate(characters):
+                painter.drawText(QRect(number * size, 0, size, size), Qt.AlignCenter, character)
+        finally:
+            painter.end()
+        return [strip.copy(number * size, 0, size, size) for number in range(len(characters))]
+
+    def _store(self, images) -> None:
+        for character, image in images:
+            self._pending.discard(character)
+            QPixmapCache.insert(self._key(character), QPixmap.fromImage(image))
+        self.glyph_ready.emit([character for character, _ in images])
+
+
+_renderers: Dict[int, GlyphRenderer] = {}
+
+
+def glyph_renderer(size: int = GLYPH_SIZE) -> GlyphRenderer:
+    """
+    Общий отрисовщик для размера size.
+
+    Живет до конца работы приложения: задачи пула не должны пережить объект,
+    которому отправляют результат, а страницы сетки удаляются при уходе с них.
+    """
+    renderer = _renderers.get(size)
+    if renderer is None:
+        renderer = _renderers[size] = GlyphRenderer(size)
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(renderer.shutdown)
+    return renderer
+
+
+class KanjiGridModel(QAbstractListModel):
+    """
+    Модель плиток для QListView.
+
+    Все плитки хранятся как легкие KanjiTile, но представлению строки
+    отдаются порциями по FETCH_BATCH по мере прокрутки. Символы порции
+    отправляются на отрисовку сразу при ее выдаче.
+    """
+    FETCH_BATCH = 256
+
+    def __init__(self, renderer: GlyphRenderer, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.renderer = renderer
+        self._tiles: List[KanjiTile] = []
+        self._loaded = 0
+        self._rows_by_character: Dict[str, List[int]] = {}
+        # Строки с готовыми символами, о которых представление еще не знает
+        self._updated_rows = set()
+        self._update_timer = QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(GLYPH_UPDATE_MS)
+        self._update_timer.timeout.connect(self.flush_updates)
+        renderer.glyph_ready.connect(self.on_glyph_ready)
+
+    def set_tiles(self, tiles: Sequence[KanjiTile]) -> None:
+        self.renderer.cancel_pending()
+        self.beginResetModel()
+        self._tiles = list(tiles)
+        self._loaded = 0
+        self._rows_by_character = {}
+        self._updated_rows.clear()
+        for row, tile in enumerate(self._tiles):
+            self._rows_by_character.setdefault(tile.character, []).append(row)
+        self.endResetModel()
+
+    def tile_count(self) -> int:
+        return len(self._tiles)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._loaded
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and self._loaded < len(self._tiles)
+
+    def fetchMore(self, parent=QModelIndex()) -> None:
+        if parent.isValid():
+            return
+        count = min(self.FETCH_BATCH, len(self._tiles) - self._loaded)
+        if count <= 0:
+            return
+        first = self._loaded
+        self.beginInsertRows(QModelIndex(), first, first + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+        self.renderer.prefetch([tile.character for tile in self._tiles[first:first + count]])
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._loaded:
+            return None
+        tile = self._tiles[index.row()]
+        if role == Qt.DecorationRole:
+            return self.renderer.pixmap(tile.character)
+        if role == Qt.ToolTipRole:
+            level = f" (N{tile.jlpt_level})" if tile.jlpt_level is not None else ""
+            return f"{tile.character} - {tile.meaning}{level}"
+        if role == Qt.AccessibleTextRole:
+            return tile.character
+        if role == Qt.UserRole:
+            return tile.id
+        return None
+
+    def on_glyph_ready(self, characters: List[str]) -> None:
+        rows = [row for character in characters for row in self._rows_by_character.get(character, ())
+                if row < self._loaded]
+        if rows:
+            self._updated_rows.update(rows)
+            if not self._update_timer.isActive():
+                self._update_timer.start()
+
+    def flush_updates(self) -> None:
+        """Одно dataChanged на все символы, готовые с прошлого кадра"""
+        if not self._updated_rows:
+            return
+        first, last = min(self._updated_rows), max(self._updated_rows)
+        self._updated_rows.clear()
+        self.dataChanged.emit(self.index(first), self.index(last), [Qt.DecorationRole])
+
+
+class KanjiGridPage(QWidget):
+    """Страница сетки: кандзи уровня JLPT, кандзи с компонентом или переданный набор (результаты поиска)"""
+
+    # Варианты фильтра по уровню: (подпись, уровень или None для всех)
+    JLPT_CHOICES = (("Все уровни", None), ("N5", 5), ("N4", 4), ("N3", 3), ("N2", 2), ("N1", 1))
+
+    def __init__(self, parent_window, kanji_controller, tiles: Optional[Sequence[KanjiTile]] = None,
+                 title: str = "Сетка кандзи"):
+        super().__init__()
+        self.parent_window = parent_window
+        self.controller = kanji_controller
+
+        layout = QVBoxLayout()
+
+        title_label = QLabel(title)
+        title_label.setProperty("class", "title")
+        title_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(title_label)
+
+        filter_layout = QHBoxLayout()
+        self.jlpt_combo = QComboBox()
+        for label, _ in self.JLPT_CHOICES:
+            self.jlpt_combo.addItem(label)
+        filter_layout.addWidget(self.jlpt_combo)
+        self.component_edit = QLineEdit()
+        self.component_edit.setPlaceholderText("Компонент (символ)")
+        self.component_edit.returnPressed.connect(self.load_tiles)
+        filter_layout.addWidget(self.component_edit)
+        show_button = QPushButton("Показать")
+        show_button.clicked.connect(self.load_tiles)
+        filter_layout.addWidget(show_button)
+        self.count_label = QLabel("")
+        filter_layout.addWidget(self.count_label)
+        filter_layout.addStretch()
+        layout.addLayout(filter_layout)
+
+        self.model = KanjiGridModel(glyph_renderer(), self)
+        self.grid_view = QListView()
+        self.grid_view.setViewMode(QListView.IconMode)
+        self.grid_view.setMovement(QListView.Static)
+        self.grid_view.setResizeMode(QListView.Adjust)
+        self.grid_view.setWrapping(True)
+        # Одинаковые плитки: представлению не нужно спрашивать размер каждой
+        self.grid_view.setUniformItemSizes(True)
+        self.grid_view.setIconSize(QSize(GLYPH_SIZE, GLYPH_SIZE))
+        self.grid_view.setGridSize(QSize(TILE_SIZE, TILE_SIZE))
+        self.grid_view.setModel(self.model)
+        self.grid_view.clicked.connect(self.on_tile_clicked)
+        layout.addWidget(self.grid_view)
+
+        back_button = QPushButton("Назад")
+        back_button.clicked.connect(self.parent_window.go_back)
+        layout.addWidget(back_button)
+
+        self.setLayout(layout)
+
+        if tiles is not None:
+            self.show_tiles(tiles)
+        else:
+            self.load_tiles()
+
+    @tracked_action()
+    def load_tiles(self):
+        jlpt_level = self.JLPT_CHOICES[self.jlpt_combo.currentIndex()][1]
+        component = self.component_edit.text().strip() or None
+        self.count_label.setText("Загрузка...")
+        self.parent_window.run_db(self.controller.get_kanji_tiles, jlpt_level, component,
+                                  on_result=self.show_tiles,
+                                  on_error=lambda error: self.count_label.setText(f"Ошибка: {error}"))
+
+    def show_tiles(self, tiles):
+        self.model.set_tiles(tiles)
+        self.count_label.setText(f"Кандзи: {self.model.tile_count()}")
+        logger.debug("Сетка: %d кандзи", self.model.tile_count())
+
+    @tracked_action()
+    def on_tile_clicked(self, index):
+        kanji_id = index.data(Qt.UserRole)
+        if kanji_id is not None:
+            self.parent_window.open_kanji_card(kanji_id)
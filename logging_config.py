@@ -0,0 +1,97 @@
+# logging_config.py
+"""
+Настройка журналирования приложения.
+
+Модули получают логгер через logging.getLogger(__name__) и пишут сообщения
+с отложенным форматированием (logger.debug("... %s", value)), поэтому на
+уровне по умолчанию (WARNING) отладочные сообщения не форматируются и не
+пишутся на диск. Модули, которые запускаются как скрипты (KanjiApp, cli,
+server), называют логгер явно: иначе он назывался бы __main__, и уровень
+из KANJIAPP_LOG_LEVELS ("KanjiApp=DEBUG") к нему не применялся бы.
+
+Переменные окружения:
+    KANJIAPP_LOG_LEVEL  - общий уровень (по умолчанию WARNING).
+    KANJIAPP_LOG_LEVELS - уровни отдельных модулей: "database=DEBUG,controller=INFO".
+    KANJIAPP_LOG_FILE   - файл журнала (по умолчанию kanjiapp.log).
+"""
+
+import logging
+import logging.handlers
+import os
+from typing import Dict
+
+DEFAULT_LEVEL = "WARNING"
+DEFAULT_LOG_FILE = "kanjiapp.log"
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+# Ротация: до 3 файлов по 1 МБ
+MAX_LOG_BYTES = 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+
+class ContextFormatter(logging.Formatter):
+    """
+    Форматтер, добавляющий к сообщению структурированный контекст.
+
+    Контекст передается через extra={"context": {...}} и выводится как
+    пары ключ=значение, например: operation=add_kanji character=語.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        context = getattr(record, "context", None)
+        if context:
+            pairs = " ".join(f"{key}={value!r}" for key, value in context.items())
+            message = f"{message} [{pairs}]"
+        return message
+
+
+def parse_module_levels(spec: str) -> Dict[str, str]:
+    """Разбирает строку вида "database=DEBUG,controller=INFO"."""
+    levels = {}
+    for part in (spec or "").split(","):
+        name, sep, level = part.partition("=")
+        if sep and name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(log_file: str = None, level: str = None, module_levels: Dict[str, str] = None) -> None:
+    """
+    Настраивает корневой логгер: файл с ротацией и вывод предупреждений в stderr.
+
+    Повторный вызов не добавляет обработчики второй раз.
+
+    Args:
+        log_file: Путь к файлу журнала. По умолчанию из KANJIAPP_LOG_FILE.
+        level: Общий уровень. По умолчанию из KANJIAPP_LOG_LEVEL.
+        module_levels: Уровни отдельных логгеров. По умолчанию из KANJIAPP_LOG_LEVELS.
+    """
+    root = logging.getLogger()
+    if getattr(root, "_kanjiapp_configured", False):
+        return
+
+    level = (level or os.environ.get("KANJIAPP_LOG_LEVEL") or DEFAULT_LEVEL).upper()
+    log_file = log_file or os.environ.get("KANJIAPP_LOG_FILE") or DEFAULT_LOG_FILE
+    if module_levels is None:
+        module_levels = parse_module_levels(os.environ.get("KANJIAPP_LOG_LEVELS", ""))
+
+    formatter = ContextFormatter(LOG_FORMAT)
+
+    # delay=True: файл открывается только при первой записи
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=MAX_LOG_BYTES, backupCount=LOG_BACKUP_COUNT,
+        encoding="utf-8", delay=True)
+    file_handler.setFormatter(formatter)
+    root.addHandler(file_handler)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.WARNING)
+    console_handler.setFormatter(formatter)
+    root.addHandler(console_handler)
+
+    root.setLevel(level)
+    for name, module_level in module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    root._kanjiapp_configured = True
@@ -0,0 +1,471 @@
+# lookup_index.py
+"""
+Скомпилированный индекс точного поиска: символ -> кандзи и чтение -> кандзи/слова.
+
+Индекс - файл рядом с базой (kanji.db.lookup-<версия>), который строится по
+базе и отображается в память (mmap) только для чтения. Ответ на поиск не
+обращается к SQLite: записи фиксированного размера отсортированы по ключу,
+а ключ ищется по хеш-таблице с открытой адресацией (crc32 от UTF-8 ключа,
+линейное пробирование, заполнение не больше половины) - в среднем одно-два
+сравнения. Все поля кандзи и слов лежат в том же файле. Несколько процессов
+(приложение, сервер, CLI) отображают один и тот же файл, и операционная
+система держит его страницы в памяти один раз.
+
+Версия данных хранится в самой базе (таблица db_meta, ее увеличивают
+триггеры на kanji, vocabulary и их таблицы вариантов и связей), поэтому
+любой процесс видит, что файл устарел. Свои записи процесс замечает сразу,
+записи других процессов - при перепроверке версии раз в LOOKUP_RECHECK_S
+секунд. Пока актуального файла нет, поиск идет через SQLite, а файл строится
+в фоновом потоке. Записи в таблицы занятий (srs_state, review_log,
+review_rollup) версию не меняют и индекс не сбрасывают.
+
+Формат (все числа little-endian):
+    заголовок       _HEADER
+    кандзи          _KANJI_RECORD, отсортированы по UTF-8 символа
+    слова           _WORD_RECORD, по возрастанию id
+    ключи чтений    _KEY_RECORD, отсортированы по UTF-8 ключа
+    хеш кандзи      uint32 × степень двойки: номер записи кандзи + 1 (0 - пусто)
+    хеш чтений      то же для ключей чтений
+    ссылки          uint32: номер записи кандзи или WORD_REF | номер записи слова
+    строки          UTF-8; строка задается (смещение, длина), NULL - длиной NONE_LENGTH
+"""
+
+import glob
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from entities import Kanji, Word
+from search_query import normalize_reading, reading_keys
+
+logger = logging.getLogger(__name__)
+
+LOOKUP_INDEX_ENABLED = os.environ.get("KANJIAPP_LOOKUP_INDEX", "1") != "0"
+
+# Как часто проверять, не изменили ли базу другие процессы
+LOOKUP_RECHECK_S = 1.0
+
+MAGIC = b"KJIX"
+FORMAT_VERSION = 1
+
+# magic, формат, резерв, версия данных, число кандзи, слов, ключей, ссылок,
+# ячеек хеша кандзи, ячеек хеша чтений, размер строк
+_HEADER = struct.Struct("<4sHHq7I")
+# id, уровень JLPT (-1 - нет), is_complex, выравнивание,
+# (смещение, длина) символа, значения, онъёми, кунъёми, заметок
+_KANJI_RECORD = struct.Struct("<IhBx10I")
+# id, (смещение, длина) написания, чтения, перевода, заметок
+_WORD_RECORD = struct.Struct("<I8I")
+# (смещение, длина) ключа, первая ссылка, число ссылок
+_KEY_RECORD = struct.Struct("<4I")
+_REF = struct.Struct("<I")
+_PAIR = struct.Struct("<II")
+
+WORD_REF = 0x80000000
+NONE_LENGTH = 0xFFFFFFFF
+
+# Строки источника - кортежи в порядке столбцов таблиц:
+# кандзи (id, character, meaning, on_readings, kun_readings, jlpt_level, is_complex, notes),
+# слова (id, japanese, reading, translation, notes)
+KanjiRow = tuple
+WordRow = tuple
+
+# Временные файлы старше этого считаются брошенными (процесс завершился во время записи)
+STALE_TEMP_S = 60.0
+
+
+class LookupIndexError(ValueError):
+    """Файл индекса поврежден или другого формата."""
+
+
+def index_path(db_name: str, data_version: int) -> str:
+    """Файл индекса базы db_name для версии данных data_version"""
+    return f"{db_name}.lookup-{data_version}"
+
+
+class _StringPool:
+    def __init__(self) -> None:
+        self.chunks: List[bytes] = []
+        self.size = 0
+
+    def add(self, text: Optional[str]) -> Tuple[int, int]:
+        if text is None:
+            return 0, NONE_LENGTH
+        data = str(text).encode("utf-8")
+        offset = self.size
+        self.chunks.append(data)
+        self.size += len(data)
+        return offset, len(data)
+
+
+def _hash_slots(keys: Sequence[bytes]) -> List[int]:
+    """Хеш-таблица номеров записей (+1) с заполнением не больше половины"""
+    size = 1
+    while size < 2 * len(keys):
+        size *= 2
+    slots = [0] * size
+    for number, key in enumerate(keys):
+        slot = zlib.crc32(key) & (size - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (size - 1)
+        slots[slot] = number + 1
+    return slots
+
+
+def write_lookup_index(path: str, data_version: int, kanji_rows: Sequence[KanjiRow],
+                       word_rows: Sequence[WordRow]) -> None:
+    """
+    Записывает индекс в path.
+
+    Файл сначала пишется во временный и затем атомарно подменяет path,
+    поэтому другой процесс никогда не увидит его наполовину записанным.
+    """
+    strings = _StringPool()
+    kanji_rows = sorted(kanji_rows, key=lambda row: row[1].encode("utf-8"))
+    word_rows = sorted(word_rows, key=lambda row: row[0])
+
+    refs_by_key: Dict[str, List[int]] = {}
+    kanji_records = []
+    for number, (kanji_id, character, meaning, on, kun, jlpt, is_complex, notes) in enumerate(kanji_rows):
+        fields = []
+        for text in (character, meaning, on, kun, notes):
+            fields.extend(strings.add(text))
+        kanji_records.append(_KANJI_RECORD.pack(kanji_id, -1 if jlpt is None else jlpt,
+                                                1 if is_complex else 0, *fields))
+        for key in reading_keys(on) + reading_keys(kun):
+            refs = refs_by_key.setdefault(key, [])
+            if not refs or refs[-1] != number:
+                refs.append(number)
+
+    word_records = []
+    for number, (word_id, japanese, reading, translation, notes) in enumerate(word_rows):
+        fields = []
+        for text in (japanese, reading, translation, notes):
+            fields.extend(strings.add(text))
+        word_records.append(_WORD_RECORD.pack(word_id, *fields))
+        for key in reading_keys(reading):
+            refs_by_key.setdefault(key, []).append(WORD_REF | number)
+
+    key_records = []
+    values = []
+    keys = sorted(refs_by_key, key=lambda text: text.encode("utf-8"))
+    for key in keys:
+        # Кандзи - по id, затем слова (номера записей слов уже идут по id)
+        refs = sorted(refs_by_key[key], key=lambda ref: (ref >= WORD_REF,
+                                                         ref if ref >= WORD_REF else kanji_rows[ref][0]))
+        key_records.append(_KEY_RECORD.pack(*strings.add(key), len(values), len(refs)))
+        values.extend(refs)
+
+    kanji_slots = _hash_slots([row[1].encode("utf-8") for row in kanji_rows])
+    key_slots = _hash_slots([key.encode("utf-8") for key in keys])
+
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, 0, data_version, len(kanji_records), len(word_records),
+                          len(key_records), len(values), len(kanji_slots), len(key_slots), strings.size)
+    temp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with open(temp_path, "wb") as out:
+            out.write(header)
+            out.write(b"".join(kanji_records))
+            out.write(b"".join(word_records))
+            out.write(b"".join(key_records))
+            out.write(struct.pack(f"<{len(kanji_slots)}I", *kanji_slots))
+            out.write(struct.pack(f"<{len(key_slots)}I", *key_slots))
+            out.write(struct.pack(f"<{len(values)}I", *values))
+            out.write(b"".join(strings.chunks))
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class LookupIndex:
+    """
+    Открытый (отображенный в память) файл индекса.
+
+    Объект неизменяем и может использоваться из нескольких потоков; память
+    освобождается, когда на объект не остается ссылок.
+
+    Attributes:
+        path (str): Файл индекса.
+        data_version (int): Версия данных базы, по которой построен индекс.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as source:
+            try:
+                self._mm = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise LookupIndexError(f"{path}: {e}")
+        if len(self._mm) < _HEADER.size:
+            raise LookupIndexError(f"{path}: файл короче заголовка")
+        (magic, format_version, _, self.data_version, self.kanji_count, self.word_count, self.key_count,
+         value_count, self._kanji_slots, self._key_slots, strings_size) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise LookupIndexError(f"{path}: неизвестный формат")
+        for slots, count in ((self._kanji_slots, self.kanji_count), (self._key_slots, self.key_count)):
+            # Размер хеш-таблицы - степень двойки, не меньше удвоенного числа ключей
+            if slots & (slots - 1) or slots < max(1, 2 * count):
+                raise LookupIndexError(f"{path}: некорректная хеш-таблица")
+
+        self._kanji_offset = _HEADER.size
+        self._word_offset = self._kanji_offset + self.kanji_count * _KANJI_RECORD.size
+        self._key_offset = self._word_offset + self.word_count * _WORD_RECORD.size
+        self._kanji_slot_offset = self._key_offset + self.key_count * _KEY_RECORD.size
+        self._key_slot_offset = self._kanji_slot_offset + self._kanji_slots * _REF.size
+        self._ref_offset = self._key_slot_offset + self._key_slots * _REF.size
+        self._string_offset = self._ref_offset + value_count * _REF.size
+        if self._string_offset + strings_size != len(self._mm):
+            raise LookupIndexError(f"{path}: размер файла не совпадает с заголовком")
+
+    def _string(self, offset: int, length: int) -> Optional[str]:
+        if length == NONE_LENGTH:
+            return None
+        start = self._string_offset + offset
+        return self._mm[start:start + length].decode("utf-8")
+
+    def _kanji(self, number: int) -> Kanji:
+        (kanji_id, jlpt, is_complex, character_offset, character_length, meaning_offset, meaning_length,
+         on_offset, on_length, kun_offset, kun_length, notes_offset, notes_length) = _KANJI_RECORD.unpack_from(
+            self._mm, self._kanji_offset + number * _KANJI_RECORD.size)
+        string = self._string
+        return Kanji(id=kanji_id, character=string(character_offset, character_length),
+                     meaning=string(meaning_offset, meaning_length),
+                     on_readings=string(on_offset, on_length), kun_readings=string(kun_offset, kun_length),
+                     jlpt_level=None if jlpt < 0 else jlpt, is_complex=bool(is_complex),
+                     notes=string(notes_offset, notes_length))
+
+    def _word(self, number: int) -> Word:
+        (word_id, japanese_offset, japanese_length, reading_offset, reading_length, translation_offset,
+         translation_length, notes_offset, notes_length) = _WORD_RECORD.unpack_from(
+            self._mm, self._word_offset + number * _WORD_RECORD.size)
+        string = self._string
+        return Word(id=word_id, japanese=string(japanese_offset, japanese_length),
+                    reading=string(reading_offset, reading_length),
+                    translation=string(translation_offset, translation_length),
+                    notes=string(notes_offset, notes_length))
+
+    def _find(self, slot_offset: int, slot_count: int, table_offset: int, record_size: int,
+              key_field: int, key: bytes) -> int:
+        """Номер записи с ключом key по хеш-таблице или -1"""
+        mm, strings = self._mm, self._string_offset
+        mask = slot_count - 1
+        slot = zlib.crc32(key) & mask
+        while True:
+            number = _REF.unpack_from(mm, slot_offset + slot * _REF.size)[0]
+            if not number:
+                return -1
+            offset, length = _PAIR.unpack_from(mm, table_offset + (number - 1) * record_size + key_field)
+            if length == len(key) and mm[strings + offset:strings + offset + length] == key:
+                return number - 1
+            slot = (slot + 1) & mask
+
+    def kanji_by_character(self, character: str) -> Optional[Kanji]:
+        """Кандзи с символом character или None"""
+        number = self._find(self._kanji_slot_offset, self._kanji_slots, self._kanji_offset, _KANJI_RECORD.size,
+                            _KANJI_CHARACTER_FIELD, character.encode("utf-8"))
+        return self._kanji(number) if number >= 0 else None
+
+    def entries_by_reading(self, reading: str) -> Tuple[List[Kanji], List[Word]]:
+        """Кандзи (по id) и слова (по id), у которых есть чтение reading"""
+        key = normalize_reading(reading)
+        if not key:
+            return [], []
+        number = self._find(self._key_slot_offset, self._key_slots, self._key_offset, _KEY_RECORD.size,
+                            0, key.encode("utf-8"))
+        if number < 0:
+            return [], []
+        _, _, first, count = _KEY_RECORD.unpack_from(self._mm, self._key_offset + number * _KEY_RECORD.size)
+        refs = struct.unpack_from(f"<{count}I", self._mm, self._ref_offset + first * _REF.size)
+        kanji = [self._kanji(ref) for ref in refs if ref < WORD_REF]
+        words = [self._word(ref & ~WORD_REF) for ref in refs if ref >= WORD_REF]
+        return kanji, words
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+# Смещение (смещение, длина) символа в записи кандзи: после id, уровня, флага и выравнивания
+_KANJI_CHARACTER_FIELD = struct.calcsize("<IhBx")
+
+
+class LookupIndexManager:
+    """
+    Держит актуальный индекс для одной базы и перестраивает его в фоне.
+
+    Args:
+        db_name: Файл базы данных; индексы лежат рядом с ним.
+        read_version: Возвращает текущую версию данных базы (None - версии нет).
+        read_source: Возвращает (версия, строки кандзи, строки слов) одного
+            согласованного чтения или None, если данные менялись во время чтения.
+    """
+
+    def __init__(self, db_name: str, read_version: Callable[[], Optional[int]],
+                 read_source: Callable[[], Optional[Tuple[int, List[KanjiRow], List[WordRow]]]]) -> None:
+        self.db_name = db_name
+        self.build_count = 0
+        self.last_build_ms: Optional[float] = None
+        self.hits = 0
+        self.misses = 0
+        self._read_version = read_version
+        self._read_source = read_source
+        self._lock = threading.Lock()
+        self._index: Optional[LookupIndex] = None
+        # Версия базы уже не совпадает с версией индекса
+        self._stale = False
+        # Когда сверить версию базы с версией индекса (0 - при следующем поиске)
+        self._recheck_at = 0.0
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def current(self) -> Optional[LookupIndex]:
+        """
+        Актуальный индекс или None.
+
+        Если индекса нет или он устарел, запрашивает его открытие/построение
+        в фоне; до готовности вызывающий ищет через SQLite.
+        """
+        index = self._index
+        if index is not None and not self._stale:
+            now = time.monotonic()
+            if now < self._recheck_at:
+                self.hits += 1
+                return index
+            self._recheck_at = now + LOOKUP_RECHECK_S
+            if self._read_version() == index.data_version:
+                self.hits += 1
+                return index
+            self._stale = True
+        self.misses += 1
+        self._request()
+        return None
+
+    def invalidate(self) -> None:
+        """
+        Отмечает запись этого процесса: версия сверяется при следующем поиске.
+
+        Записи в таблицы, которых нет в индексе (например, состояние
+        повторений), версию не меняют, и индекс продолжает использоваться.
+        """
+        self._recheck_at = 0.0
+
+    def refresh(self) -> Optional[LookupIndex]:
+        """
+        Открывает индекс текущей версии, при необходимости строит его (в вызывающем потоке).
+
+        Returns:
+            Открытый индекс или None, если в базе нет версии данных или данные
+            менялись во время построения.
+        """
+        version = self._read_version()
+        if version is None:
+            return None
+        index = self._open(index_path(self.db_name, version))
+        if index is None or index.data_version != version:
+            started = time.perf_counter()
+            source = self._read_source()
+            if source is None:
+                return None
+            version, kanji_rows, word_rows = source
+            path = index_path(self.db_name, version)
+            write_lookup_index(path, version, kanji_rows, word_rows)
+            index = self._open(path)
+            if index is None:
+                return None
+            self.build_count += 1
+            self.last_build_ms = (time.perf_counter() - started) * 1000.0
+            logger.debug("Индекс поиска построен за %.1f мс", self.last_build_ms,
+                         extra={"context": {'operation': 'lookup_index_build', 'data_version': version,
+                                            'kanji': len(kanji_rows), 'words': len(word_rows)}})
+
+        with self._lock:
+            self._index = index
+            self._stale = False
+            # Записи во время построения: версия сверяется при первом поиске
+            self._recheck_at = 0.0
+        self._remove_stale(index.data_version)
+        return index
+
+    def stats(self) -> dict:
+        """Сводка для диагностики."""
+        index = self._index
+        return {'ready': index is not None and not self._stale,
+                'data_version': index.data_version if index is not None else None,
+                'builds': self.build_count, 'last_build_ms': self.last_build_ms,
+                'hits': self.hits, 'misses': self.misses}
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Останавливает фоновый поток."""
+        if self._thread is not None:
+            self._stopping = True
+            self._wake.set()
+            self._thread.join(timeout)
+            self._thread = None
+        with self._lock:
+            self._index = None
+
+    def _request(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="lookup-index", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._stopping:
+                return
+            if self._index is not None and not self._stale:
+                continue
+            try:
+                self.refresh()
+            except (sqlite3.Error, OSError) as e:
+                logger.error("Не удалось построить индекс поиска: %s", e,
+                             exc_info=True, extra={"context": {'operation': 'lookup_index_build',
+                                                               'db_name': self.db_name}})
+            # Не перестраивать чаще, чем раз в LOOKUP_RECHECK_S при частых записях
+            time.sleep(LOOKUP_RECHECK_S)
+
+    @staticmethod
+    def _open(path: str) -> Optional[LookupIndex]:
+        try:
+            return LookupIndex(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, LookupIndexError) as e:
+            logger.warning("Файл индекса поиска не открылся, будет построен заново: %s", e,
+                           extra={"context": {'operation': 'lookup_index_open', 'path': path}})
+            return None
+
+    def _remove_stale(self, version: int) -> None:
+        """
+        Удаляет индексы версий старше version (открытые другими процессами в
+        Windows не удалятся - не страшно). Индексы более новых версий мог
+        построить другой процесс, они остаются.
+        """
+        now = time.time()
+        prefix = self.db_name + ".lookup-"
+        for path in glob.glob(glob.escape(prefix) + "*"):
+            name = path[len(prefix):]
+            try:
+                if ".tmp-" in name:
+                    # Временный файл может писать другой процесс
+                    if now - os.path.getmtime(path) > STALE_TEMP_S:
+                        os.remove(path)
+                elif name.isdigit() and int(name) < version:
+                    os.remove(path)
+            except OSError:
+                pass
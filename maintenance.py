@@ -0,0 +1,247 @@
+# maintenance.py
+"""
+Фоновое обслуживание базы данных.
+
+Правки и каскадные удаления оставляют в kanji.db свободные страницы и
+висячие строки связей, а планировщик запросов SQLite без статистики выбирает
+индексы наугад. Обслуживание:
+    - обновляет статистику (ANALYZE при первом запуске, затем PRAGMA optimize);
+    - удаляет строки связей и индексов основ, ссылающиеся на удаленные кандзи/слова;
+    - проверяет целостность (integrity_check) по одной таблице;
+    - возвращает свободные страницы порциями (incremental_vacuum).
+
+Работа разбита на короткие шаги (MaintenanceStep), каждый выполняется в
+потоке базы как обычный запрос. MaintenanceScheduler выдает шаги только
+когда пользователь бездействует и не чаще раза в MAINTENANCE_INTERVAL_S
+(время последнего обслуживания хранится в базе, в db_meta). Модуль не
+зависит от Qt: приложение вызывает планировщик по таймеру, CLI выполняет
+все шаги подряд (DatabaseMaintenance.run).
+"""
+
+import logging
+import sqlite3
+import time
+from collections import namedtuple
+from typing import Callable, List, Optional
+
+from database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Бездействие пользователя, после которого можно выполнять шаги
+MAINTENANCE_IDLE_S = 30.0
+# Наименьший промежуток между циклами обслуживания
+MAINTENANCE_INTERVAL_S = 24 * 60 * 60
+# Страниц, возвращаемых за один шаг incremental_vacuum (~4 МБ при странице 4 КБ)
+VACUUM_STEP_PAGES = 1024
+# Старую базу имеет смысл перевести в инкрементальный режим (полный VACUUM),
+# если свободно не меньше этой доли страниц и не меньше VACUUM_MIN_FREE_PAGES
+VACUUM_MIN_FREE_RATIO = 0.2
+VACUUM_MIN_FREE_PAGES = 256
+# Строк индекса, просматриваемых ANALYZE для одного индекса
+ANALYSIS_LIMIT = 400
+
+# Ключ db_meta со временем (Unix, секунды) последнего завершенного обслуживания
+LAST_MAINTENANCE_KEY = 'maintenance_at'
+
+# Шаг обслуживания: имя для отчета, таблица (или None) и функция с аргументами
+MaintenanceStep = namedtuple('MaintenanceStep', ['name', 'table', 'func', 'args'])
+
+
+class DatabaseMaintenance:
+    """
+    Шаги обслуживания базы и отчет по их результатам.
+
+    Attributes:
+        db_manager (DatabaseManager): Менеджер базы.
+        repair (bool): Изменять базу: обновлять статистику, удалять висячие
+            строки и возвращать свободные страницы (False - только проверки и отчет).
+        report (dict): Отчет последнего цикла (см. new_report).
+    """
+
+    def __init__(self, db_manager: DatabaseManager, repair: bool = True) -> None:
+        self.db_manager = db_manager
+        self.repair = repair
+        self.report = self.new_report()
+
+    @staticmethod
+    def new_report() -> dict:
+        return {'started_at': None, 'finished_at': None, 'duration_ms': 0.0, 'steps': 0,
+                'before': None, 'after': None, 'orphans_found': {}, 'orphans_removed': {},
+                'integrity_errors': {}, 'vacuumed_pages': 0, 'errors': []}
+
+    def plan(self, force: bool = False) -> List[MaintenanceStep]:
+        """
+        Составляет шаги цикла по текущему состоянию базы.
+
+        Args:
+            force: Не смотреть на время последнего обслуживания.
+
+        Returns:
+            Шаги по порядку; пустой список, если обслуживание еще не нужно.
+        """
+        db = self.db_manager
+        last = db.get_meta(LAST_MAINTENANCE_KEY)
+        if not force and last is not None and time.time() - last < MAINTENANCE_INTERVAL_S:
+            return []
+
+        self.report = self.new_report()
+        self.report['started_at'] = time.time()
+        self.report['before'] = storage = db.get_storage_stats()
+
+        steps = []
+        if self.repair:
+            steps.append(MaintenanceStep('optimize', None, db.optimize_statistics, (ANALYSIS_LIMIT,)))
+        for table in db.get_foreign_key_tables():
+            steps.append(MaintenanceStep('orphans', table, self._check_orphans, (table,)))
+        # integrity_check по одной таблице есть с SQLite 3.33
+        if sqlite3.sqlite_version_info >= (3, 33, 0):
+            for table in db.get_table_names():
+                steps.append(MaintenanceStep('integrity', table, self._check_integrity, (table,)))
+        else:
+            steps.append(MaintenanceStep('integrity', None, self._check_integrity, (None,)))
+
+        if self.repair:
+            free = storage['freelist_pages']
+            if storage['auto_vacuum'] == 2:
+                for _ in range(-(-free // VACUUM_STEP_PAGES)):
+                    steps.append(MaintenanceStep('vacuum', None, self._vacuum, (VACUUM_STEP_PAGES,)))
+            elif (free >= VACUUM_MIN_FREE_PAGES
+                  and free >= VACUUM_MIN_FREE_RATIO * storage['page_count']):
+                steps.append(MaintenanceStep('enable_incremental_vacuum', None,
+                                             db.enable_incremental_vacuum, ()))
+        steps.append(MaintenanceStep('finish', None, self._finish, ()))
+        return steps
+
+    def run_step(self, step: MaintenanceStep):
+        """Выполняет один шаг (в потоке базы); ошибка шага записывается в отчет и не прерывает цикл"""
+        started = time.perf_counter()
+        try:
+            return step.func(*step.args)
+        except sqlite3.Error as e:
+            self.report['errors'].append(f"{step.name} {step.table or ''}: {e}".strip())
+            logger.error("Ошибка шага обслуживания %s: %s", step.name, e, exc_info=True,
+                         extra={"context": {'operation': 'maintenance', 'step': step.name, 'table': step.table}})
+            return None
+        finally:
+            self.report['steps'] += 1
+            self.report['duration_ms'] += (time.perf_counter() - started) * 1000.0
+
+    def run(self, force: bool = True) -> dict:
+        """Выполняет весь цикл сразу (для CLI). Возвращает отчет"""
+        for step in self.plan(force=force):
+            self.run_step(step)
+        return self.report
+
+    def _check_orphans(self, table: str) -> int:
+        found = self.db_manager.count_orphans(table)
+        if found:
+            self.report['orphans_found'][table] = found
+            if self.repair:
+                self.report['orphans_removed'][table] = self.db_manager.delete_orphans(table)
+        return found
+
+    def _check_integrity(self, table: Optional[str]) -> List[str]:
+        errors = self.db_manager.integrity_check(table)
+        if errors:
+            self.report['integrity_errors'][table or '*'] = errors
+            logger.warning("Проверка целостности %s: %d проблем", table or "базы", len(errors),
+                           extra={"context": {'operation': 'integrity_check', 'table': table,
+                                              'errors': errors[:10]}})
+        return errors
+
+    def _vacuum(self, pages: int) -> int:
+        before = self.db_manager.get_storage_stats()['freelist_pages']
+        remaining = self.db_manager.incremental_vacuum(pages)
+        self.report['vacuumed_pages'] += before - remaining
+        return remaining
+
+    def _finish(self) -> dict:
+        self.report['after'] = self.db_manager.get_storage_stats()
+        self.report['finished_at'] = time.time()
+        if self.repair:
+            self.db_manager.set_meta(LAST_MAINTENANCE_KEY, int(self.report['finished_at']))
+        logger.info("Обслуживание базы: %d шагов за %.0f мс", self.report['steps'] + 1,
+                    self.report['duration_ms'],
+                    extra={"context": {'operation': 'maintenance',
+                                       'orphans_removed': self.report['orphans_removed'],
+                                       'vacuumed_pages': self.report['vacuumed_pages'],
+                                       'integrity_errors': len(self.report['integrity_errors'])}})
+        return self.report
+
+
+class MaintenanceScheduler:
+    """
+    Выдает шаги обслуживания, пока пользователь бездействует.
+
+    Вызывается из одного (главного) потока: next_step() - по таймеру,
+    step_finished() - когда шаг выполнен. Одновременно выполняется не больше
+    одного шага, и шаг выдается, только если с последнего действия
+    пользователя прошло idle_s секунд.
+
+    Args:
+        maintenance: Шаги и отчет.
+        idle_s: Необходимое время бездействия.
+        interval_s: Как часто проверять, не пора ли начать новый цикл.
+        clock: Источник времени (монотонный).
+    """
+
+    def __init__(self, maintenance: DatabaseMaintenance, idle_s: float = MAINTENANCE_IDLE_S,
+                 interval_s: float = MAINTENANCE_INTERVAL_S, clock: Callable[[], float] = time.monotonic) -> None:
+        self.maintenance = maintenance
+        self.idle_s = idle_s
+        self.interval_s = interval_s
+        self._clock = clock
+        self._last_activity = clock()
+        self._steps: List[MaintenanceStep] = []
+        self._next_plan_at = 0.0
+        self._in_flight = False
+        # Отчет последнего завершенного цикла
+        self.last_report: Optional[dict] = None
+
+    def user_active(self) -> None:
+        """Отмечает действие пользователя: шаги откладываются на idle_s."""
+        self._last_activity = self._clock()
+
+    @property
+    def is_idle(self) -> bool:
+        return self._clock() - self._last_activity >= self.idle_s
+
+    @property
+    def in_progress(self) -> bool:
+        """Идет цикл обслуживания (выполнен план и остались шаги)"""
+        return self._in_flight or bool(self._steps)
+
+    def next_step(self) -> Optional[MaintenanceStep]:
+        """
+        Следующий шаг или None (пользователь активен, шаг уже выполняется, нечего делать).
+
+        Первым шагом цикла выдается составление плана: его результат (список
+        шагов) нужно передать в step_finished.
+        """
+        if self._in_flight or not self.is_idle:
+            return None
+        if self._steps:
+            step = self._steps.pop(0)
+        elif self._clock() >= self._next_plan_at:
+            self._next_plan_at = self._clock() + self.interval_s
+            step = MaintenanceStep('plan', None, self.maintenance.plan, ())
+        else:
+            return None
+        self._in_flight = True
+        return step
+
+    def step_finished(self, step: MaintenanceStep, result) -> None:
+        """Результат шага (в главном потоке)"""
+        self._in_flight = False
+        if step.name == 'plan':
+            self._steps = list(result or [])
+        elif step.name == 'finish':
+            self.last_report = result
+
+    def step_failed(self, step: MaintenanceStep, error: BaseException) -> None:
+        """Шаг завершился исключением: цикл прерывается до следующего интервала"""
+        self._in_flight = False
+        self._steps = []
+        logger.error("Обслуживание базы прервано на шаге %s: %s", step.name, error,
+                     extra={"context": {'operation': 'maintenance', 'step': step.name, 'table': step.table}})
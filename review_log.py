@@ -0,0 +1,116 @@
+# review_log.py
+"""
+Журнал занятий и сводки по нему.
+
+Каждый ответ при повторении и каждый просмотр карточки записывается в
+таблицу review_log, куда строки только добавляются. Чтобы страница
+статистики не просматривала журнал за годы, вместе с каждой пачкой событий
+обновляются сводки (review_rollup) за день, неделю и за все время по уровням
+JLPT. Пачка сначала сворачивается здесь, в rollup_deltas, поэтому на каждую
+строку сводки приходится одна UPSERT на пачку, а не по одной на событие.
+
+События копятся в ReviewLogBuffer и записываются пачками. Модуль не зависит
+от Qt.
+"""
+
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from entities import ReviewEvent, ReviewRollup
+from srs import GRADE_HARD
+
+# Счетчики строки сводки в порядке полей ReviewRollup
+ROLLUP_COUNTERS = ('reviews', 'correct', 'learned', 'lapses', 'views', 'duration_ms')
+
+# Наименьшая оценка, при которой ответ считается верным (как в srs.review)
+CORRECT_GRADE = GRADE_HARD
+
+
+def make_event(event: str, item_type: str, item_id: int, duration_ms: int, jlpt_level: Optional[int] = None,
+               grade: Optional[int] = None, repetitions: Optional[int] = None,
+               at: Optional[int] = None) -> ReviewEvent:
+    """Событие журнала; at по умолчанию - текущее время"""
+    return ReviewEvent(event, item_type, item_id, int(time.time()) if at is None else int(at), grade,
+                       repetitions, int(duration_ms), jlpt_level)
+
+
+def period_starts(at: int) -> Tuple[str, str]:
+    """Начало дня и недели (с понедельника) по местному времени: даты YYYY-MM-DD"""
+    day = date.fromtimestamp(at)
+    return day.isoformat(), (day - timedelta(days=day.weekday())).isoformat()
+
+
+def event_counters(event: ReviewEvent) -> Tuple[int, ...]:
+    """
+    Вклад события в счетчики сводки.
+
+    Верный ответ на карточку без успешных повторений - карточка выучена
+    (learned), неверный ответ на выученную - забыта (lapses); разность
+    learned - lapses по уровню дает число выученных карточек.
+    """
+    duration_ms = event.duration_ms or 0
+    if event.event == 'view':
+        return 0, 0, 0, 0, 1, duration_ms
+    correct = event.grade >= CORRECT_GRADE
+    repetitions = event.repetitions or 0
+    return (1, int(correct), int(correct and repetitions == 0), int(not correct and repetitions > 0),
+            0, duration_ms)
+
+
+def rollup_deltas(events: Iterable[ReviewEvent]) -> List[ReviewRollup]:
+    """Сворачивает пачку событий в приращения строк сводки (день, неделя, все время)"""
+    totals: Dict[Tuple[str, str, int], List[int]] = {}
+    for event in events:
+        counters = event_counters(event)
+        level = event.jlpt_level or 0
+        day, week = period_starts(event.at)
+        for key in (('day', day, level), ('week', week, level), ('total', '', level)):
+            row = totals.get(key)
+            if row is None:
+                totals[key] = list(counters)
+            else:
+                for index, value in enumerate(counters):
+                    row[index] += value
+    return [ReviewRollup(*key, *row) for key, row in totals.items()]
+
+
+def merge_rollups(rows: Iterable[ReviewRollup]) -> Dict[str, int]:
+    """Суммирует счетчики нескольких строк сводки (например, всех уровней за день)"""
+    merged = dict.fromkeys(ROLLUP_COUNTERS, 0)
+    for row in rows:
+        for name in ROLLUP_COUNTERS:
+            merged[name] += getattr(row, name)
+    return merged
+
+
+class ReviewLogBuffer:
+    """
+    События, еще не записанные в журнал.
+
+    Вызывается из одного (главного) потока: append() добавляет событие и
+    сообщает, пора ли записывать пачку; take() отдает пачку на запись,
+    restore() возвращает ее, если запись не удалась.
+
+    Args:
+        max_events: Размер пачки, при котором запись выполняется сразу.
+    """
+
+    def __init__(self, max_events: int = 50) -> None:
+        self.max_events = max_events
+        self._events: List[ReviewEvent] = []
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def append(self, event: ReviewEvent) -> bool:
+        self._events.append(event)
+        return len(self._events) >= self.max_events
+
+    def take(self) -> List[ReviewEvent]:
+        events, self._events = self._events, []
+        return events
+
+    def restore(self, events: List[ReviewEvent]) -> None:
+        self._events[:0] = events
+
@@ -0,0 +1,80 @@
+# search_facets.py
+
+from typing import Dict, List, Optional
+from entities import Kanji, Word
+
+# Группы фасетов и порядок их отображения
+FACET_TYPE = 'type'        # 'kanji' / 'word'
+FACET_JLPT = 'jlpt'        # уровень JLPT (None - не указан)
+FACET_COMPLEX = 'complex'  # True - составной, False - простой
+
+FACET_GROUPS = (FACET_TYPE, FACET_JLPT, FACET_COMPLEX)
+
+
+def facet_values(item) -> Dict[str, object]:
+    """
+    Возвращает значения фасетов для одного результата поиска.
+
+    У слов нет уровня JLPT и признака составного, поэтому для них
+    в этих группах значение отсутствует.
+    """
+    if isinstance(item, Kanji):
+        return {FACET_TYPE: 'kanji', FACET_JLPT: item.jlpt_level, FACET_COMPLEX: bool(item.is_complex)}
+    if isinstance(item, Word):
+        return {FACET_TYPE: 'word'}
+    return {}
+
+
+def _matches(values: Dict[str, object], filters: Dict[str, object], skip_group: Optional[str] = None) -> bool:
+    """Проверяет, проходит ли элемент все активные фильтры (кроме skip_group)."""
+    for group, wanted in filters.items():
+        if group == skip_group:
+            continue
+        if group not in values or values[group] != wanted:
+            return False
+    return True
+
+
+class SearchFacets:
+    """
+    Счетчики фасетов для набора результатов поиска.
+
+    Счетчики вычисляются за один проход по результатам. Для каждой группы
+    количество считается с учетом фильтров остальных групп, поэтому после
+    выбора фасета остальные счетчики показывают, сколько останется при
+    дополнительном выборе.
+
+    Attributes:
+        counts (Dict[str, Dict[object, int]]): Группа -> значение -> количество.
+    """
+
+    def __init__(self, results: List = None, filters: Dict[str, object] = None) -> None:
+        self.counts: Dict[str, Dict[object, int]] = {group: {} for group in FACET_GROUPS}
+        filters = filters or {}
+
+        for item in results or []:
+            values = facet_values(item)
+            for group, value in values.items():
+                if _matches(values, filters, skip_group=group):
+                    group_counts = self.counts[group]
+                    group_counts[value] = group_counts.get(value, 0) + 1
+
+    def get(self, group: str, value) -> int:
+        """Количество результатов со значением value в группе group."""
+        return self.counts.get(group, {}).get(value, 0)
+
+
+def filter_results(results: List, filters: Dict[str, object]) -> List:
+    """
+    Оставляет только результаты, подходящие под все выбранные фасеты.
+
+    Args:
+        results: Результаты поиска (Kanji и Word вперемешку).
+        filters: Выбранные фасеты: группа -> значение.
+
+    Returns:
+        Отфильтрованный список в исходном порядке.
+    """
+    if not filters:
+        return list(results)
+    return [item for item in results if _matches(facet_values(item), filters)]
@@ -0,0 +1,170 @@
+# search_query.py
+
+import re
+import shlex
+import string
+from typing import List
+from collections import namedtuple
+
+# Один предикат структурированного запроса, например jlpt:3 -> QueryPredicate('jlpt', '3')
+QueryPredicate = namedtuple('QueryPredicate', ['field', 'value'])
+
+# Поддерживаемые поля запроса и их синонимы
+FIELD_ALIASES = {
+    'jlpt': 'jlpt',
+    'n': 'jlpt',
+    'on': 'on',
+    'kun': 'kun',
+    'meaning': 'meaning',
+    'm': 'meaning',
+    'has': 'has',
+}
+
+# Поля, которые есть только у кандзи: запрос с ними не ищет по словарю
+KANJI_ONLY_FIELDS = {'jlpt', 'on', 'kun'}
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+# Катакана ァ..ヶ -> хирагана ぁ..ゖ (сдвиг на 0x60)
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+_HIRAGANA_TO_KATAKANA = {code - 0x60: code for code in range(0x30A1, 0x30F7)}
+
+# Разделители чтений в полях on_readings/kun_readings: "ひと-, ひと.つ"
+READING_SEPARATORS = re.compile(r"[,、，;\s]+")
+
+
+class SearchQuery:
+    """
+    Разобранный поисковый запрос.
+
+    Attributes:
+        raw (str): Исходная строка запроса.
+        predicates (List[QueryPredicate]): Структурированные условия (поле:значение).
+        free_text (str): Свободный текст, оставшийся после разбора условий.
+    """
+
+    def __init__(self, raw: str = "", predicates: List[QueryPredicate] = None,
+                 free_text: str = "") -> None:
+        self.raw = raw
+        self.predicates = predicates or []
+        self.free_text = free_text
+
+    @property
+    def is_structured(self) -> bool:
+        """True если запрос содержит хотя бы одно условие вида поле:значение."""
+        return bool(self.predicates)
+
+    @property
+    def is_kanji_only(self) -> bool:
+        """True если запрос имеет смысл только для кандзи (jlpt/on/kun)."""
+        return any(p.field in KANJI_ONLY_FIELDS for p in self.predicates)
+
+    def values(self, field: str) -> List[str]:
+        """Возвращает значения всех условий с указанным полем."""
+        return [p.value for p in self.predicates if p.field == field]
+
+
+def _split_tokens(text: str) -> List[str]:
+    """Разбивает запрос на токены с учетом кавычек (meaning:"big fish")."""
+    try:
+        return shlex.split(text)
+    except ValueError:
+        # Незакрытая кавычка - разбиваем по пробелам
+        return text.split()
+
+
+def parse_search_query(text: str) -> SearchQuery:
+    """
+    Разбирает строку поиска на структурированные условия и свободный текст.
+
+    Поддерживаемый синтаксис: jlpt:3 (или jlpt:N3), on:コウ, kun:やす,
+    meaning:school, has:言. Неизвестные поля и слова без двоеточия
+    считаются свободным текстом.
+
+    Args:
+        text: Строка, введенная пользователем.
+
+    Returns:
+        Объект SearchQuery.
+    """
+    text = (text or "").strip()
+    predicates = []
+    free_words = []
+
+    for token in _split_tokens(text):
+        field, sep, value = token.partition(':')
+        if not sep:
+            # Японское двоеточие тоже допускаем
+            field, sep, value = token.partition('：')
+        field = FIELD_ALIASES.get(field.lower()) if sep else None
+
+        if field is None or not value:
+            free_words.append(token)
+            continue
+
+        if field == 'jlpt':
+            value = value.upper().lstrip('N')
+            if not value.isdigit():
+                free_words.append(token)
+                continue
+        elif field == 'has':
+            # has:言口 - каждый символ отдельное условие
+            for char in value:
+                predicates.append(QueryPredicate('has', char))
+            continue
+
+        predicates.append(QueryPredicate(field, value))
+
+    return SearchQuery(raw=text, predicates=predicates, free_text=" ".join(free_words))
+
+
+def normalize_query(text: str) -> str:
+    """
+    Приводит запрос к виду, по которому совпадающие запросы дают одинаковый результат.
+
+    Убираются пробелы по краям, латиница приводится к нижнему регистру.
+    Регистр кириллицы не меняется: LIKE в SQLite не различает регистр только у ASCII.
+    """
+    return ascii_lower((text or "").strip())
+
+
+def ascii_lower(text: str) -> str:
+    """Нижний регистр только для латиницы (так сравнивает LIKE в SQLite)"""
+    return text.translate(_ASCII_LOWER)
+
+
+def to_hiragana(text: str) -> str:
+    """Переводит катакану в хирагану (прочие символы не меняются)"""
+    return text.translate(_KATAKANA_TO_HIRAGANA)
+
+
+def to_katakana(text: str) -> str:
+    """Переводит хирагану в катакану (прочие символы не меняются)"""
+    return text.translate(_HIRAGANA_TO_KATAKANA)
+
+
+def normalize_reading(text: str) -> str:
+    """
+    Ключ чтения: хирагана без точки окуригана и дефисов приставок/суффиксов.
+    "ひと.つ" -> "ひとつ", "-り" -> "り", "イチ" -> "いち"
+    """
+    return to_hiragana((text or "").strip().replace(".", "").replace("-", ""))
+
+
+def reading_keys(text: str) -> List[str]:
+    """
+    Ключи всех чтений поля on_readings/kun_readings (или чтения слова).
+
+    Для кун-чтения с окуригана кроме полного чтения добавляется основа:
+    "ひと.つ" дает "ひとつ" и "ひと".
+    """
+    keys = []
+    for part in READING_SEPARATORS.split(text or ""):
+        key = normalize_reading(part)
+        if key and key not in keys:
+            keys.append(key)
+        if "." in part:
+            stem = normalize_reading(part.split(".", 1)[0])
+            if stem and stem not in keys:
+                keys.append(stem)
+    return keys
@@ -0,0 +1,366 @@
+# server.py
+"""
+Локальный HTTP-сервер с JSON API поверх KanjiController.
+
+Позволяет нескольким клиентам работать с одним словарем. Сервер написан на
+asyncio из стандартной библиотеки; запросы к базе выполняет
+AsyncKanjiController (пул читающих соединений и один писатель).
+
+Эндпоинты:
+    GET /search?q=<запрос>        - поиск кандзи и слов (тот же синтаксис, что в приложении)
+    GET /reading?q=<чтение>       - кандзи и слова с точно совпадающим чтением
+    GET /kanji/<id>               - карточка кандзи
+    GET /kanji/<id>/components    - дерево компонентов кандзи
+    GET /word/<id>                - карточка слова
+    PUT /kanji/<id>/notes         - обновить заметки кандзи, тело: {"notes": "..."}
+    PUT /word/<id>/notes          - обновить заметки слова
+    GET /metrics                  - задержки запросов, версия данных, статистика кэшей
+
+Ответы на GET кэшируются и помечаются ETag, который совпадает с версией
+данных в самой базе (db_meta, ее увеличивают триггеры при каждой записи в словарные таблицы):
+пока данные не изменились, повторный запрос с If-None-Match получает 304 без
+обращения к базе. Версия перечитывается не реже раза в DATA_VERSION_RECHECK_S,
+поэтому записи других процессов (например, приложения) и данные, измененные
+между запусками сервера, не выдаются за прежние.
+
+При запуске схема базы проверяется и обновляется (initialize_database), как в
+приложении и cli.py.
+
+Запуск:
+    python server.py --port 8765 --db kanji.db
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import OrderedDict, namedtuple
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from async_controller import AsyncKanjiController, DEFAULT_MAX_WORKERS
+from instrumentation import LatencyHistogram
+from logging_config import setup_logging
+
+logger = logging.getLogger("server")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 1024 * 1024
+RESPONSE_CACHE_SIZE = 512
+# Сколько ждать следующего запроса в постоянном соединении
+KEEP_ALIVE_TIMEOUT = 15.0
+# Как часто перечитывать версию данных из базы, секунд
+DATA_VERSION_RECHECK_S = 0.5
+
+STATUS_TEXT = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+# Маршрут: метод, шаблон пути, имя для метрик и имя метода-обработчика
+Route = namedtuple('Route', ['method', 'pattern', 'name', 'handler'])
+
+ROUTES = (
+    Route('GET', re.compile(r'^/search$'), 'search', 'handle_search'),
+    Route('GET', re.compile(r'^/reading$'), 'reading', 'handle_reading'),
+    Route('GET', re.compile(r'^/kanji/(\d+)$'), 'kanji', 'handle_kanji'),
+    Route('GET', re.compile(r'^/kanji/(\d+)/components$'), 'components', 'handle_components'),
+    Route('GET', re.compile(r'^/word/(\d+)$'), 'word', 'handle_word'),
+    Route('PUT', re.compile(r'^/(kanji|word)/(\d+)/notes$'), 'notes', 'handle_notes'),
+    Route('POST', re.compile(r'^/(kanji|word)/(\d+)/notes$'), 'notes', 'handle_notes'),
+    Route('GET', re.compile(r'^/metrics$'), 'metrics', 'handle_metrics'),
+)
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class KanjiServer:
+    """
+    HTTP-сервер JSON API.
+
+    Attributes:
+        controller (AsyncKanjiController): Асинхронный контроллер для запросов к базе.
+        latency (Dict[str, LatencyHistogram]): Задержки обработки по маршрутам.
+        port (int): Фактический порт после start() (при port=0 выбирается свободный).
+    """
+
+    def __init__(self, db_name: str = "kanji.db", host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 max_workers: int = DEFAULT_MAX_WORKERS, snapshot: Optional[bool] = None) -> None:
+        self.controller = AsyncKanjiController(db_name, max_workers=max_workers, snapshot=snapshot)
+        self.host = host
+        self.port = port
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self._cache: "OrderedDict[str, Tuple[Optional[int], bytes]]" = OrderedDict()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        # Версия данных из базы (db_meta) и когда ее перечитать
+        self.data_version: Optional[int] = None
+        self._version_recheck_at = 0.0
+
+    async def _current_version(self, force: bool = False) -> Optional[int]:
+        """Версия данных в базе; перечитывается не чаще раза в DATA_VERSION_RECHECK_S"""
+        now = time.monotonic()
+        if force or now >= self._version_recheck_at:
+            # Одновременные запросы до окончания проверки обходятся прежней версией
+            self._version_recheck_at = now + DATA_VERSION_RECHECK_S
+            self.data_version = await self.controller.check_data_version()
+        return self.data_version
+
+    async def start(self) -> int:
+        """Проверяет схему базы, запускает прием соединений и возвращает порт."""
+        await self.controller.initialize_database()
+        await self._current_version(force=True)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Сервер слушает http://%s:%d", self.host, self.port)
+        return self.port
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await self.controller.aclose()
+
+    # --- HTTP ---
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                keep_alive = await self._handle_request(request_line, reader, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(self, request_line: bytes, reader: asyncio.StreamReader,
+                              writer: asyncio.StreamWriter) -> bool:
+        start = time.perf_counter()
+        route_name = "unknown"
+        keep_alive = True
+        try:
+            try:
+                method, target, version = request_line.decode("latin-1").split()
+            except ValueError:
+                raise HttpError(400, "Некорректная строка запроса")
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+            length = int(headers.get("content-length") or 0)
+            if length > MAX_BODY_BYTES:
+                keep_alive = False
+                raise HttpError(413, "Слишком большое тело запроса")
+            body = await reader.readexactly(length) if length else b""
+
+            url = urlsplit(target)
+            path = unquote(url.path)
+            route, match = self._resolve(method, path)
+            route_name = route.name
+
+            if method == "GET":
+                status, payload, etag = await self._cached_get(route, match, url.query, target,
+                                                               headers.get("if-none-match"))
+            else:
+                status, payload = await getattr(self, route.handler)(match, parse_qs(url.query), body)
+                etag = None
+        except HttpError as e:
+            status, payload, etag = e.status, json.dumps({'error': str(e)}, ensure_ascii=False).encode(), None
+        except Exception as e:
+            logger.error("Ошибка при обработке запроса: %s", e, exc_info=True,
+                         extra={"context": {'operation': 'http', 'request': request_line.decode("latin-1").strip()}})
+            status, payload, etag = 500, json.dumps({'error': 'internal error'}).encode(), None
+
+        self._write_response(writer, status, payload, etag, keep_alive)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        histogram = self.latency.get(route_name)
+        if histogram is None:
+            histogram = self.latency[route_name] = LatencyHistogram()
+        histogram.record(elapsed_ms)
+        logger.debug("%s %d %.1f мс", request_line.decode("latin-1").strip(), status, elapsed_ms)
+        return keep_alive
+
+    @staticmethod
+    def _resolve(method: str, path: str):
+        allowed = False
+        for route in ROUTES:
+            match = route.pattern.match(path)
+            if match is None:
+                continue
+            if route.method == method:
+                return route, match
+            allowed = True
+        if allowed:
+            raise HttpError(405, "Метод не поддерживается")
+        raise HttpError(404, "Не найдено")
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, payload: bytes,
+                        etag: Optional[str], keep_alive: bool) -> None:
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                 "Content-Type: application/json; charset=utf-8",
+                 f"Content-Length: {len(payload) if status != 304 else 0}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if etag:
+            lines.append(f"ETag: {etag}")
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        writer.write(head if status == 304 else head + payload)
+
+    async def _cached_get(self, route: Route, match, query: str, target: str, if_none_match: Optional[str]):
+        """
+        Выполняет GET с учетом ETag и кэша ответов.
+        Ответ действителен, пока версия данных не изменилась.
+        """
+        version = await self._current_version()
+        etag = f'"v{version}"'
+        if route.name == "metrics":
+            status, payload = await self.handle_metrics(match, parse_qs(query), b"")
+            return status, payload, None
+        if if_none_match == etag:
+            return 304, b"", etag
+
+        cached = self._cache.get(target)
+        if cached is not None and cached[0] == version:
+            self._cache_hits += 1
+            self._cache.move_to_end(target)
+            return 200, cached[1], etag
+        self._cache_misses += 1
+
+        status, payload = await getattr(self, route.handler)(match, parse_qs(query), b"")
+        # Если во время запроса данные изменились, ответ не кэшируется
+        if status == 200 and await self._current_version() == version:
+            self._cache[target] = (version, payload)
+            if len(self._cache) > RESPONSE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+            return status, payload, etag
+        return status, payload, None
+
+    @staticmethod
+    def _json(data) -> bytes:
+        return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+    # --- Обработчики ---
+
+    async def handle_search(self, match, params: dict, body: bytes):
+        query = (params.get("q") or [""])[0].strip()
+        if not query:
+            raise HttpError(400, "Не задан параметр q")
+        kanji, words = await self.controller.search(query)
+        return 200, self._json({'query': query,
+                                'kanji': [item.to_dict() for item in kanji],
+                                'words': [item.to_dict() for item in words]})
+
+    async def handle_reading(self, match, params: dict, body: bytes):
+        reading = (params.get("q") or [""])[0].strip()
+        if not reading:
+            raise HttpError(400, "Не задан параметр q")
+        kanji, words = await self.controller.lookup_reading(reading)
+        return 200, self._json({'reading': reading,
+                                'kanji': [item.to_dict() for item in kanji],
+                                'words': [item.to_dict() for item in words]})
+
+    async def handle_kanji(self, match, params: dict, body: bytes):
+        kanji = await self.controller.get_kanji_info(int(match.group(1)))
+        if kanji is None:
+            raise HttpError(404, "Кандзи не найдено")
+        return 200, self._json(kanji.to_dict())
+
+    async def handle_components(self, match, params: dict, body: bytes):
+        tree = await self.controller.get_component_tree(int(match.group(1)))
+        if tree is None:
+            raise HttpError(404, "Кандзи не найдено")
+        return 200, self._json(tree.to_dict())
+
+    async def handle_word(self, match, params: dict, body: bytes):
+        word = await self.controller.get_word_info(int(match.group(1)))
+        if word is None:
+            raise HttpError(404, "Слово не найдено")
+        return 200, self._json(word.to_dict())
+
+    async def handle_notes(self, match, params: dict, body: bytes):
+        try:
+            data = json.loads(body.decode("utf-8") or "{}")
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise HttpError(400, "Тело запроса должно быть JSON")
+        notes = data.get("notes") if isinstance(data, dict) else None
+        if not isinstance(notes, str):
+            raise HttpError(400, "Ожидается поле notes (строка)")
+        kind, item_id = match.group(1), int(match.group(2))
+        if not await self.controller.update_notes(item_id, notes, kind == "kanji"):
+            raise HttpError(404, "Элемент не найден")
+        return 200, self._json({'ok': True, 'data_version': await self._current_version(force=True)})
+
+    async def handle_metrics(self, match, params: dict, body: bytes):
+        total = self._cache_hits + self._cache_misses
+        snapshot = self.controller.controller.db_manager.snapshot
+        lookup_index = self.controller.controller.db_manager.lookup_index
+        return 200, self._json({
+            'data_version': self.data_version,
+            'latency_ms': {name: histogram.snapshot() for name, histogram in sorted(self.latency.items())},
+            'response_cache': {'size': len(self._cache), 'hits': self._cache_hits,
+                               'misses': self._cache_misses,
+                               'hit_rate': self._cache_hits / total if total else 0.0},
+            'controller_caches': self.controller.controller.get_cache_stats(),
+            'snapshot': snapshot.stats() if snapshot is not None else None,
+            'lookup_index': lookup_index.stats() if lookup_index is not None else None,
+        })
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="JSON API словаря кандзи")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", default="kanji.db", help="файл базы данных")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help="число потоков для чтения")
+    parser.add_argument("--snapshot", action="store_true", default=None,
+                        help="читать из копии базы в памяти (KANJIAPP_SNAPSHOT=1)")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    server = KanjiServer(args.db, args.host, args.port, args.workers, snapshot=args.snapshot)
+
+    async def run():
+        await server.start()
+        print(f"Сервер запущен: http://{args.host}:{server.port}")
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
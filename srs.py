@@ -0,0 +1,175 @@
+# srs.py
+"""
+Интервальное повторение кандзи и слов (алгоритм SM-2).
+
+Состояние каждой карточки (SrsState) хранится в таблице srs_state с индексом
+по due_at, поэтому следующая карточка к повторению находится поиском по
+индексу, а не просмотром всех карточек.
+
+StudySession - очередь сессии повторения без привязки к Qt: карточки
+загружаются порциями заранее, пока пользователь отвечает на текущие, а оценки
+копятся и записываются пачками. Ответ на карточку не ждет базу.
+"""
+
+from collections import deque
+from typing import Deque, Iterable, List, Optional, Set, Tuple
+
+from entities import SrsState, StudyCard
+
+# Оценки (качество ответа по SM-2): подпись кнопки и значение
+GRADE_AGAIN = 1
+GRADE_HARD = 3
+GRADE_GOOD = 4
+GRADE_EASY = 5
+GRADES = (("Снова", GRADE_AGAIN), ("Трудно", GRADE_HARD), ("Хорошо", GRADE_GOOD), ("Легко", GRADE_EASY))
+
+# Начальный коэффициент легкости и его нижняя граница
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+# Интервалы первых двух успешных повторений, дней
+FIRST_INTERVAL_DAYS = 1.0
+SECOND_INTERVAL_DAYS = 6.0
+# Через сколько показать снова забытую карточку, дней (10 минут)
+LAPSE_INTERVAL_DAYS = 10 / (24 * 60)
+# "Легко" увеличивает интервал дополнительно
+EASY_BONUS = 1.3
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def new_state(item_type: str, item_id: int, now: int) -> SrsState:
+    """Состояние карточки, только что добавленной к изучению (к повторению сразу)"""
+    return SrsState(item_type, item_id, int(now), 0.0, INITIAL_EASE, 0, 0, None)
+
+
+def review(state: SrsState, grade: int, now: int) -> SrsState:
+    """
+    Новое состояние карточки после ответа с оценкой grade (1..5).
+
+    Оценка ниже 3 - карточка забыта: повторения начинаются заново, а
+    карточка возвращается через LAPSE_INTERVAL_DAYS. Иначе интервал растет:
+    1 день, 6 дней, затем предыдущий интервал, умноженный на коэффициент
+    легкости. Коэффициент меняется по формуле SM-2 и не опускается ниже MIN_EASE.
+    """
+    ease = max(MIN_EASE, state.ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    if grade < GRADE_HARD:
+        return state._replace(due_at=int(now + LAPSE_INTERVAL_DAYS * SECONDS_PER_DAY),
+                              interval_days=round(LAPSE_INTERVAL_DAYS, 4), ease=round(ease, 4), repetitions=0,
+                              lapses=state.lapses + 1, last_review_at=int(now))
+
+    if state.repetitions == 0:
+        interval = FIRST_INTERVAL_DAYS
+    elif state.repetitions == 1:
+        interval = SECOND_INTERVAL_DAYS
+    else:
+        interval = max(state.interval_days, FIRST_INTERVAL_DAYS) * ease
+    if grade == GRADE_EASY:
+        interval *= EASY_BONUS
+    return state._replace(due_at=int(now + interval * SECONDS_PER_DAY), interval_days=round(interval, 4),
+                          ease=round(ease, 4), repetitions=state.repetitions + 1, last_review_at=int(now))
+
+
+class StudySession:
+    """
+    Очередь карточек сессии повторения.
+
+    Вызывается из одного (главного) потока. Загрузка и запись выполняются
+    снаружи (в потоке базы), сессия только говорит, когда они нужны:
+    needs_prefetch() - пора загрузить следующую порцию (exclude_keys() -
+    какие карточки не загружать повторно), needs_flush() - накопилось
+    достаточно оценок (take_pending() отдает их на запись пачкой).
+
+    Args:
+        batch_size: Сколько карточек загружать за раз.
+        prefetch_at: Загружать следующую порцию, когда в очереди осталось меньше.
+        flush_every: Записывать оценки пачками такого размера.
+    """
+
+    def __init__(self, batch_size: int = 20, prefetch_at: int = 5, flush_every: int = 10) -> None:
+        self.batch_size = batch_size
+        self.prefetch_at = prefetch_at
+        self.flush_every = flush_every
+        self.reviewed = 0
+        self._queue: Deque[StudyCard] = deque()
+        # Оценки, еще не отданные на запись, и отданные, но еще не записанные
+        self._pending: List[SrsState] = []
+        self._writing: List[List[SrsState]] = []
+        self._fetching = False
+        # Последняя загрузка вернула меньше, чем запрашивали: сейчас больше нечего повторять
+        self._exhausted = False
+
+    def current(self) -> Optional[StudyCard]:
+        """Карточка, которая показывается сейчас, или None"""
+        return self._queue[0] if self._queue else None
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def grade(self, grade: int, now: int) -> SrsState:
+        """Оценивает текущую карточку и переходит к следующей. Возвращает новое состояние"""
+        card = self._queue.popleft()
+        state = review(card.state, grade, now)
+        self._pending.append(state)
+        self.reviewed += 1
+        return state
+
+    def needs_prefetch(self) -> bool:
+        if self._fetching or len(self._queue) >= self.prefetch_at:
+            return False
+        # После пустой загрузки снова спрашиваем базу, только когда очередь кончилась
+        return not self._exhausted or not self._queue
+
+    def begin_prefetch(self) -> Tuple[int, Set[Tuple[str, int]]]:
+        """Отмечает начало загрузки. Возвращает (сколько загрузить, какие карточки исключить)"""
+        self._fetching = True
+        return self.batch_size, self.exclude_keys()
+
+    def exclude_keys(self) -> Set[Tuple[str, int]]:
+        """Карточки, которые уже в очереди или чьи оценки еще не записаны в базу"""
+        keys = {(card.state.item_type, card.state.item_id) for card in self._queue}
+        keys.update((state.item_type, state.item_id) for state in self._pending)
+        keys.update((state.item_type, state.item_id) for batch in self._writing for state in batch)
+        return keys
+
+    def add_cards(self, cards: Iterable[StudyCard], requested: int) -> None:
+        """Результат загрузки: добавляет карточки, которых еще нет в очереди"""
+        self._fetching = False
+        cards = list(cards)
+        self._exhausted = len(cards) < requested
+        known = self.exclude_keys()
+        self._queue.extend(card for card in cards
+                           if (card.state.item_type, card.state.item_id) not in known)
+
+    def prefetch_failed(self) -> None:
+        self._fetching = False
+
+    def needs_flush(self) -> bool:
+        return len(self._pending) >= self.flush_every
+
+    def take_pending(self) -> List[SrsState]:
+        """
+        Отдает накопленные оценки на запись одной пачкой.
+
+        До write_done/write_failed пачка считается записываемой: ее карточки
+        не загружаются из базы повторно. Пачки записываются в порядке выдачи
+        (одним потоком базы), поэтому более новое состояние карточки не
+        затирается старым.
+        """
+        batch, self._pending = self._pending, []
+        if batch:
+            self._writing.append(batch)
+        return batch
+
+    def write_done(self, batch: List[SrsState]) -> None:
+        self._writing = [writing for writing in self._writing if writing is not batch]
+
+    def write_failed(self, batch: List[SrsState]) -> None:
+        """Запись не удалась: оценки пачки вернутся в следующую, если у карточки нет более новой оценки"""
+        self.write_done(batch)
+        newer = self.exclude_keys()
+        self._pending[:0] = [state for state in batch if (state.item_type, state.item_id) not in newer]
+
+    @property
+    def has_unsaved(self) -> bool:
+        return bool(self._pending)
@@ -0,0 +1,166 @@
+# stall_watchdog.py
+"""
+Сторожевой таймер цикла событий GUI.
+
+Главный поток регулярно вызывает StallWatchdog.beat() (например, из QTimer).
+Фоновый поток следит, чтобы удары приходили вовремя: если главный поток не
+отвечает дольше порога, снимается его стек (sys._current_frames) и пишется
+в журнал вместе с названием действия, которое выполнялось в этот момент.
+
+Переменные окружения:
+    KANJIAPP_STALL_MS - порог зависания в миллисекундах (по умолчанию 200).
+"""
+
+import faulthandler
+import functools
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STALL_MS = float(os.environ.get("KANJIAPP_STALL_MS", "200"))
+
+# Зафиксированное зависание: когда началось, сколько длилось, во время какого действия, стек
+StallEvent = namedtuple('StallEvent', ['started_at', 'duration_ms', 'action', 'stack'])
+
+# Действие, которое сейчас выполняет главный поток (обновляется tracked_action)
+_current_action: Optional[str] = None
+
+
+@contextmanager
+def current_action(name: str):
+    """Помечает блок кода как действие, которое будет указано в отчете о зависании."""
+    global _current_action
+    previous = _current_action
+    _current_action = name
+    try:
+        yield
+    finally:
+        _current_action = previous
+
+
+def tracked_action(name: str = None):
+    """
+    Декоратор для слотов Qt: во время вызова метода действие считается текущим.
+
+    Сигналы Qt передают в слоты дополнительные аргументы, поэтому обертка
+    передает их как есть.
+    """
+    def decorator(method):
+        action_name = name or method.__qualname__
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with current_action(action_name):
+                return method(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class StallWatchdog:
+    """
+    Обнаруживает зависания главного потока по пропущенным ударам.
+
+    Attributes:
+        threshold_ms (float): Порог, после которого задержка считается зависанием.
+        interval_ms (float): Ожидаемый интервал между ударами.
+        stalls (deque): Последние зафиксированные зависания (StallEvent).
+        lags (deque): Последние задержки ударов в миллисекундах.
+    """
+
+    def __init__(self, threshold_ms: float = None, interval_ms: float = 50,
+                 main_thread_id: int = None, history: int = 100) -> None:
+        self.threshold_ms = threshold_ms if threshold_ms is not None else DEFAULT_STALL_MS
+        self.interval_ms = interval_ms
+        self.main_thread_id = main_thread_id or threading.main_thread().ident
+        self.stalls = deque(maxlen=history)
+        self.lags = deque(maxlen=1200)
+
+        self._last_beat = time.perf_counter()
+        self._reported_beat = None
+        self._pending: Optional[StallEvent] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Запускает фоновый поток наблюдения."""
+        if self._thread is not None:
+            return
+        self._last_beat = time.perf_counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stall-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def beat(self) -> None:
+        """Удар из главного потока. Вызывается таймером с интервалом interval_ms."""
+        now = time.perf_counter()
+        with self._lock:
+            lag_ms = max(0.0, (now - self._last_beat) * 1000.0 - self.interval_ms)
+            self._last_beat = now
+            self.lags.append(lag_ms)
+            pending, self._pending = self._pending, None
+
+        if pending is not None:
+            # Зависание закончилось - теперь известна его полная длительность
+            event = pending._replace(duration_ms=lag_ms + self.interval_ms)
+            self.stalls.append(event)
+            logger.warning("Цикл событий GUI был заблокирован %.0f мс (действие: %s)",
+                           event.duration_ms, event.action or "неизвестно",
+                           extra={"context": {'operation': 'stall', 'action': event.action}})
+
+    def _capture_stack(self) -> List[str]:
+        frame = sys._current_frames().get(self.main_thread_id)
+        if frame is not None:
+            return traceback.format_stack(frame)
+        # Запасной вариант: faulthandler выводит стеки всех потоков
+        with tempfile.TemporaryFile(mode="w+") as dump:
+            faulthandler.dump_traceback(file=dump, all_threads=True)
+            dump.seek(0)
+            return dump.read().splitlines(keepends=True)
+
+    def _run(self) -> None:
+        check_interval = min(self.interval_ms, self.threshold_ms) / 2000.0
+        while not self._stop.wait(check_interval):
+            with self._lock:
+                last_beat = self._last_beat
+                blocked_ms = (time.perf_counter() - last_beat) * 1000.0
+                if blocked_ms < self.threshold_ms or self._reported_beat == last_beat:
+                    continue
+                self._reported_beat = last_beat
+
+            # Стек снимается, пока главный поток еще заблокирован
+            stack = self._capture_stack()
+            action = _current_action
+            with self._lock:
+                if self._last_beat == last_beat:
+                    self._pending = StallEvent(time.time() - blocked_ms / 1000.0, blocked_ms, action, stack)
+            logger.warning("Главный поток не отвечает %.0f мс (действие: %s). Стек:\n%s",
+                           blocked_ms, action or "неизвестно", "".join(stack),
+                           extra={"context": {'operation': 'stall', 'action': action}})
+
+    def stats(self) -> dict:
+        """Сводка для страницы диагностики."""
+        lags = list(self.lags)
+        stalls = list(self.stalls)
+        return {
+            'max_lag_ms': max(lags) if lags else 0.0,
+            'window_s': len(lags) * self.interval_ms / 1000.0,
+            'stall_count': len(stalls),
+            'last_stall': stalls[-1] if stalls else None,
+            'threshold_ms': self.threshold_ms,
+        }
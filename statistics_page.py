@@ -0,0 +1,117 @@
+# statistics_page.py
+"""
+Страница статистики занятий: итоги, прогресс по уровням JLPT, последние дни и недели.
+
+Все числа читаются из сводок review_rollup одним запросом на период (см.
+review_log), поэтому страница открывается одинаково быстро при любой длине
+журнала.
+
+Модуль импортируется только при первом переходе на страницу статистики.
+"""
+import logging
+
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import QAbstractItemView, QLabel, QPushButton, QTableWidget, QTableWidgetItem, \
+    QTabWidget, QVBoxLayout, QWidget
+
+from review_log import merge_rollups
+from stall_watchdog import tracked_action
+
+logger = logging.getLogger(__name__)
+
+PERIOD_HEADERS = ("Период", "Повторений", "Верно", "Выучено", "Забыто", "Просмотров", "Время")
+JLPT_HEADERS = ("Уровень", "Выучено", "Кандзи уровня", "Повторений", "Верно", "Время")
+
+
+def format_accuracy(counters):
+    return f"{counters['correct'] * 100 / counters['reviews']:.0f}%" if counters['reviews'] else "-"
+
+
+def format_duration(duration_ms):
+    minutes = round(duration_ms / 60000)
+    return f"{minutes // 60} ч {minutes % 60} мин" if minutes >= 60 else f"{minutes} мин"
+
+
+class StatisticsPage(QWidget):
+    """Статистика занятий из сводок журнала"""
+
+    def __init__(self, parent_window, kanji_controller):
+        super().__init__()
+        self.parent_window = parent_window
+        self.controller = kanji_controller
+
+        layout = QVBoxLayout()
+
+        title_label = QLabel("Статистика")
+        title_label.setProperty("class", "title")
+        title_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(title_label)
+
+        self.summary_label = QLabel("Загрузка...")
+        self.summary_label.setWordWrap(True)
+        layout.addWidget(self.summary_label)
+
+        self.tabs = QTabWidget()
+        self.jlpt_table = self.make_table(JLPT_HEADERS)
+        self.days_table = self.make_table(PERIOD_HEADERS)
+        self.weeks_table = self.make_table(PERIOD_HEADERS)
+        self.tabs.addTab(self.jlpt_table, "По уровням JLPT")
+        self.tabs.addTab(self.days_table, "По дням")
+        self.tabs.addTab(self.weeks_table, "По неделям")
+        layout.addWidget(self.tabs)
+
+        back_button = QPushButton("Назад")
+        back_button.clicked.connect(self.parent_window.go_back)
+        layout.addWidget(back_button)
+
+        self.setLayout(layout)
+        self.load_statistics()
+
+    @staticmethod
+    def make_table(headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.verticalHeader().setVisible(False)
+        return table
+
+    @staticmethod
+    def fill_table(table, rows):
+        table.setRowCount(len(rows))
+        for row_index, row in enumerate(rows):
+            for column, value in enumerate(row):
+                item = QTableWidgetItem(str(value))
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                table.setItem(row_index, column, item)
+        table.resizeColumnsToContents()
+
+    @tracked_action()
+    def load_statistics(self):
+        self.parent_window.run_db(self.controller.get_review_statistics, on_result=self.show_statistics,
+                                  on_error=lambda error: self.summary_label.setText(f"Ошибка: {error}"))
+
+    def show_statistics(self, statistics):
+        total, study = statistics['total'], statistics['study']
+        self.summary_label.setText(
+            f"Всего повторений: {total['reviews']} (верно {format_accuracy(total)}), "
+            f"выучено карточек: {total['learned'] - total['lapses']}, "
+            f"просмотров карточек: {total['views']}, время занятий: {format_duration(total['duration_ms'])}\n"
+            f"К повторению сейчас: {study['due']}, за сутки: {study['due_day']}, карточек в изучении: {study['total']}")
+
+        kanji_by_jlpt = statistics['kanji_by_jlpt']
+        levels = sorted(set(statistics['by_jlpt']) | {level for level in kanji_by_jlpt if level},
+                        key=lambda level: (level == 0, -level))
+        rows = []
+        for level in levels:
+            counters = statistics['by_jlpt'].get(level) or merge_rollups(())
+            rows.append((f"N{level}" if level else "Без уровня / слова", counters['learned'] - counters['lapses'],
+                         kanji_by_jlpt.get(level, 0) if level else "-", counters['reviews'],
+                         format_accuracy(counters), format_duration(counters['duration_ms'])))
+        self.fill_table(self.jlpt_table, rows)
+
+        for table, periods in ((self.days_table, statistics['days']), (self.weeks_table, statistics['weeks'])):
+            self.fill_table(table, [(start, counters['reviews'], format_accuracy(counters), counters['learned'],
+                                     counters['lapses'], counters['views'], format_duration(counters['duration_ms']))
+                                    for start, counters in reversed(periods)])
+        logger.debug("Статистика занятий: %d повторений", total['reviews'])
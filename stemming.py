@@ -0,0 +1,346 @@
+# stemming.py
+"""
+Стеммеры для русского и английского языков по алгоритмам Snowball.
+
+Используются для индекса значений кандзи и переводов слов: "школы" и "школа"
+приводятся к одной основе "школ", "rested" и "rest" - к "rest".
+Язык слова определяется по алфавиту (кириллица - русский, иначе английский).
+"""
+
+import re
+from typing import List
+
+from fuzzy_index import tokenize
+
+# ---------------------------------------------------------------------------
+# Русский язык (Snowball russian)
+# ---------------------------------------------------------------------------
+
+_RU_VOWELS = "аеиоуыэюя"
+
+_RU_PERFECTIVE_GERUND_1 = ("вшись", "вши", "в")          # после а/я
+_RU_PERFECTIVE_GERUND_2 = ("ившись", "ывшись", "ивши", "ывши", "ив", "ыв")
+_RU_ADJECTIVE = ("ими", "ыми", "его", "ого", "ему", "ому", "ее", "ие", "ые", "ое",
+                 "ей", "ий", "ый", "ой", "ем", "им", "ым", "ом", "их", "ых",
+                 "ую", "юю", "ая", "яя", "ою", "ею")
+_RU_PARTICIPLE_1 = ("ем", "нн", "вш", "ющ", "щ")          # после а/я
+_RU_PARTICIPLE_2 = ("ивш", "ывш", "ующ")
+_RU_REFLEXIVE = ("ся", "сь")
+_RU_VERB_1 = ("ете", "йте", "ешь", "нно", "ла", "на", "ли", "ем", "ло", "но",
+              "ет", "ют", "ны", "ть", "й", "л", "н")      # после а/я
+_RU_VERB_2 = ("ейте", "уйте", "ила", "ыла", "ена", "ите", "или", "ыли", "ило",
+              "ыло", "ено", "ует", "уют", "ены", "ить", "ыть", "ишь", "ей", "уй",
+              "ил", "ыл", "им", "ым", "ен", "ят", "ит", "ыт", "ую", "ю")
+_RU_NOUN = ("иями", "ями", "ами", "ией", "иям", "ием", "иях", "ев", "ов", "ие",
+            "ье", "еи", "ии", "ей", "ой", "ий", "ям", "ем", "ам", "ом", "ах",
+            "ях", "ию", "ью", "ия", "ья", "а", "е", "и", "й", "о", "у", "ы", "ь",
+            "ю", "я")
+_RU_SUPERLATIVE = ("ейше", "ейш")
+_RU_DERIVATIONAL = ("ость", "ост")
+
+
+def _by_length(endings):
+    return tuple(sorted(endings, key=len, reverse=True))
+
+
+_RU_PERFECTIVE_GERUND_1 = _by_length(_RU_PERFECTIVE_GERUND_1)
+_RU_PERFECTIVE_GERUND_2 = _by_length(_RU_PERFECTIVE_GERUND_2)
+_RU_ADJECTIVE = _by_length(_RU_ADJECTIVE)
+_RU_VERB_1 = _by_length(_RU_VERB_1)
+_RU_VERB_2 = _by_length(_RU_VERB_2)
+_RU_NOUN = _by_length(_RU_NOUN)
+
+
+def _ru_regions(word: str):
+    """Возвращает начала областей RV и R2 (индексы в слове)."""
+    rv = len(word)
+    for i, char in enumerate(word):
+        if char in _RU_VOWELS:
+            rv = i + 1
+            break
+
+    def next_region(start):
+        for i in range(start + 1, len(word)):
+            if word[i] not in _RU_VOWELS and word[i - 1] in _RU_VOWELS:
+                return i + 1
+        return len(word)
+
+    r1 = next_region(0)
+    r2 = next_region(r1)
+    return rv, r2
+
+
+def _ru_remove(word: str, rv: int, endings, preceded_by_a=False) -> str:
+    """
+    Удаляет самое длинное из окончаний endings, лежащее в RV.
+    Для групп, требующих предшествующей а/я, эта буква сохраняется.
+    Возвращает слово без окончания или None, если окончание не найдено.
+    """
+    for ending in endings:
+        if not word.endswith(ending) or len(word) - len(ending) < rv:
+            continue
+        if preceded_by_a:
+            start = len(word) - len(ending)
+            if start - 1 < rv or word[start - 1] not in "ая":
+                continue
+        return word[:len(word) - len(ending)]
+    return None
+
+
+def _ru_remove_groups(word: str, rv: int, group_1, group_2) -> str:
+    """Удаляет окончание из пары групп (группа 1 - только после а/я)."""
+    candidates = []
+    first = _ru_remove(word, rv, group_1, preceded_by_a=True)
+    if first is not None:
+        candidates.append(first)
+    second = _ru_remove(word, rv, group_2)
+    if second is not None:
+        candidates.append(second)
+    if not candidates:
+        return None
+    # Побеждает самое длинное окончание, т.е. самый короткий остаток
+    return min(candidates, key=len)
+
+
+def stem_russian(word: str) -> str:
+    """Выделяет основу русского слова (алгоритм Snowball russian)."""
+    word = word.lower().replace("ё", "е")
+    rv, r2 = _ru_regions(word)
+
+    # Шаг 1
+    result = _ru_remove_groups(word, rv, _RU_PERFECTIVE_GERUND_1, _RU_PERFECTIVE_GERUND_2)
+    if result is not None:
+        word = result
+    else:
+        result = _ru_remove(word, rv, _RU_REFLEXIVE)
+        if result is not None:
+            word = result
+
+        result = _ru_remove(word, rv, _RU_ADJECTIVE)
+        if result is not None:
+            word = result
+            participle = _ru_remove_groups(word, rv, _RU_PARTICIPLE_1, _RU_PARTICIPLE_2)
+            if participle is not None:
+                word = participle
+        else:
+            result = _ru_remove_groups(word, rv, _RU_VERB_1, _RU_VERB_2)
+            if result is None:
+                result = _ru_remove(word, rv, _RU_NOUN)
+            if result is not None:
+                word = result
+
+    # Шаг 2
+    if word.endswith("и") and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    # Шаг 3
+    for ending in _RU_DERIVATIONAL:
+        if word.endswith(ending) and len(word) - len(ending) >= r2:
+            word = word[:-len(ending)]
+            break
+
+    # Шаг 4
+    if word.endswith("нн") and len(word) - 2 >= rv:
+        word = word[:-1]
+    else:
+        result = _ru_remove(word, rv, _RU_SUPERLATIVE)
+        if result is not None:
+            word = result
+            if word.endswith("нн") and len(word) - 2 >= rv:
+                word = word[:-1]
+        elif word.endswith("ь") and len(word) - 1 >= rv:
+            word = word[:-1]
+
+    return word
+
+
+# ---------------------------------------------------------------------------
+# Английский язык (Snowball english / Porter2)
+# ---------------------------------------------------------------------------
+
+_EN_VOWELS = "aeiouy"
+_EN_DOUBLES = ("bb", "dd", "ff", "gg", "mm", "nn", "pp", "rr", "tt")
+_EN_LI_ENDINGS = "cdeghkmnrt"
+
+_EN_EXCEPTIONS = {
+    "skis": "ski", "skies": "sky", "dying": "die", "lying": "lie", "tying": "tie",
+    "idly": "idl", "gently": "gentl", "ugly": "ugli", "early": "earli", "only": "onli",
+    "singly": "singl", "sky": "sky", "news": "news", "howe": "howe", "atlas": "atlas",
+    "cosmos": "cosmos", "bias": "bias", "andes": "andes",
+}
+_EN_INVARIANT_AFTER_1A = {"inning", "outing", "canning", "herring", "earring",
+                          "proceed", "exceed", "succeed"}
+
+_EN_STEP2 = (
+    ("ization", "ize"), ("ational", "ate"), ("fulness", "ful"), ("ousness", "ous"),
+    ("iveness", "ive"), ("tional", "tion"), ("biliti", "ble"), ("lessli", "less"),
+    ("entli", "ent"), ("ation", "ate"), ("alism", "al"), ("aliti", "al"),
+    ("ousli", "ous"), ("iviti", "ive"), ("fulli", "ful"), ("enci", "ence"),
+    ("anci", "ance"), ("abli", "able"), ("izer", "ize"), ("ator", "ate"),
+    ("alli", "al"), ("bli", "ble"), ("ogi", "og"), ("li", ""),
+)
+_EN_STEP3 = (
+    ("ational", "ate"), ("tional", "tion"), ("alize", "al"), ("icate", "ic"),
+    ("iciti", "ic"), ("ative", ""), ("ical", "ic"), ("ness", ""), ("ful", ""),
+)
+_EN_STEP4 = ("ement", "ance", "ence", "able", "ible", "ment", "ant", "ent", "ism",
+             "ate", "iti", "ous", "ive", "ize", "ion", "al", "er", "ic")
+
+
+def _en_is_vowel(char: str) -> bool:
+    return char in _EN_VOWELS
+
+
+def _en_regions(word: str):
+    """Возвращает начала областей R1 и R2."""
+    for prefix in ("gener", "commun", "arsen"):
+        if word.startswith(prefix):
+            r1 = len(prefix)
+            break
+    else:
+        r1 = len(word)
+        for i in range(1, len(word)):
+            if not _en_is_vowel(word[i]) and _en_is_vowel(word[i - 1]):
+                r1 = i + 1
+                break
+
+    r2 = len(word)
+    for i in range(r1 + 1, len(word)):
+        if not _en_is_vowel(word[i]) and _en_is_vowel(word[i - 1]):
+            r2 = i + 1
+            break
+    return r1, r2
+
+
+def _en_ends_short_syllable(word: str) -> bool:
+    if len(word) == 2:
+        return _en_is_vowel(word[0]) and not _en_is_vowel(word[1])
+    if len(word) >= 3:
+        return (not _en_is_vowel(word[-3]) and _en_is_vowel(word[-2])
+                and not _en_is_vowel(word[-1]) and word[-1] not in "wxY")
+    return False
+
+
+def _en_is_short(word: str) -> bool:
+    return _en_ends_short_syllable(word) and _en_regions(word)[0] >= len(word)
+
+
+def stem_english(word: str) -> str:
+    """Выделяет основу английского слова (алгоритм Snowball english / Porter2)."""
+    word = word.lower()
+    if len(word) <= 2:
+        return word
+    if word in _EN_EXCEPTIONS:
+        return _EN_EXCEPTIONS[word]
+
+    word = word.lstrip("'")
+    if word.startswith("y"):
+        word = "Y" + word[1:]
+    word = re.sub(r"(?<=[aeiouy])y", "Y", word)
+    r1, r2 = _en_regions(word)
+
+    # Шаг 0
+    for suffix in ("'s'", "'s", "'"):
+        if word.endswith(suffix):
+            word = word[:-len(suffix)]
+            break
+
+    # Шаг 1a
+    if word.endswith("sses"):
+        word = word[:-2]
+    elif word.endswith("ied") or word.endswith("ies"):
+        word = word[:-2] if len(word) > 4 else word[:-1]
+    elif word.endswith("us") or word.endswith("ss"):
+        pass
+    elif word.endswith("s"):
+        if any(_en_is_vowel(c) for c in word[:-2]):
+            word = word[:-1]
+
+    if word in _EN_INVARIANT_AFTER_1A:
+        return word
+
+    # Шаг 1b
+    if word.endswith("eedly") or word.endswith("eed"):
+        suffix = "eedly" if word.endswith("eedly") else "eed"
+        if len(word) - len(suffix) >= r1:
+            word = word[:-len(suffix)] + "ee"
+    else:
+        for suffix in ("ingly", "edly", "ing", "ed"):
+            if word.endswith(suffix):
+                stem = word[:-len(suffix)]
+                if any(_en_is_vowel(c) for c in stem):
+                    word = stem
+                    if word.endswith(("at", "bl", "iz")):
+                        word += "e"
+                    elif word.endswith(_EN_DOUBLES):
+                        word = word[:-1]
+                    elif _en_is_short(word):
+                        word += "e"
+                break
+
+    # Шаг 1c
+    if len(word) > 2 and word[-1] in "yY" and not _en_is_vowel(word[-2]):
+        word = word[:-1] + "i"
+
+    # Шаг 2
+    for suffix, replacement in _EN_STEP2:
+        if word.endswith(suffix):
+            if len(word) - len(suffix) >= r1:
+                if suffix == "ogi" and not word[:-3].endswith("l"):
+                    break
+                if suffix == "li" and (len(word) < 3 or word[-3] not in _EN_LI_ENDINGS):
+                    break
+                word = word[:-len(suffix)] + replacement
+            break
+
+    # Шаг 3
+    for suffix, replacement in _EN_STEP3:
+        if word.endswith(suffix):
+            if len(word) - len(suffix) >= r1:
+                if suffix == "ative" and len(word) - len(suffix) < r2:
+                    break
+                word = word[:-len(suffix)] + replacement
+            break
+
+    # Шаг 4
+    for suffix in _EN_STEP4:
+        if word.endswith(suffix):
+            if len(word) - len(suffix) >= r2:
+                if suffix == "ion" and word[-4:-3] not in ("s", "t"):
+                    break
+                word = word[:-len(suffix)]
+            break
+
+    # Шаг 5
+    if word.endswith("e"):
+        if len(word) - 1 >= r2 or (len(word) - 1 >= r1 and not _en_ends_short_syllable(word[:-1])):
+            word = word[:-1]
+    elif word.endswith("ll") and len(word) - 1 >= r2:
+        word = word[:-1]
+
+    return word.replace("Y", "y")
+
+
+# ---------------------------------------------------------------------------
+
+_CYRILLIC = re.compile(r"[а-яё]")
+
+
+def stem_word(word: str) -> str:
+    """Выделяет основу слова, выбирая язык по алфавиту."""
+    if _CYRILLIC.search(word):
+        return stem_russian(word)
+    return stem_english(word)
+
+
+def stem_terms(text: str) -> List[str]:
+    """
+    Разбивает текст на слова и возвращает их основы без повторов
+    (в порядке первого появления).
+    """
+    seen = []
+    for token in tokenize(text):
+        stem = stem_word(token)
+        if stem and stem not in seen:
+            seen.append(stem)
+    return seen
@@ -0,0 +1,233 @@
+# study_page.py
+"""
+Страница повторения карточек (интервальное повторение, см. srs.py).
+
+Карточки загружаются в потоке базы порциями заранее, поэтому следующая
+карточка показывается сразу после оценки. Оценки копятся в StudySession и
+записываются пачками (и при уходе со страницы), так что ответ не ждет записи.
+Каждый ответ также попадает в журнал занятий (MainWindow.log_event).
+
+Модуль импортируется только при первом переходе на страницу повторения.
+"""
+import logging
+import time
+
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QKeySequence, QShortcut
+from PySide6.QtWidgets import QComboBox, QHBoxLayout, QLabel, QPushButton, QVBoxLayout, QWidget
+
+from entities import Kanji
+from review_log import make_event
+from srs import GRADES, StudySession
+from stall_watchdog import tracked_action
+
+logger = logging.getLogger(__name__)
+
+# Оценки, накопившиеся без новых ответов, записываются через эту паузу
+FLUSH_IDLE_MS = 5000
+
+
+class StudyPage(QWidget):
+    """Повторение: лицевая сторона карточки, ответ и кнопки оценки (клавиши 1-4, пробел - ответ)"""
+
+    JLPT_CHOICES = (("N5", 5), ("N4", 4), ("N3", 3), ("N2", 2), ("N1", 1))
+
+    def __init__(self, parent_window, kanji_controller):
+        super().__init__()
+        self.parent_window = parent_window
+        self.controller = kanji_controller
+        self.session = StudySession()
+        self.due_count = 0
+        self.total_count = 0
+
+        layout = QVBoxLayout()
+
+        title_label = QLabel("Повторение")
+        title_label.setProperty("class", "title")
+        title_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(title_label)
+
+        self.counts_label = QLabel("Загрузка...")
+        self.counts_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.counts_label)
+
+        layout.addStretch()
+        self.front_label = QLabel("")
+        self.front_label.setAlignment(Qt.AlignCenter)
+        front_font = self.front_label.font()
+        front_font.setPixelSize(72)
+        self.front_label.setFont(front_font)
+        layout.addWidget(self.front_label)
+
+        self.answer_label = QLabel("")
+        self.answer_label.setAlignment(Qt.AlignCenter)
+        self.answer_label.setWordWrap(True)
+        layout.addWidget(self.answer_label)
+        layout.addStretch()
+
+        self.show_answer_button = QPushButton("Показать ответ")
+        self.show_answer_button.clicked.connect(self.show_answer)
+        layout.addWidget(self.show_answer_button)
+        QShortcut(QKeySequence(Qt.Key_Space), self, self.show_answer)
+
+        grade_layout = QHBoxLayout()
+        self.grade_buttons = []
+        for number, (label, grade) in enumerate(GRADES, start=1):
+            button = QPushButton(f"{label} ({number})")
+            button.clicked.connect(lambda checked=False, grade=grade: self.grade_card(grade))
+            QShortcut(QKeySequence(str(number)), self, lambda grade=grade: self.grade_card(grade))
+            grade_layout.addWidget(button)
+            self.grade_buttons.append(button)
+        layout.addLayout(grade_layout)
+
+        enroll_layout = QHBoxLayout()
+        self.jlpt_combo = QComboBox()
+        for label, _ in self.JLPT_CHOICES:
+            self.jlpt_combo.addItem(label)
+        enroll_layout.addWidget(self.jlpt_combo)
+        enroll_button = QPushButton("Добавить уровень в изучение")
+        enroll_button.clicked.connect(self.enroll_jlpt)
+        enroll_layout.addWidget(enroll_button)
+        enroll_layout.addStretch()
+        layout.addLayout(enroll_layout)
+
+        back_button = QPushButton("Назад")
+        back_button.clicked.connect(self.parent_window.go_back)
+        layout.addWidget(back_button)
+
+        self.setLayout(layout)
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(FLUSH_IDLE_MS)
+        self.flush_timer.timeout.connect(self.flush_pending_writes)
+
+        self.answer_shown = False
+        self.card_shown_at = time.perf_counter()
+        self.show_card()
+        self.load_counts()
+        self.prefetch()
+
+    def load_counts(self):
+        self.parent_window.run_db(self.controller.get_study_counts, on_result=self.on_counts_loaded)
+
+    def on_counts_loaded(self, counts):
+        # Оценки, еще не записанные в базу, в счетчике базы учтены как несделанные
+        self.due_count = max(0, counts['due'] - len(self.session.exclude_keys()) + self.session.queued)
+        self.total_count = counts['total']
+        self.update_counts()
+
+    def update_counts(self):
+        self.counts_label.setText(f"К повторению: {self.due_count}   Повторено: {self.session.reviewed}   "
+                                  f"Всего карточек: {self.total_count}")
+
+    def prefetch(self):
+        """Загружает следующую порцию карточек, если очередь подходит к концу"""
+        if not self.session.needs_prefetch():
+            return
+        limit, exclude = self.session.begin_prefetch()
+        self.parent_window.run_db(self.controller.get_due_cards, int(time.time()), limit, exclude,
+                                  on_result=lambda cards: self.on_cards_loaded(cards, limit),
+                                  on_error=self.on_prefetch_error)
+
+    def on_cards_loaded(self, cards, requested):
+        waiting = self.session.current() is None
+        self.session.add_cards(cards, requested)
+        logger.debug("Повторение: загружено %d карточек, в очереди %d", len(cards), self.session.queued)
+        if waiting:
+            self.show_card()
+
+    def on_prefetch_error(self, error):
+        self.session.prefetch_failed()
+        logger.error("Ошибка загрузки карточек: %s", error, extra={"context": {'operation': 'get_due_cards'}})
+        if self.session.current() is None:
+            self.front_label.setText("")
+            self.answer_label.setText(f"Ошибка: {error}")
+
+    def show_card(self):
+        card = self.session.current()
+        self.answer_shown = False
+        self.answer_label.setText("")
+        self.set_grading_enabled(False)
+        if card is None:
+            self.front_label.setText("")
+            self.show_answer_button.setEnabled(False)
+            if not self.session.needs_prefetch():
+                self.answer_label.setText("Сейчас нечего повторять")
+            return
+        item = card.item
+        self.front_label.setText(item.character if isinstance(item, Kanji) else item.japanese)
+        self.show_answer_button.setEnabled(True)
+        self.card_shown_at = time.perf_counter()
+
+    @tracked_action()
+    def show_answer(self):
+        card = self.session.current()
+        if card is None or self.answer_shown:
+            return
+        item = card.item
+        if isinstance(item, Kanji):
+            readings = " / ".join(reading for reading in (item.on_readings, item.kun_readings) if reading)
+            self.answer_label.setText(f"{item.meaning}\n{readings}")
+        else:
+            self.answer_label.setText(f"{item.reading or ''}\n{item.translation}")
+        self.answer_shown = True
+        self.show_answer_button.setEnabled(False)
+        self.set_grading_enabled(True)
+
+    def set_grading_enabled(self, enabled):
+        for button in self.grade_buttons:
+            button.setEnabled(enabled)
+
+    @tracked_action()
+    def grade_card(self, grade):
+        card = self.session.current()
+        if not self.answer_shown or card is None:
+            return
+        now = time.time()
+        self.session.grade(grade, int(now))
+        state = card.state
+        self.parent_window.log_event(make_event(
+            'review', state.item_type, state.item_id, (time.perf_counter() - self.card_shown_at) * 1000,
+            card.item.jlpt_level if isinstance(card.item, Kanji) else None, grade, state.repetitions, now))
+        self.due_count = max(0, self.due_count - 1)
+        self.update_counts()
+        self.show_card()
+        if self.session.needs_flush():
+            self.flush_pending_writes()
+        else:
+            self.flush_timer.start()
+        self.prefetch()
+
+    def flush_pending_writes(self):
+        """Записывает накопленные оценки (вызывается и окном перед уходом со страницы)"""
+        self.flush_timer.stop()
+        batch = self.session.take_pending()
+        if not batch:
+            return
+        self.parent_window.run_db(self.controller.save_review_states, batch, write=True,
+                                  on_result=lambda count: self.on_states_saved(batch, count),
+                                  on_error=lambda error: self.on_save_error(batch, error))
+
+    def on_states_saved(self, batch, count):
+        self.session.write_done(batch)
+        logger.debug("Повторение: записано %d оценок", count)
+
+    def on_save_error(self, batch, error):
+        self.session.write_failed(batch)
+        logger.error("Ошибка записи оценок: %s", error,
+                     extra={"context": {'operation': 'save_review_states', 'count': len(batch)}})
+        self.flush_timer.start()
+
+    @tracked_action()
+    def enroll_jlpt(self):
+        jlpt_level = self.JLPT_CHOICES[self.jlpt_combo.currentIndex()][1]
+        self.parent_window.run_db(self.controller.enroll_jlpt, jlpt_level, write=True,
+                                  on_result=self.on_enrolled)
+
+    def on_enrolled(self, count):
+        logger.info("Добавлено в изучение: %d", count)
+        self.load_counts()
+        self.prefetch()
+        if self.session.current() is None:
+            self.show_card()